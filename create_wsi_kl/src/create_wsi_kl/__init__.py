@@ -1 +1,5 @@
-from . import init_llm  # noqa: F401, E402
+"""WSI Cancer Description Multi-Agent System.
+
+The package import is kept light on purpose: crewai, docling and litellm are
+only imported once a crew is actually built (see ``init_llm.get_default_llm``).
+"""
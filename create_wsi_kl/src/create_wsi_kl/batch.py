@@ -0,0 +1,252 @@
+"""Concurrent batch runs of the WSI crew across many cancer types.
+
+Each cancer type gets its own ``CreateWsiKl`` instance and its own
+finalization ``output_file`` (types whose names slugify alike get ``_2``,
+``_3``, ... suffixes) so parallel runs never clobber each other.
+Crews are started with ``kickoff_async`` under a semaphore that bounds how
+many Gemini conversations are in flight at once. When every run has finished
+the finalizer dictionaries are merged into a single corpus JSON file that has
+the same shape as ``knowledge/cancer_descriptions.json``.
+"""
+
+import asyncio
+import json
+import re
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from create_wsi_kl.corpus_store import load_corpus
+from create_wsi_kl.naming import unique_slugs
+
+DEFAULT_CONCURRENCY = 3
+DEFAULT_OUTPUT_ROOT = "batch_outputs"
+
+
+@dataclass
+class BatchItemResult:
+    """Outcome of a single cancer type inside a batch run."""
+
+    cancer_type: str
+    status: str
+    output_file: str
+    elapsed_seconds: float = 0.0
+    descriptions: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    telemetry: Optional[Dict[str, Any]] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == "success"
+
+
+def load_cancer_types(json_file_path: str) -> List[str]:
+    """Return every top-level key of a cancer descriptions JSON file (or corpus store)."""
+    return list(load_corpus(json_file_path).keys())
+
+
+def build_inputs(cancer_type: str) -> Dict[str, str]:
+    """Crew inputs for one cancer type (same shape as ``main.run``)."""
+    return {
+        "cancer_type": cancer_type,
+        "current_year": str(datetime.now().year),
+        "analysis_date": datetime.now().strftime("%Y-%m-%d"),
+    }
+
+
+def parse_finalizer_output(raw: str) -> Dict[str, Any]:
+    """Parse the finalizer's dictionary-of-list JSON answer.
+
+    The finalizer frequently wraps its answer in a markdown code fence, so the
+    fence is stripped and the outermost JSON object is decoded.
+    """
+    text = raw.strip()
+    fence = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fence:
+        text = fence.group(1).strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("Finalizer output does not contain a JSON object")
+    data = json.loads(text[start : end + 1])
+    if not isinstance(data, dict):
+        raise ValueError("Finalizer output is not a JSON object")
+    return data
+
+
+def _descriptions_for(cancer_type: str, finalized: Dict[str, Any]) -> List[str]:
+    """Pick the sentence list for ``cancer_type`` out of a finalizer answer."""
+    if cancer_type in finalized:
+        value = finalized[cancer_type]
+    elif len(finalized) == 1:
+        value = next(iter(finalized.values()))
+    else:
+        raise ValueError(f"Finalizer output has no key for '{cancer_type}'")
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value]
+
+
+def _telemetry_totals(crew_instance: Any, status: str) -> Optional[Dict[str, Any]]:
+    """Finish the crew's telemetry run (if any) and return its run totals."""
+    if crew_instance is None or crew_instance.telemetry is None:
+        return None
+    crew_instance.finish_telemetry(status)
+    summary = crew_instance.telemetry.summary()
+    return {"run_id": summary["run_id"], **summary["totals"]}
+
+
+async def _run_one(
+    cancer_type: str,
+    slug: str,
+    semaphore: asyncio.Semaphore,
+    output_dir: Path,
+    use_json_source: bool,
+    json_file_path: Optional[str],
+    quiet: Optional[bool] = None,
+    telemetry_dir: Optional[str] = None,
+    shared_cancer_types: Optional[List[str]] = None,
+    fan_out: Optional[bool] = None,
+) -> BatchItemResult:
+    output_file = str(output_dir / f"{slug}.md")
+    async with semaphore:
+        started = time.perf_counter()
+        print(f"[batch] started: {cancer_type}")
+        crew_instance = None
+        try:
+            from create_wsi_kl.crew import CreateWsiKl
+
+            crew_instance = CreateWsiKl(
+                use_json_source=use_json_source,
+                json_file_path=json_file_path,
+                output_file=output_file,
+                quiet=quiet,
+                telemetry_dir=telemetry_dir,
+                cancer_type=cancer_type,
+                shared_cancer_types=shared_cancer_types,
+                fan_out=fan_out,
+            )
+            # Building the crew converts knowledge sources, keep it off the loop.
+            crew = await asyncio.to_thread(crew_instance.crew)
+            result = await crew.kickoff_async(inputs=build_inputs(cancer_type))
+            descriptions = _descriptions_for(
+                cancer_type, parse_finalizer_output(result.raw)
+            )
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            print(f"[batch] failed: {cancer_type} ({elapsed:.1f}s): {e}")
+            return BatchItemResult(
+                cancer_type=cancer_type,
+                status="failed",
+                output_file=output_file,
+                elapsed_seconds=elapsed,
+                error=str(e),
+                telemetry=_telemetry_totals(crew_instance, "failed"),
+            )
+        elapsed = time.perf_counter() - started
+        print(f"[batch] finished: {cancer_type} ({elapsed:.1f}s)")
+        return BatchItemResult(
+            cancer_type=cancer_type,
+            status="success",
+            output_file=output_file,
+            elapsed_seconds=elapsed,
+            descriptions=descriptions,
+            telemetry=_telemetry_totals(crew_instance, "success"),
+        )
+
+
+async def run_batch_async(
+    cancer_types: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    output_dir: Optional[str] = None,
+    use_json_source: bool = False,
+    json_file_path: Optional[str] = None,
+    quiet: Optional[bool] = None,
+    telemetry_dir: Optional[str] = None,
+    shared_cancer_types: Optional[List[str]] = None,
+    fan_out: Optional[bool] = None,
+) -> List[BatchItemResult]:
+    """Run one crew per cancer type with at most ``concurrency`` in flight.
+
+    ``output_dir`` must be relative: CrewAI rejects absolute or ``..``
+    output_file paths. Results are returned in the order of ``cancer_types``.
+    ``quiet``, ``telemetry_dir``, ``shared_cancer_types`` and ``fan_out``
+    are passed to every ``CreateWsiKl``; JSON knowledge retrieval is scoped
+    to each run's own cancer type.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if output_dir is not None and (Path(output_dir).is_absolute() or ".." in Path(output_dir).parts):
+        raise ValueError(f"output_dir must be a relative path without '..': {output_dir}")
+    if output_dir is None:
+        output_dir = str(
+            Path(DEFAULT_OUTPUT_ROOT) / datetime.now().strftime("%Y%m%d_%H%M%S")
+        )
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    # De-duplicate while keeping order, and suffix colliding slugs, so two
+    # runs never share an output_file.
+    slugs = unique_slugs(cancer_types)
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(
+        *(
+            _run_one(
+                ct,
+                slug,
+                semaphore,
+                out,
+                use_json_source,
+                json_file_path,
+                quiet,
+                telemetry_dir,
+                shared_cancer_types,
+                fan_out,
+            )
+            for ct, slug in slugs.items()
+        )
+    )
+
+
+def run_batch(cancer_types: List[str], **kwargs: Any) -> List[BatchItemResult]:
+    """Synchronous wrapper around :func:`run_batch_async`."""
+    return asyncio.run(run_batch_async(cancer_types, **kwargs))
+
+
+def merge_corpus(results: List[BatchItemResult]) -> Dict[str, List[str]]:
+    """Merge successful finalizer dictionaries into one corpus mapping."""
+    return {r.cancer_type: r.descriptions for r in results if r.succeeded}
+
+
+def write_corpus(corpus: Dict[str, List[str]], path: str) -> None:
+    """Write the merged corpus atomically (temp file then rename)."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(corpus, f, indent=2, ensure_ascii=False)
+    tmp.replace(target)
+
+
+def write_report(results: List[BatchItemResult], path: str) -> None:
+    """Write the per-type success/failure report as JSON."""
+    report = {
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r.succeeded),
+        "failed": sum(1 for r in results if not r.succeeded),
+        "results": [asdict(r) for r in results],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def print_summary(results: List[BatchItemResult]) -> None:
+    """Print a one-line status per cancer type."""
+    print("\nBatch Summary:")
+    for r in results:
+        mark = "✓" if r.succeeded else "✗"
+        detail = f"{len(r.descriptions)} descriptions" if r.succeeded else r.error
+        print(f"  {mark} {r.cancer_type} ({r.elapsed_seconds:.1f}s): {detail}")
+    ok = sum(1 for r in results if r.succeeded)
+    print(f"  Succeeded: {ok}/{len(results)}")
@@ -0,0 +1,6 @@
+"""Benchmarks for the WSI crew (run with ``python -m create_wsi_kl.benchmarks.<name>``)."""
+
+
+def is_regression(before: float, now: float, tolerance: float, min_delta: float) -> bool:
+    """True when ``now`` is slower than ``before`` by both ``tolerance`` and ``min_delta``."""
+    return now - before > min_delta and now > before * (1 + tolerance)
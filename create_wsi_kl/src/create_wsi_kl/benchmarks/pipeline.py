@@ -0,0 +1,334 @@
+"""Offline pipeline benchmark on the deterministic local provider.
+
+Runs entirely without Gemini: the LLM is :class:`~create_wsi_kl.local_provider.FakeLLM`
+with a fixed ``--llm-latency`` and knowledge is embedded with the hash
+embedder, so the numbers show the pipeline's own overhead. For every corpus
+size (number of cancer types in a synthetic ``--json-source`` file, 15
+descriptions each) it times
+
+- ``crew_build``: ``CreateWsiKl(...).crew()`` including per-type knowledge,
+- ``ingestion``: loading and embedding every type of the corpus (the first
+  run is cold, later runs hit the embedding index),
+- ``pipeline_run``: one 4-stage ``kickoff``; ``overhead_seconds`` excludes the
+  simulated LLM latency (``--fan-out`` runs it with parallel section
+  generation, to compare against the single-shot default),
+- ``batch``: ``run_batch`` throughput over up to ``--batch-types`` types,
+- ``compare``: ``main._compare_descriptions`` on all corpus sentences.
+
+Everything runs in a temporary directory (caches, chroma storage, outputs).
+The JSON report can be stored and diffed; with ``--baseline`` the script
+exits non-zero when a median regresses (same rule as the startup benchmark).
+
+Usage::
+
+    python -m create_wsi_kl.benchmarks.pipeline --sizes 10 100 --output pipeline.json
+    python -m create_wsi_kl.benchmarks.pipeline --baseline pipeline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from create_wsi_kl.benchmarks import is_regression
+
+BENCHMARKS = ("crew_build", "ingestion", "pipeline_run", "batch", "compare")
+DESCRIPTIONS_PER_TYPE = 15
+
+_WORDS = (
+    "tumour cells nuclei stroma glands papillae necrosis mitotic cytoplasm clear "
+    "eosinophilic pleomorphism lymphovascular invasion architecture nests sheets "
+    "keratinisation desmoplastic border nucleoli chromatin vesicular infiltrative"
+).split()
+
+
+def synthetic_corpus(n_types: int, seed: int = 0) -> Dict[str, List[str]]:
+    """Deterministic ``{cancer_type: [sentences]}`` corpus of ``n_types`` entries."""
+    rng = random.Random(seed)
+    corpus = {}
+    for i in range(n_types):
+        sentences = []
+        for _ in range(DESCRIPTIONS_PER_TYPE):
+            words = rng.sample(_WORDS, rng.randint(8, 16))
+            sentences.append(" ".join(words).capitalize() + ".")
+        corpus[f"Synthetic Cancer Type {i:04d}"] = sentences
+    return corpus
+
+
+def _configure(workdir: Path, llm_latency: float, embed_latency: float) -> None:
+    os.environ.update(
+        {
+            "WSI_LLM_PROVIDER": "local",
+            "WSI_EMBEDDER_PROVIDER": "local",
+            "WSI_LOCAL_LLM_LATENCY": str(llm_latency),
+            "WSI_LOCAL_EMBED_LATENCY": str(embed_latency),
+            "WSI_CACHE_DIR": str(workdir / ".cache"),
+            "WSI_TASK_MEMO": "0",
+            "WSI_LLM_CACHE": "0",
+            "WSI_QUIET": "1",
+            # crewai stores knowledge under user_data_dir(<this>); an absolute
+            # path keeps the benchmark's chroma collections inside workdir.
+            "CREWAI_STORAGE_DIR": str(workdir / "crewai_storage"),
+            "CREWAI_DISABLE_TELEMETRY": "true",
+            "OTEL_SDK_DISABLED": "true",
+        }
+    )
+
+
+def _summarize(seconds: List[float], extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        "median_seconds": statistics.median(seconds),
+        "min_seconds": min(seconds),
+        "max_seconds": max(seconds),
+        "first_seconds": seconds[0],
+        "runs": len(seconds),
+    }
+    summary.update(extra or {})
+    return summary
+
+
+def _repeat(fn: Callable[[], Optional[Dict[str, Any]]], repeat: int) -> Dict[str, Any]:
+    seconds, extra = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extra = fn()
+        seconds.append(time.perf_counter() - started)
+    return _summarize(seconds, extra)
+
+
+def bench_crew_build(corpus_path: str, cancer_type: str, repeat: int) -> Dict[str, Any]:
+    from create_wsi_kl.crew import CreateWsiKl
+
+    def build() -> None:
+        CreateWsiKl(
+            use_json_source=True,
+            json_file_path=corpus_path,
+            cancer_type=cancer_type,
+            memoize_tasks=False,
+        ).crew()
+
+    return _repeat(build, repeat)
+
+
+def bench_ingestion(corpus_path: str, n_types: int, repeat: int) -> Dict[str, Any]:
+    from create_wsi_kl.embedding_index import build_embedder_config
+    from create_wsi_kl.json_knowledge import build_knowledge
+
+    def ingest() -> Dict[str, Any]:
+        knowledge = build_knowledge(
+            corpus_path, cancer_type=None, embedder=build_embedder_config(None)
+        )
+        return {"chunks": sum(len(s.chunks) for s in knowledge.sources) if knowledge else 0}
+
+    summary = _repeat(ingest, repeat)
+    summary["types_per_second"] = n_types / summary["median_seconds"]
+    return summary
+
+
+def bench_pipeline_run(
+    corpus_path: str, cancer_type: str, repeat: int, fan_out: bool = False
+) -> Dict[str, Any]:
+    from create_wsi_kl.batch import build_inputs
+    from create_wsi_kl.crew import CreateWsiKl
+    from create_wsi_kl.init_llm import get_default_llm
+
+    llm = get_default_llm()
+    seconds, overheads, calls = [], [], 0
+    for _ in range(repeat):
+        crew = CreateWsiKl(
+            use_json_source=True,
+            json_file_path=corpus_path,
+            cancer_type=cancer_type,
+            memoize_tasks=False,
+            fan_out=fan_out,
+        ).crew()
+        before = llm.stats()
+        started = time.perf_counter()
+        crew.kickoff(inputs=build_inputs(cancer_type))
+        elapsed = time.perf_counter() - started
+        after = llm.stats()
+        seconds.append(elapsed)
+        overheads.append(elapsed - (after["sleep_seconds"] - before["sleep_seconds"]))
+        calls = after["calls"] - before["calls"]
+    return _summarize(
+        seconds,
+        {"llm_calls": calls, "overhead_seconds": statistics.median(overheads)},
+    )
+
+
+def bench_batch(corpus_path: str, cancer_types: List[str], concurrency: int) -> Dict[str, Any]:
+    from create_wsi_kl.batch import run_batch
+
+    started = time.perf_counter()
+    results = run_batch(
+        cancer_types,
+        concurrency=concurrency,
+        output_dir=f"batch_{len(cancer_types)}_{int(started)}",
+        use_json_source=True,
+        json_file_path=corpus_path,
+        quiet=True,
+    )
+    elapsed = time.perf_counter() - started
+    return _summarize(
+        [elapsed],
+        {
+            "types": len(cancer_types),
+            "concurrency": concurrency,
+            "failed": sum(1 for r in results if not r.succeeded),
+            "types_per_second": len(cancer_types) / elapsed,
+        },
+    )
+
+
+def bench_compare(corpus: Dict[str, List[str]], repeat: int) -> Dict[str, Any]:
+    from create_wsi_kl.main import _compare_descriptions
+
+    existing = [d for descriptions in corpus.values() for d in descriptions]
+    new = list(reversed(existing))
+
+    def compare() -> Dict[str, Any]:
+        result = _compare_descriptions("synthetic", existing, new)
+        return {
+            "sentences": len(existing),
+            "overlapping": len(result["comparison"]["overlapping_content"]),
+        }
+
+    return _repeat(compare, repeat)
+
+
+def measure(
+    sizes: List[int],
+    repeat: int = 3,
+    llm_latency: float = 0.0,
+    embed_latency: float = 0.0,
+    batch_types: int = 8,
+    concurrency: int = 4,
+    benchmarks: Optional[List[str]] = None,
+    fan_out: bool = False,
+) -> Dict[str, Any]:
+    selected = benchmarks or list(BENCHMARKS)
+    results: Dict[str, Dict[str, Any]] = {name: {} for name in selected}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="wsi-bench-") as tmp:
+        workdir = Path(tmp)
+        _configure(workdir, llm_latency, embed_latency)
+        os.chdir(workdir)  # crew output files are written relative to cwd
+        try:
+            for size in sizes:
+                corpus = synthetic_corpus(size)
+                corpus_path = str(workdir / f"corpus_{size}.json")
+                with open(corpus_path, "w", encoding="utf-8") as f:
+                    json.dump(corpus, f)
+                cancer_types = list(corpus)
+                runs = {
+                    "crew_build": lambda: bench_crew_build(corpus_path, cancer_types[0], repeat),
+                    "ingestion": lambda: bench_ingestion(corpus_path, size, repeat),
+                    "pipeline_run": lambda: bench_pipeline_run(corpus_path, cancer_types[0], repeat, fan_out),
+                    "batch": lambda: bench_batch(corpus_path, cancer_types[:batch_types], concurrency),
+                    "compare": lambda: bench_compare(corpus, repeat),
+                }
+                for name in selected:
+                    print(f"[bench] {name} size={size}", file=sys.stderr)
+                    try:
+                        results[name][str(size)] = runs[name]()
+                    except Exception as e:
+                        results[name][str(size)] = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "sizes": sizes,
+            "repeat": repeat,
+            "llm_latency": llm_latency,
+            "embed_latency": embed_latency,
+            "batch_types": batch_types,
+            "concurrency": concurrency,
+            "fan_out": fan_out,
+            "descriptions_per_type": DESCRIPTIONS_PER_TYPE,
+        },
+        "results": results,
+    }
+
+
+def check(
+    report: Dict[str, Any],
+    baseline: Optional[Dict[str, Any]] = None,
+    tolerance: float = 0.25,
+    min_delta: float = 0.05,
+) -> List[str]:
+    """Return human-readable violations (empty when everything passes)."""
+    problems = []
+    for name, by_size in report["results"].items():
+        for size, current in by_size.items():
+            if "error" in current:
+                problems.append(f"{name}[{size}] failed: {current['error']}")
+                continue
+            if not baseline:
+                continue
+            before = baseline.get("results", {}).get(name, {}).get(size, {}).get("median_seconds")
+            now = current.get("median_seconds")
+            if before is not None and now is not None and is_regression(before, now, tolerance, min_delta):
+                problems.append(f"{name}[{size}]: {before:.3f}s -> {now:.3f}s")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="WSI crew offline pipeline benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100],
+                        help="Corpus sizes (number of cancer types)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Simulated seconds per LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.0,
+                        help="Simulated seconds per embedding request")
+    parser.add_argument("--batch-types", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fan-out", action="store_true",
+                        help="Run pipeline_run with parallel section generation")
+    parser.add_argument("--only", choices=BENCHMARKS, nargs="+", help="Run a subset")
+    parser.add_argument("--output", type=str, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=str, help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    report = measure(
+        args.sizes,
+        repeat=args.repeat,
+        llm_latency=args.llm_latency,
+        embed_latency=args.embed_latency,
+        batch_types=args.batch_types,
+        concurrency=args.concurrency,
+        benchmarks=args.only,
+        fan_out=args.fan_out,
+    )
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = check(report, baseline, args.tolerance, args.min_delta)
+    report["violations"] = problems
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    for problem in problems:
+        print(f"REGRESSION: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Drive the rate limiter against a local quota-enforcing stub server.
+
+The stub speaks just enough of the OpenAI chat-completions API
+(``POST /v1/chat/completions``) and enforces a requests-per-window quota the
+way Gemini does: over quota it answers ``429`` with a ``Retry-After`` header
+and a ``RESOURCE_EXHAUSTED`` body. ``--error-rate`` adds random 503s on top.
+
+``--client http`` (default) sends plain ``urllib`` requests through a
+:class:`~create_wsi_kl.rate_limit.RateLimiter` and needs nothing but the
+standard library; ``--client llm`` sends them through
+:class:`~create_wsi_kl.rate_limited_llm.RateLimitedLLM` (crewai + litellm)
+pointed at the stub. Compare against ``--no-limit`` to see the difference.
+
+The JSON report holds the server's counters, the limiter's stats and the
+number of requests that failed; the script exits non-zero if any did.
+
+Usage::
+
+    python -m create_wsi_kl.benchmarks.rate_limit --requests 60 --workers 16 --quota 10 --window 1
+    python -m create_wsi_kl.benchmarks.rate_limit --no-limit
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from create_wsi_kl.rate_limit import RateLimiter, TokenBucket
+
+
+class QuotaStubServer(ThreadingHTTPServer):
+    """Chat-completions stub allowing ``quota`` requests per ``window`` seconds."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        quota: int,
+        window: float = 60.0,
+        error_rate: float = 0.0,
+        latency: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.quota = quota
+        self.window = window
+        self.error_rate = error_rate
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.unavailable = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def admit(self) -> Optional[float]:
+        """``None`` when the request is served, else the retry delay in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start, self._window_count = now, 0
+            if self._window_count >= self.quota:
+                self.rejected += 1
+                return self._window_start + self.window - now
+            self._window_count += 1
+            self.accepted += 1
+            return None
+
+    def unlucky(self) -> bool:
+        with self._lock:
+            if self._rng.random() < self.error_rate:
+                self.unavailable += 1
+                return True
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "rejected_429": self.rejected,
+                "unavailable_503": self.unavailable,
+            }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: QuotaStubServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.server.unlucky():
+            self._send(503, {"error": {"code": 503, "status": "UNAVAILABLE", "message": "overloaded"}})
+            return
+        retry_after = self.server.admit()
+        if retry_after is not None:
+            self._send(
+                429,
+                {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "quota exceeded"}},
+                {"Retry-After": f"{max(retry_after, 0.0):.3f}"},
+            )
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+        self._send(
+            200,
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "ok"},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": max(1, len(prompt) // 4),
+                    "completion_tokens": 1,
+                    "total_tokens": max(1, len(prompt) // 4) + 1,
+                },
+            },
+        )
+
+
+def _http_client(base_url: str) -> Callable[[int], str]:
+    def send(i: int) -> str:
+        body = json.dumps({"model": "stub", "messages": [{"role": "user", "content": f"request {i}"}]})
+        request = urllib.request.Request(
+            f"{base_url}/chat/completions",
+            data=body.encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())["choices"][0]["message"]["content"]
+
+    return send
+
+
+def _llm_client(base_url: str, limiter: Optional[RateLimiter]) -> Callable[[int], str]:
+    from create_wsi_kl.rate_limited_llm import RateLimitedLLM
+
+    llm = RateLimitedLLM(
+        model="openai/stub", base_url=base_url, api_key="stub", limiter=limiter, max_tokens=16
+    )
+    return lambda i: llm.call(f"request {i}")
+
+
+def run(
+    requests: int = 60,
+    workers: int = 16,
+    quota: int = 10,
+    window: float = 1.0,
+    error_rate: float = 0.0,
+    latency: float = 0.0,
+    client: str = "http",
+    limit: bool = True,
+    rpm: float = 0.0,
+    max_concurrency: int = 8,
+    max_retries: int = 6,
+    base_delay: float = 0.1,
+) -> Dict[str, Any]:
+    server = QuotaStubServer(quota, window=window, error_rate=error_rate, latency=latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    limiter = None
+    if limit:
+        limiter = RateLimiter(
+            name="stub",
+            requests_per_minute=rpm,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries,
+            base_delay=base_delay,
+            max_delay=max(window, base_delay),
+        )
+        # Bursts as large as a full minute only make sense for minute windows.
+        limiter.requests = TokenBucket(rpm, capacity=max(1.0, rpm * window / 60.0))
+    try:
+        if client == "llm":
+            send = _llm_client(server.base_url, limiter)
+        else:
+            raw = _http_client(server.base_url)
+            send = raw if limiter is None else (lambda i: limiter.call(lambda: raw(i)))
+
+        errors: List[str] = []
+
+        def one(i: int) -> None:
+            try:
+                send(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(requests)))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        "config": {
+            "requests": requests,
+            "workers": workers,
+            "quota": quota,
+            "window": window,
+            "error_rate": error_rate,
+            "client": client,
+            "limit": limit,
+            "rpm": rpm,
+            "max_concurrency": max_concurrency,
+        },
+        "elapsed_seconds": elapsed,
+        "succeeded": requests - len(errors),
+        "failed": len(errors),
+        "errors": sorted(set(errors))[:5],
+        "server": server.stats(),
+        "limiter": limiter.stats() if limiter else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rate limiter check against a local 429 stub")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--quota", type=int, default=10, help="Requests allowed per window")
+    parser.add_argument("--window", type=float, default=1.0, help="Quota window in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of random 503s")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server seconds per request")
+    parser.add_argument("--client", choices=["http", "llm"], default="http")
+    parser.add_argument("--no-limit", action="store_true", help="Send requests without the limiter")
+    parser.add_argument("--rpm", type=float, default=0.0, help="Client-side requests per minute")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--base-delay", type=float, default=0.1)
+    parser.add_argument("--output", type=str, help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = run(
+        requests=args.requests,
+        workers=args.workers,
+        quota=args.quota,
+        window=args.window,
+        error_rate=args.error_rate,
+        latency=args.latency,
+        client=args.client,
+        limit=not args.no_limit,
+        rpm=args.rpm,
+        max_concurrency=args.max_concurrency,
+        max_retries=args.max_retries,
+        base_delay=args.base_delay,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
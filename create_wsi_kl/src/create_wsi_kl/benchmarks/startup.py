@@ -0,0 +1,192 @@
+"""Startup-time benchmark: per-module import time and time-to-first-agent.
+
+Every measurement runs in a fresh interpreter so module caches from earlier
+probes do not hide cold-start cost. The report is JSON so it can be stored and
+diffed between releases, and the script exits non-zero when
+
+- a module that must stay light (``LIGHT_MODULES``) pulls in crewai, docling,
+  litellm or chromadb, or
+- with ``--baseline``, a median import time regresses by more than
+  ``--tolerance`` (relative) and ``--min-delta`` seconds (absolute).
+
+Usage::
+
+    python -m create_wsi_kl.benchmarks.startup --repeat 5 --output startup.json
+    python -m create_wsi_kl.benchmarks.startup --baseline startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from create_wsi_kl.benchmarks import is_regression
+
+MODULES = [
+    "create_wsi_kl",
+    "create_wsi_kl.settings",
+    "create_wsi_kl.init_llm",
+    "create_wsi_kl.main",
+    "create_wsi_kl.batch",
+    "create_wsi_kl.rate_limit",
+    "create_wsi_kl.corpus_store",
+    "create_wsi_kl.docling_cache",
+    "create_wsi_kl.ingestion",
+    "create_wsi_kl.parallel_eval",
+    "create_wsi_kl.crew",
+]
+
+# Modules that local-only commands import; they must not load heavy packages.
+LIGHT_MODULES = {
+    "create_wsi_kl",
+    "create_wsi_kl.settings",
+    "create_wsi_kl.init_llm",
+    "create_wsi_kl.main",
+    "create_wsi_kl.batch",
+    "create_wsi_kl.rate_limit",
+    "create_wsi_kl.corpus_store",
+    "create_wsi_kl.docling_cache",
+    "create_wsi_kl.ingestion",
+    "create_wsi_kl.parallel_eval",
+}
+
+HEAVY_PACKAGES = ["crewai", "docling", "docling_core", "litellm", "chromadb"]
+
+_IMPORT_PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - started
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+_FIRST_AGENT_PROBE = """
+import json, time
+started = time.perf_counter()
+from create_wsi_kl.crew import CreateWsiKl
+imported = time.perf_counter()
+agent = CreateWsiKl().planning_agent()
+done = time.perf_counter()
+print(json.dumps({"import_seconds": imported - started, "seconds": done - started}))
+"""
+
+
+def _run_probe(code: str) -> Dict[str, Any]:
+    env = dict(os.environ)
+    # Agent construction needs a key but never talks to the network.
+    env.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {proc.returncode}"}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = wall
+    return result
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if "error" not in r]
+    if not ok:
+        return {"error": runs[0]["error"]}
+    seconds = [r["seconds"] for r in ok]
+    summary = {
+        "median_seconds": statistics.median(seconds),
+        "min_seconds": min(seconds),
+        "max_seconds": max(seconds),
+        "median_process_seconds": statistics.median(r["process_seconds"] for r in ok),
+        "runs": len(ok),
+    }
+    if "heavy" in ok[0]:
+        summary["heavy_imports"] = ok[0]["heavy"]
+    return summary
+
+
+def measure(repeat: int = 5, first_agent: bool = True) -> Dict[str, Any]:
+    modules = {}
+    for module in MODULES:
+        code = _IMPORT_PROBE.format(module=module, heavy=HEAVY_PACKAGES)
+        modules[module] = _summarize([_run_probe(code) for _ in range(repeat)])
+
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "modules": modules,
+    }
+    if first_agent:
+        report["time_to_first_agent"] = _summarize(
+            [_run_probe(_FIRST_AGENT_PROBE) for _ in range(repeat)]
+        )
+    return report
+
+
+def check(
+    report: Dict[str, Any],
+    baseline: Optional[Dict[str, Any]] = None,
+    tolerance: float = 0.25,
+    min_delta: float = 0.05,
+) -> List[str]:
+    """Return human-readable violations (empty when everything passes)."""
+    problems = []
+    for module in LIGHT_MODULES:
+        heavy = report["modules"].get(module, {}).get("heavy_imports")
+        if heavy:
+            problems.append(f"{module} imports heavy packages: {', '.join(heavy)}")
+
+    if baseline:
+        entries = dict(report["modules"])
+        base_entries = dict(baseline.get("modules", {}))
+        if "time_to_first_agent" in report:
+            entries["<time_to_first_agent>"] = report["time_to_first_agent"]
+            base_entries["<time_to_first_agent>"] = baseline.get("time_to_first_agent", {})
+        for name, current in entries.items():
+            before = base_entries.get(name, {}).get("median_seconds")
+            now = current.get("median_seconds")
+            if before is None or now is None:
+                continue
+            if is_regression(before, now, tolerance, min_delta):
+                problems.append(f"{name}: {before:.3f}s -> {now:.3f}s")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="WSI crew startup benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=str, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=str, help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta", type=float, default=0.05)
+    parser.add_argument("--skip-first-agent", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = measure(repeat=args.repeat, first_agent=not args.skip_first_agent)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = check(report, baseline, args.tolerance, args.min_delta)
+    report["violations"] = problems
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    for problem in problems:
+        print(f"REGRESSION: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""Per-task token budget for the context handed from one task to the next.
+
+In the sequential process every task receives the raw output of *all*
+earlier tasks, joined by crewai's ``----------`` divider. The plan and the
+generated description are long markdown documents, so the evaluator and the
+finalizer see ever larger prompts. :class:`BudgetedTask` measures that
+context before the agent runs and, when it exceeds the task's budget from
+``config/context_budget.yaml``, compacts it in increasingly lossy steps,
+stopping as soon as it fits:
+
+1. ``dedupe``      drop lines an upstream task repeated (the newest copy is
+   kept), horizontal rules and sections left without content
+2. ``select``      drop the sections of *earlier* outputs least related to
+   this task's description and expected output
+3. ``select_all``  the same for the most recent output
+4. ``truncate``    cut the remainder at the budget
+
+Compaction is deterministic, so memoized tasks keep hitting their stored
+outputs. Every hand-off is logged with the estimated prompt size (agent
+role, goal and backstory, task prompt and context) before and after, printed
+when the context was compacted, appended to ``.cache/context_budget.jsonl``
+and, with telemetry on, added to the run's trace.
+
+Budgets are opt-in and controlled from the environment (or ``.env``):
+
+- ``WSI_CONTEXT_BUDGET=1``                use ``config/context_budget.yaml``
+- ``WSI_CONTEXT_BUDGET=<path>``           use another budget file
+- ``WSI_CONTEXT_BUDGET_LOG_MAX_MB``       rotate the hand-off log to
+  ``context_budget.jsonl.1`` beyond this size (default 16)
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from crewai import Task
+from pydantic import PrivateAttr
+
+from create_wsi_kl.rate_limit import estimate_tokens
+from create_wsi_kl.settings import cache_dir, env_float
+from create_wsi_kl.task_memo import MemoizedTask
+
+BUDGET_FILE = Path(__file__).resolve().parent / "config" / "context_budget.yaml"
+# Separator of crewai's aggregate_raw_outputs_from_task_outputs.
+OUTPUT_DIVIDER = "\n\n----------\n\n"
+OMITTED_NOTE = "[Context budget: {count} less relevant section(s) of the upstream outputs omitted.]"
+TRUNCATED_NOTE = "\n\n[Context budget: truncated.]"
+# Shorter lines (list labels, "**Note:**") are not worth de-duplicating.
+MIN_DEDUPE_CHARS = 20
+
+DEFAULT_LOG_MAX_MB = 16
+
+_OFF = {"0", "off", "false", "no", "none"}
+_ON = {"1", "true", "yes", "on"}
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+_RULE = re.compile(r"^\s*([-*_=])(\s*\1){2,}\s*$")
+_MARKUP = re.compile(r"[*_`>#|]+")
+_WORD = re.compile(r"[a-z][a-z0-9-]{2,}")
+_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "are", "from", "all", "any", "its",
+    "must", "into", "each", "will", "should", "their", "other", "based", "such",
+    "including", "include", "clear", "specific", "detailed", "comprehensive",
+}
+
+
+def budget_path() -> Optional[Path]:
+    """Budget file in use, or ``None`` unless ``WSI_CONTEXT_BUDGET`` is set."""
+    value = (os.getenv("WSI_CONTEXT_BUDGET") or "").strip()
+    if not value or value.lower() in _OFF:
+        return None
+    return BUDGET_FILE if value.lower() in _ON else Path(value)
+
+
+@lru_cache(maxsize=8)
+def _load(path: Optional[Path]) -> Dict[str, Any]:
+    if path is None or not path.exists():
+        return {}
+    import yaml
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"Context budget file {path} must contain a mapping")
+    return data
+
+
+def task_budget(task_name: Optional[str]) -> Optional[int]:
+    """``max_context_tokens`` for ``task_name`` (its entry, else ``default``)."""
+    budgets = _load(budget_path())
+    settings = dict(budgets.get("default") or {})
+    if task_name:
+        settings.update((budgets.get("tasks") or {}).get(task_name) or {})
+    value = settings.get("max_context_tokens")
+    return int(value) if value is not None else None
+
+
+# ----------------------------------------------------------------------
+# Compaction
+# ----------------------------------------------------------------------
+@dataclass
+class _Section:
+    heading: str
+    lines: List[str]
+    output: int
+    score: float = 0.0
+
+    def render(self) -> str:
+        body = "\n".join(self.lines).strip("\n")
+        return "\n".join(part for part in (self.heading, body) if part)
+
+
+def _split_sections(text: str, output: int) -> List[_Section]:
+    sections = [_Section("", [], output)]
+    for line in text.splitlines():
+        if _HEADING.match(line):
+            sections.append(_Section(line.strip(), [], output))
+        else:
+            sections[-1].lines.append(line.rstrip())
+    return [s for s in sections if s.heading or any(line.strip() for line in s.lines)]
+
+
+def _line_key(line: str) -> str:
+    return " ".join(_MARKUP.sub(" ", line).split()).strip(" -+.:;").casefold()
+
+
+def _terms(text: str) -> Set[str]:
+    return {w for w in _WORD.findall(text.casefold()) if w not in _STOPWORDS}
+
+
+def _render(outputs: List[List[_Section]], omitted: int = 0) -> str:
+    rendered = [
+        re.sub(r"\n{3,}", "\n\n", "\n\n".join(s.render() for s in sections))
+        for sections in outputs
+    ]
+    text = OUTPUT_DIVIDER.join(r for r in rendered if r.strip())
+    if omitted:
+        text += "\n\n" + OMITTED_NOTE.format(count=omitted)
+    return text
+
+
+def _dedupe(outputs: List[List[_Section]]) -> None:
+    """Keep the newest copy of every repeated line; drop rules and emptied sections."""
+    seen: Set[str] = set()
+    for sections in reversed(outputs):
+        for section in sections:
+            kept = []
+            for line in section.lines:
+                if _RULE.match(line):
+                    continue
+                key = _line_key(line)
+                if len(key) >= MIN_DEDUPE_CHARS:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                kept.append(line)
+            section.lines = kept
+        sections[:] = [s for s in sections if any(line.strip() for line in s.lines)]
+
+
+def compact_context(context: str, budget: int, focus: str = "") -> Tuple[str, List[str]]:
+    """Shrink ``context`` to about ``budget`` tokens; returns the text and the steps used.
+
+    ``focus`` (the task's description and expected output) decides which
+    sections are kept when whole sections have to go.
+    """
+    if estimate_tokens(context) <= budget:
+        return context, []
+    steps = ["dedupe"]
+    outputs = [_split_sections(text, i) for i, text in enumerate(context.split(OUTPUT_DIVIDER))]
+    _dedupe(outputs)
+    text = _render(outputs)
+
+    focus_terms = _terms(focus)
+    for section in (s for sections in outputs for s in sections):
+        terms = _terms(section.render())
+        # Relevance per unit of size, so long generic sections go first.
+        section.score = len(terms & focus_terms) / math.sqrt(len(terms) + 1)
+
+    omitted = 0
+    earlier = [s for sections in outputs[:-1] for s in sections]
+    # The most relevant section of the latest output always stays.
+    latest = sorted(outputs[-1], key=lambda s: s.score)[:-1]
+    for step, candidates in (("select", earlier), ("select_all", latest)):
+        if estimate_tokens(text) <= budget or not candidates:
+            continue
+        steps.append(step)
+        # Least relevant first; among equals, earlier outputs go first.
+        for section in sorted(candidates, key=lambda s: (s.score, s.output)):
+            if estimate_tokens(text) <= budget:
+                break
+            outputs[section.output].remove(section)
+            omitted += 1
+            text = _render(outputs, omitted)
+
+    if estimate_tokens(text) > budget:
+        steps.append("truncate")
+        head = text[: max(0, budget * 4 - len(TRUNCATED_NOTE))]
+        # End on a line break when one is close, otherwise on a word.
+        cut = head.rfind("\n")
+        if cut < len(head) * 0.8:
+            cut = head.rfind(" ")
+        text = (head[:cut] if cut > 0 else head) + TRUNCATED_NOTE
+    return text, steps
+
+
+# ----------------------------------------------------------------------
+# Task integration
+# ----------------------------------------------------------------------
+@dataclass
+class ContextReport:
+    """Size of one task hand-off before and after compaction."""
+
+    task: str
+    budget: Optional[int]
+    context_tokens: int
+    compacted_context_tokens: int
+    prompt_tokens: int
+    compacted_prompt_tokens: int
+    steps: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def compacted(self) -> bool:
+        return bool(self.steps)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.prompt_tokens - self.compacted_prompt_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "compacted": self.compacted, "saved_tokens": self.saved_tokens}
+
+
+def _agent_text(agent: Any) -> str:
+    return "\n".join(
+        str(getattr(agent, name, "") or "") for name in ("role", "goal", "backstory")
+    )
+
+
+class BudgetedTask(Task):
+    """``Task`` that compacts its upstream context to the configured budget.
+
+    Like :class:`~create_wsi_kl.task_memo.MemoizedTask` it overrides
+    ``_execute_core``, which the sync, async and guardrail-retry paths share.
+    ``context_reports`` lists this task's hand-offs since the last
+    ``reset_context_reports``.
+    """
+
+    _context_reports: List[ContextReport] = PrivateAttr(default_factory=list)
+
+    @property
+    def context_reports(self) -> List[ContextReport]:
+        return list(self._context_reports)
+
+    def reset_context_reports(self) -> None:
+        self._context_reports = []
+
+    def _execute_core(
+        self,
+        agent: Optional[Any],
+        context: Optional[str],
+        tools: Optional[List[Any]],
+    ) -> Any:
+        if context:
+            context = self._apply_budget(agent or self.agent, context)
+        return super()._execute_core(agent, context, tools)
+
+    def _apply_budget(self, agent: Any, context: str) -> str:
+        started = time.perf_counter()
+        budget = task_budget(self.name)
+        base = estimate_tokens(_agent_text(agent)) + estimate_tokens(self.prompt())
+        compacted, steps = (context, []) if budget is None else compact_context(
+            context, budget, focus=f"{self.description}\n{self.expected_output}"
+        )
+        before, after = estimate_tokens(context), estimate_tokens(compacted)
+        report = ContextReport(
+            task=self.name or "",
+            budget=budget,
+            context_tokens=before,
+            compacted_context_tokens=after,
+            prompt_tokens=base + before,
+            compacted_prompt_tokens=base + after,
+            steps=steps,
+            seconds=time.perf_counter() - started,
+        )
+        self._context_reports.append(report)
+        record(report)
+        if report.compacted or getattr(agent, "verbose", False):
+            print(
+                f"[context-budget] {report.task}: prompt ~{report.prompt_tokens} -> "
+                f"~{report.compacted_prompt_tokens} tokens (context {before} -> {after}, "
+                f"budget {budget if budget is not None else 'none'}"
+                + (f"; {', '.join(steps)}" if steps else "") + ")"
+            )
+        return compacted
+
+
+class BudgetedMemoizedTask(BudgetedTask, MemoizedTask):
+    """Budgeted and memoized: the memo key is computed on the compacted context."""
+
+
+def budget_enabled() -> bool:
+    return budget_path() is not None
+
+
+_LOG_LOCK = threading.Lock()
+
+
+def budget_log_path() -> Path:
+    return cache_dir() / "context_budget.jsonl"
+
+
+def record(report: ContextReport) -> None:
+    """Append ``report`` to the hand-off log, rotating it once it is too large."""
+    path = budget_log_path()
+    max_bytes = env_float("WSI_CONTEXT_BUDGET_LOG_MAX_MB", DEFAULT_LOG_MAX_MB) * 1024 * 1024
+    with _LOG_LOCK:
+        try:
+            if path.stat().st_size >= max_bytes:
+                path.replace(path.with_name(path.name + ".1"))
+        except FileNotFoundError:
+            pass
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": time.time(), **report.to_dict()}, ensure_ascii=False) + "\n")
+
+
+def summarize_log(path: Optional[Path] = None) -> Dict[str, Any]:
+    """Hand-offs, compactions and estimated prompt tokens over the whole log."""
+    stats = {"handoffs": 0, "compacted": 0, "prompt_tokens": 0, "compacted_prompt_tokens": 0}
+    try:
+        with open(path or budget_log_path(), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                stats["handoffs"] += 1
+                stats["compacted"] += bool(entry.get("compacted"))
+                stats["prompt_tokens"] += int(entry.get("prompt_tokens", 0))
+                stats["compacted_prompt_tokens"] += int(entry.get("compacted_prompt_tokens", 0))
+    except FileNotFoundError:
+        pass
+    return stats
+
+
+def print_stats() -> None:
+    """One-line summary of every logged hand-off, when budgets are on."""
+    if not budget_enabled():
+        return
+    stats = summarize_log()
+    if not stats["handoffs"]:
+        return
+    saved = stats["prompt_tokens"] - stats["compacted_prompt_tokens"]
+    share = saved / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+    print(
+        f"Context budget: {stats['compacted']} of {stats['handoffs']} hand-off(s) compacted, "
+        f"~{saved} prompt tokens saved ({share:.0%}) ({budget_log_path()})"
+    )
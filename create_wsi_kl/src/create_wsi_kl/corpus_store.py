@@ -0,0 +1,326 @@
+"""Append-only SQLite store of generated and validated description corpora.
+
+Every ``run``, ``batch``, ``serve`` job and ``validate`` invocation becomes a
+row in ``runs``; its id is the corpus *version*. The sentences it produced
+are appended to ``sentences`` with that version and a status:
+
+- ``generated``  finalizer output of a crew run
+- ``accepted``   selected by ``validate`` (or imported from a JSON corpus)
+- ``rejected``   scored by ``validate`` but not selected
+
+Sentences are never updated or deleted (triggers enforce it), so every
+earlier corpus can be reproduced. The corpus *at version N* holds, for each
+cancer type, the sentences of the newest version <= N that wrote that type,
+without its rejected sentences; ``status="accepted"`` restricts this to
+validated (or imported) versions. Only runs that finished successfully
+count: sentences of a run that is still going or failed are kept but never
+read back. ``export`` returns the same
+``{cancer_type: [sentences]}`` dictionary as ``cancer_descriptions.json``.
+
+The store lives in ``wsi_corpus.db`` at the project root; ``WSI_CORPUS_DB``
+names another file and ``WSI_CORPUS_DB=off`` stops commands from writing to
+it. Anywhere a corpus JSON path is accepted (``--json-source``,
+``--from-json``, ``validate --input``) a store path works too, optionally
+pinned to a version: ``wsi_corpus.db@12``.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from create_wsi_kl.settings import PROJECT_ROOT
+
+DEFAULT_DB_NAME = "wsi_corpus.db"
+STORE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+STATUSES = ("generated", "accepted", "rejected")
+RUN_SUCCESS = "success"
+
+_OFF = {"0", "off", "false", "no", "none"}
+
+_SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'running',
+    source      TEXT,
+    details     TEXT,
+    started_at  TEXT NOT NULL,
+    finished_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS cancer_types (
+    id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS sentences (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    version        INTEGER NOT NULL REFERENCES runs(id),
+    cancer_type_id INTEGER NOT NULL REFERENCES cancer_types(id),
+    position       INTEGER NOT NULL,
+    status         TEXT NOT NULL CHECK (status IN ('generated', 'accepted', 'rejected')),
+    score          REAL,
+    text           TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_sentences_type_version
+    ON sentences (cancer_type_id, version);
+CREATE INDEX IF NOT EXISTS idx_sentences_status_type_version
+    ON sentences (status, cancer_type_id, version);
+CREATE INDEX IF NOT EXISTS idx_runs_kind_status ON runs (kind, status);
+
+CREATE TRIGGER IF NOT EXISTS sentences_no_update BEFORE UPDATE ON sentences
+BEGIN SELECT RAISE(ABORT, 'sentences are append-only'); END;
+CREATE TRIGGER IF NOT EXISTS sentences_no_delete BEFORE DELETE ON sentences
+BEGIN SELECT RAISE(ABORT, 'sentences are append-only'); END;
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def store_path_from_env() -> Optional[Path]:
+    """Store that commands write to, or ``None`` when ``WSI_CORPUS_DB=off``."""
+    value = (os.getenv("WSI_CORPUS_DB") or "").strip()
+    if value.lower() in _OFF:
+        return None
+    return Path(value) if value else PROJECT_ROOT / DEFAULT_DB_NAME
+
+
+def parse_store_ref(ref: Union[str, Path]) -> Optional[Tuple[Path, Optional[int]]]:
+    """``corpus.db`` / ``corpus.db@<version>`` -> ``(path, version)``; ``None`` for other files."""
+    text = str(ref)
+    path, sep, version = text.rpartition("@")
+    if not sep or not version.isdigit():
+        path, version = text, ""
+    if Path(path).suffix.lower() not in STORE_SUFFIXES:
+        return None
+    return Path(path), int(version) if version else None
+
+
+def _statuses(status: Optional[str]) -> Tuple[str, ...]:
+    if status is None:
+        return ("generated", "accepted")
+    if status not in STATUSES:
+        raise ValueError(f"Unknown sentence status '{status}', expected one of {STATUSES}")
+    return (status,)
+
+
+class CorpusStore:
+    """Runs, cancer types and versioned sentences in one SQLite file."""
+
+    def __init__(self, path: Union[str, Path], create: bool = True):
+        self.path = Path(path)
+        if not create and not self.path.exists():
+            raise FileNotFoundError(f"Corpus store not found: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Short-lived connections: validate workers, batch and serve write concurrently.
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def start_run(
+        self, kind: str, source: Optional[str] = None, details: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """Open a run and return its id, which is the version its sentences get."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (kind, source, details, started_at) VALUES (?, ?, ?, ?)",
+                (kind, source, json.dumps(details) if details else None, _now()),
+            )
+            return int(cursor.lastrowid)
+
+    def finish_run(self, version: int, status: str = RUN_SUCCESS) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE id = ?",
+                (status, _now(), version),
+            )
+
+    def add_sentences(
+        self,
+        version: int,
+        cancer_type: str,
+        sentences: List[str],
+        status: str = "generated",
+        scores: Optional[Dict[str, float]] = None,
+    ) -> None:
+        _statuses(status)
+        scores = scores or {}
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO cancer_types (name) VALUES (?)", (cancer_type,))
+            (type_id,) = conn.execute(
+                "SELECT id FROM cancer_types WHERE name = ?", (cancer_type,)
+            ).fetchone()
+            conn.executemany(
+                "INSERT INTO sentences (version, cancer_type_id, position, status, score, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (version, type_id, i, status, scores.get(text), text)
+                    for i, text in enumerate(sentences)
+                ],
+            )
+
+    def add_validation(self, version: int, result: Dict[str, Any]) -> None:
+        """Record a ``validation.validate_and_select`` result: selected sentences
+        as ``accepted``, the remaining scored ones as ``rejected``."""
+        scores = result.get("scores") or {}
+        selected = list(result["selected"])
+        chosen = set(selected)
+        rejected = [text for text in scores if text not in chosen]
+        self.add_sentences(version, result["cancer_type"], selected, "accepted", scores)
+        if rejected:
+            self.add_sentences(version, result["cancer_type"], rejected, "rejected", scores)
+
+    def record(
+        self,
+        kind: str,
+        corpus: Dict[str, List[str]],
+        status: str = "generated",
+        source: Optional[str] = None,
+    ) -> int:
+        """Write a complete corpus as one finished run; returns its version."""
+        version = self.start_run(kind, source)
+        for cancer_type, sentences in corpus.items():
+            self.add_sentences(version, cancer_type, sentences, status)
+        self.finish_run(version)
+        return version
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def latest_version(self) -> Optional[int]:
+        with self._connect() as conn:
+            (version,) = conn.execute(
+                "SELECT MAX(s.version) FROM sentences s JOIN runs r ON r.id = s.version "
+                "WHERE r.status = ?",
+                (RUN_SUCCESS,),
+            ).fetchone()
+        return version
+
+    def runs(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest runs first, with their sentence and cancer type counts."""
+        query = (
+            "SELECT r.id, r.kind, r.status, r.source, r.started_at, r.finished_at, "
+            "COUNT(s.id), COUNT(DISTINCT s.cancer_type_id) "
+            "FROM runs r LEFT JOIN sentences s ON s.version = r.id "
+            "GROUP BY r.id ORDER BY r.id DESC"
+        )
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        keys = ("version", "kind", "status", "source", "started_at", "finished_at",
+                "sentences", "cancer_types")
+        with self._connect() as conn:
+            return [dict(zip(keys, row)) for row in conn.execute(query)]
+
+    def iter_corpus(
+        self,
+        version: Optional[int] = None,
+        status: Optional[str] = None,
+        cancer_types: Optional[List[str]] = None,
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """Yield ``(cancer_type, sentences)`` of the corpus at ``version`` (default latest)."""
+        params: Dict[str, Any] = {"version": version, "run_status": RUN_SUCCESS}
+        marks = []
+        for i, value in enumerate(_statuses(status)):
+            params[f"status{i}"] = value
+            marks.append(f":status{i}")
+        type_filter = ""
+        if cancer_types is not None:
+            names = []
+            for i, value in enumerate(cancer_types):
+                params[f"type{i}"] = value
+                names.append(f":type{i}")
+            type_filter = f"AND ct.name IN ({', '.join(names) or 'NULL'})"
+        query = f"""
+            WITH chosen AS (
+                SELECT s.cancer_type_id, MAX(s.version) AS version FROM sentences s
+                JOIN runs r ON r.id = s.version
+                WHERE (:version IS NULL OR s.version <= :version)
+                  AND r.status = :run_status
+                  AND s.status IN ({', '.join(marks)})
+                GROUP BY s.cancer_type_id
+            )
+            SELECT ct.name, s.text FROM chosen c
+            JOIN sentences s ON s.cancer_type_id = c.cancer_type_id AND s.version = c.version
+            JOIN cancer_types ct ON ct.id = c.cancer_type_id
+            WHERE s.status IN ({', '.join(marks)}) {type_filter}
+            ORDER BY ct.id, s.id
+        """
+
+        current: Optional[str] = None
+        sentences: List[str] = []
+        with self._connect() as conn:
+            for name, text in conn.execute(query, params):
+                if name != current:
+                    if current is not None:
+                        yield current, sentences
+                    current, sentences = name, []
+                sentences.append(text)
+        if current is not None:
+            yield current, sentences
+
+    def export(
+        self,
+        version: Optional[int] = None,
+        status: Optional[str] = None,
+        cancer_types: Optional[List[str]] = None,
+    ) -> Dict[str, List[str]]:
+        return dict(self.iter_corpus(version, status, cancer_types))
+
+
+def open_store(ref: Union[str, Path]) -> Tuple[CorpusStore, Optional[int]]:
+    """Open an existing store reference (``path[@version]``) for reading."""
+    parsed = parse_store_ref(ref)
+    if parsed is None:
+        raise ValueError(f"{ref} is not a corpus store ({', '.join(STORE_SUFFIXES)})")
+    path, version = parsed
+    return CorpusStore(path, create=False), version
+
+
+def load_corpus(path: Union[str, Path]) -> Dict[str, List[str]]:
+    """Corpus dictionary from a JSON file or a store reference."""
+    if parse_store_ref(path) is not None:
+        store, version = open_store(path)
+        return store.export(version)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object in {path}")
+    return data
+
+
+def record_corpus(
+    kind: str,
+    corpus: Dict[str, List[str]],
+    status: str = "generated",
+    source: Optional[str] = None,
+) -> Optional[int]:
+    """Append ``corpus`` to the configured store; a failure only prints a warning."""
+    path = store_path_from_env()
+    if path is None or not corpus:
+        return None
+    try:
+        return CorpusStore(path).record(kind, corpus, status, source)
+    except sqlite3.Error as e:
+        print(f"Warning: could not write to corpus store {path}: {e}")
+        return None
@@ -1,13 +1,10 @@
 from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task
+from crewai.project import CrewBase, agent, crew, task, before_kickoff, after_kickoff
 from crewai.agents.agent_builder.base_agent import BaseAgent
 from typing import List, Dict, Any, Optional
-from .init_llm import _default_llm  # provides the configured Gemini LLM
+from .init_llm import get_llm  # builds the routed Gemini LLM on first use
+from .settings import env_flag
 import os
-import json
-from pathlib import Path
-from crewai.knowledge.source.crew_docling_source import CrewDoclingSource
-from crewai.knowledge.source.string_knowledge_source import StringKnowledgeSource
 
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
@@ -21,16 +18,58 @@ class CreateWsiKl:
     agents: List[BaseAgent]
     tasks: List[Task]
 
-    def __init__(self, use_json_source: bool = False, json_file_path: Optional[str] = None):
+    def __init__(
+        self,
+        use_json_source: bool = False,
+        json_file_path: Optional[str] = None,
+        output_file: str = "wsi_cancer_description.md",
+        memoize_tasks: Optional[bool] = None,
+        quiet: Optional[bool] = None,
+        telemetry_dir: Optional[str] = None,
+        cancer_type: Optional[str] = None,
+        shared_cancer_types: Optional[List[str]] = None,
+        stream_events: Optional[str] = None,
+        fan_out: Optional[bool] = None,
+    ):
         """Initialize the crew with optional JSON data source
         
         Args:
             use_json_source: If True, use JSON file as knowledge source instead of PDFs
             json_file_path: Path to JSON file containing cancer descriptions
+            output_file: Relative path the finalization task writes its result to
+            memoize_tasks: Reuse stored task outputs whose inputs are unchanged
+                (defaults to the WSI_TASK_MEMO environment switch)
+            quiet: Turn off verbose agent/crew console output
+                (defaults to the WSI_QUIET environment switch)
+            telemetry_dir: Write a per-run JSONL trace and Prometheus textfile
+                here (defaults to WSI_TELEMETRY_DIR, or telemetry/ when
+                WSI_TELEMETRY is set; disabled otherwise)
+            cancer_type: Restrict JSON knowledge retrieval to this cancer type
+                (plus the shared set); all types are searched when omitted
+            shared_cancer_types: JSON cancer types every run may retrieve from
+                (defaults to WSI_SHARED_CANCER_TYPES)
+            stream_events: Stream task outputs (and LLM chunks) to stdout and
+                append them to this JSONL file; the final markdown and JSON are
+                then written atomically when the run finishes
         """
         super().__init__()
         self.use_json_source = use_json_source
         self.json_file_path = json_file_path
+        self.output_file = output_file
+        self.memoize_tasks = memoize_tasks
+        self.embedder_config: Optional[Dict[str, Any]] = None
+        self.ingestion = None
+        self.verbose = not (env_flag("WSI_QUIET") if quiet is None else quiet)
+        self.telemetry_dir = telemetry_dir
+        self.telemetry = None
+        self.cancer_type = cancer_type
+        self.shared_cancer_types = shared_cancer_types
+        self.stream_events = stream_events
+        self.stream = None
+        self.fan_out = fan_out
+        from .finalizer_check import FinalizerGuardrail, check_enabled
+
+        self.finalizer_check = FinalizerGuardrail() if check_enabled() else None
 
     # Learn more about YAML configuration files here:
     # Agents: https://docs.crewai.com/concepts/agents#yaml-configuration-recommended
@@ -41,71 +80,191 @@ class CreateWsiKl:
     def planning_agent(self) -> Agent:
         return Agent(
             config=self.agents_config["planning_agent"],  # type: ignore[index]
-            verbose=True,
-            llm=_default_llm,
+            verbose=self.verbose,
+            llm=get_llm("planning_agent"),
         )
 
     @agent
     def description_generator(self) -> Agent:
-        return Agent(
+        from .fan_out import FanOutAgent, fan_out_enabled
+
+        enabled = fan_out_enabled() if self.fan_out is None else self.fan_out
+        return (FanOutAgent if enabled else Agent)(
             config=self.agents_config["description_generator"],  # type: ignore[index]
-            verbose=True,
-            llm=_default_llm,
+            verbose=self.verbose,
+            llm=get_llm("description_generator"),
         )
 
     @agent
     def description_evaluator(self) -> Agent:
         return Agent(
             config=self.agents_config["description_evaluator"],  # type: ignore[index]
-            verbose=True,
-            llm=_default_llm,
+            verbose=self.verbose,
+            llm=get_llm("description_evaluator"),
         )
 
     @agent
     def finalizer_agent(self) -> Agent:
         return Agent(
             config=self.agents_config["finalizer_agent"],  # type: ignore[index]
-            verbose=True,
-            llm=_default_llm,
+            verbose=self.verbose,
+            llm=get_llm("finalizer_agent"),
         )
 
+    def _task_class(self) -> type:
+        """Task class for the memoization and context budget switches.
+
+        Plain Task, MemoizedTask, BudgetedTask (upstream context compacted to
+        config/context_budget.yaml) or both.
+        """
+        from .context_budget import BudgetedMemoizedTask, BudgetedTask, budget_enabled
+        from .task_memo import MemoizedTask, memo_enabled
+
+        memo = memo_enabled() if self.memoize_tasks is None else self.memoize_tasks
+        if budget_enabled():
+            return BudgetedMemoizedTask if memo else BudgetedTask
+        return MemoizedTask if memo else Task
+
     # WSI Cancer Description Tasks
     @task
     def planning_task(self) -> Task:
-        return Task(
+        return self._task_class()(
             config=self.tasks_config["planning_task"],  # type: ignore[index]
         )
 
     @task
     def description_generation_task(self) -> Task:
-        return Task(
+        return self._task_class()(
             config=self.tasks_config["description_generation_task"],  # type: ignore[index]
         )
 
     @task
     def description_evaluation_task(self) -> Task:
-        return Task(
+        return self._task_class()(
             config=self.tasks_config["description_evaluation_task"],  # type: ignore[index]
         )
 
     @task
     def finalization_task(self) -> Task:
-        return Task(
+        # Malformed answers are retried on this task only, with the errors fed back
+        check = {}
+        if self.finalizer_check is not None:
+            check = {"guardrail": self.finalizer_check, "max_retries": self.finalizer_check.max_retries}
+        return self._task_class()(
             config=self.tasks_config["finalization_task"],  # type: ignore[index]
-            output_file="wsi_cancer_description.md",
+            # When streaming, RunStream writes the file atomically instead
+            output_file=None if self.stream_events else self.output_file,
+            **check,
         )
 
-    def load_json_descriptions(self, file_path: str) -> Dict[str, Any]:
-        """Load cancer descriptions from JSON file"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"JSON file not found: {file_path}")
-            return {}
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON file: {e}")
-            return {}
+    def set_output_file(self, output_file: str) -> None:
+        """Write the next kickoff's result to ``output_file`` (pooled crews serve many jobs)."""
+        self.output_file = output_file
+        task = self.finalization_task()
+        if task.output_file is not None:
+            task.output_file = output_file
+            # crewai re-interpolates output_file from its first value on every kickoff
+            task._original_output_file = None
+
+    @before_kickoff
+    def start_context_budget(self, inputs: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        for task in self.tasks:
+            if hasattr(task, "reset_context_reports"):
+                task.reset_context_reports()
+        return inputs
+
+    @after_kickoff
+    def complete_context_budget(self, output: Any) -> Any:
+        """Add this kickoff's hand-off sizes to telemetry.
+
+        CrewBase runs the hooks in definition order, so this runs while the
+        recorder is still open (``complete_telemetry`` is defined below).
+        """
+        if self.telemetry is not None:
+            for task in self.tasks:
+                for report in getattr(task, "context_reports", []):
+                    self.telemetry.record_context(report.to_dict())
+        return output
+
+    @before_kickoff
+    def start_finalizer_check(self, inputs: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if self.finalizer_check is not None:
+            self.finalizer_check.reset((inputs or {}).get("cancer_type") or self.cancer_type)
+            # crewai never resets the guardrail retry counter of a reused task
+            self.finalization_task().retry_count = 0
+        return inputs
+
+    @after_kickoff
+    def complete_finalizer_check(self, output: Any) -> Any:
+        """Record the check; defined above the telemetry/stream hooks, so it runs first."""
+        check = self.finalizer_check
+        if check is None or not check.attempts:
+            return output
+        summary = check.record()
+        if self.telemetry is not None:
+            self.telemetry.record_check("finalizer", summary)
+        if self.verbose or check.retries:
+            print(
+                f"[finalizer-check] {check.status} after {check.attempts} attempt(s), "
+                f"{len(check.fixes)} fix(es)"
+            )
+        if self.output_file and not self.stream_events:
+            # crewai saves the agent's raw answer; keep the normalized JSON instead
+            from pathlib import Path
+
+            from .stream import write_atomic
+
+            write_atomic(Path(self.output_file), output.raw)
+        return output
+
+    @before_kickoff
+    def start_telemetry(self, inputs: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Attach a fresh telemetry recorder for this kickoff when enabled."""
+        from .telemetry import RunTelemetry, telemetry_dir_from_env
+
+        output_dir = self.telemetry_dir or telemetry_dir_from_env()
+        if output_dir:
+            self.finish_telemetry("aborted")
+            self.telemetry = RunTelemetry(
+                output_dir=output_dir,
+                cancer_type=(inputs or {}).get("cancer_type", ""),
+            )
+        return inputs
+
+    @after_kickoff
+    def complete_telemetry(self, output: Any) -> Any:
+        self.finish_telemetry("success")
+        return output
+
+    def finish_telemetry(self, status: str) -> None:
+        """Flush the current telemetry run; a no-op when it is off or already finished."""
+        if self.telemetry is not None:
+            self.telemetry.finish(status)
+
+    @before_kickoff
+    def start_stream(self, inputs: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Attach a fresh event stream for this kickoff when streaming is on."""
+        if self.stream_events:
+            from .stream import RunStream
+
+            self.finish_stream("aborted")
+            self.stream = RunStream(
+                events_path=self.stream_events,
+                output_file=self.output_file,
+                cancer_type=(inputs or {}).get("cancer_type", ""),
+            )
+        return inputs
+
+    @after_kickoff
+    def complete_stream(self, output: Any) -> Any:
+        if self.stream is not None:
+            self.stream.finish("success", output)
+        return output
+
+    def finish_stream(self, status: str) -> None:
+        """Close the current event stream; a no-op when it is off or already closed."""
+        if self.stream is not None:
+            self.stream.finish(status)
 
     @crew
     def crew(self) -> Crew:
@@ -113,62 +272,72 @@ class CreateWsiKl:
         # To learn how to add knowledge sources to your crew, check out the documentation:
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
+        # Chunks already embedded with this model are read from .cache/embeddings
+        from .embedding_index import build_embedder_config
+
+        self.embedder_config = build_embedder_config(os.getenv("GEMINI_API_KEY"))
+
         # Initialize WSI Cancer knowledge sources
         knowledge_sources = []
+        knowledge = None
 
         if self.use_json_source and self.json_file_path:
-            # Scenario 2: Use JSON file as knowledge source
-            json_descriptions = self.load_json_descriptions(self.json_file_path)
-            if json_descriptions:
-                # Convert JSON descriptions to string format for knowledge source
-                descriptions_text = ""
-                for cancer_type, descriptions in json_descriptions.items():
-                    descriptions_text += f"\n\n=== {cancer_type} ===\n"
-                    if isinstance(descriptions, list):
-                        for desc in descriptions:
-                            descriptions_text += f"- {desc}\n"
-                    else:
-                        descriptions_text += f"{descriptions}\n"
-                
-                knowledge_sources.append(
-                    StringKnowledgeSource(
-                        content=descriptions_text,
-                        metadata={"source": "json_cancer_descriptions"}
-                    )
+            # Scenario 2: Use JSON file as knowledge source, one source per
+            # cancer type, searched only for this run's type and the shared set
+            from .json_knowledge import build_knowledge
+
+            try:
+                knowledge = build_knowledge(
+                    self.json_file_path,
+                    cancer_type=self.cancer_type,
+                    shared_types=self.shared_cancer_types,
+                    embedder=self.embedder_config,
                 )
+            except FileNotFoundError:
+                print(f"JSON file not found: {self.json_file_path}")
+            except ValueError as e:
+                print(f"Error parsing JSON file: {e}")
+            except Exception as e:
+                print(f"Failed to init knowledge: {e}")
         else:
-            # Scenario 1: Use PDF files as knowledge source
-            # Absolute path for existence check
-            _abs_knowledge_dir = Path(__file__).resolve().parents[2] / "knowledge"
-
-            # List of knowledge files to load (add new filenames here as needed)
-            knowledge_files = [
-                "camelyon16.pdf",
-                "tcga_lung.pdf", 
-                "tcga_renal.pdf",
-                "Pathoma 2021 - Kidney.pdf",
-            ]
-
-            for fname in knowledge_files:
-                abs_path = _abs_knowledge_dir / fname  # absolute path for validation
-                rel_path = (
-                    fname  # path relative to knowledge dir handled internally by CrewAI
-                )
-                if abs_path.exists():
-                    knowledge_sources.append(CrewDoclingSource(file_paths=[str(rel_path)]))
+            # Scenario 1: every supported file in knowledge/ (PDF, text, JSON, ...),
+            # selected by WSI_KNOWLEDGE_INCLUDE / WSI_KNOWLEDGE_EXCLUDE. Cache misses
+            # are converted on a process pool; converted chunks are reused from
+            # .cache/docling while the files are unchanged.
+            from .file_knowledge import knowledge_sources as ingested_sources
+            from .ingestion import ingest_knowledge
+
+            self.ingestion = ingest_knowledge()
+            if self.verbose:
+                self.ingestion.print()
+            knowledge_sources.extend(ingested_sources(self.ingestion))
+            if knowledge_sources:
+                # Same "crew" collection crewai would create, but searched
+                # through the retrieval query cache (.cache/query_cache.sqlite)
+                from crewai.knowledge.knowledge import Knowledge
+                from .query_cache import QueryCachingKnowledgeStorage
+
+                try:
+                    knowledge = Knowledge(
+                        collection_name="crew",
+                        sources=knowledge_sources,
+                        storage=QueryCachingKnowledgeStorage(
+                            embedder=self.embedder_config, collection_name="crew"
+                        ),
+                    )
+                    knowledge.add_sources()
+                    knowledge_sources = []
+                except Exception as e:
+                    print(f"Failed to init knowledge: {e}")
+                    knowledge = None
 
         return Crew(
             agents=self.agents,  # Automatically created by the @agent decorator
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
-            verbose=True,
+            verbose=self.verbose,
             # Sequential process ensures proper workflow: Planning -> Generation -> Evaluation -> Finalization
             knowledge_sources=knowledge_sources,
-            embedder={
-                "provider": "google",
-                "config": {
-                    "model": "models/text-embedding-004",
-                    "api_key": os.getenv("GEMINI_API_KEY"),
-                },
-            },
+            knowledge=knowledge,
+            embedder=self.embedder_config,
         )
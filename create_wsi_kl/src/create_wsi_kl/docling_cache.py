@@ -0,0 +1,108 @@
+"""On-disk cache of Docling conversions for the knowledge files.
+
+Docling layout analysis and OCR dominate crew start-up, yet the files in
+``knowledge/`` almost never change. The chunks produced from each converted
+file are stored under ``.cache/docling/<key>/`` where the key is the SHA-256
+of the file content, the installed docling and docling-core versions and the
+chunking variant. A cache entry is therefore invalidated only when the file
+bytes (or the converter or chunking) change, and it is shared by every process
+that uses the same cache directory. Conversion itself lives in
+:mod:`create_wsi_kl.ingestion`; this module only imports the standard library.
+
+Set ``WSI_DOCLING_CACHE=0`` to always reconvert.
+"""
+
+import hashlib
+import json
+import os
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from create_wsi_kl.settings import cache_dir, env_flag
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def converter_fingerprint() -> str:
+    """Versions that change the conversion or chunking result."""
+    return f"docling={_package_version('docling')};docling-core={_package_version('docling-core')}"
+
+
+def cache_enabled() -> bool:
+    return env_flag("WSI_DOCLING_CACHE", default=True)
+
+
+class DoclingConversionCache:
+    """Content-addressed store of the chunks of converted documents."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or cache_dir("docling")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._hash_index_path = self.root / "file_hashes.json"
+
+    # -- keys ---------------------------------------------------------------
+    def _load_hash_index(self) -> Dict[str, Dict[str, Union[int, float, str]]]:
+        try:
+            with open(self._hash_index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def file_sha256(self, path: Path) -> str:
+        """SHA-256 of ``path``; reuses the last digest while size/mtime match."""
+        stat = path.stat()
+        index = self._load_hash_index()
+        entry = index.get(str(path.resolve()))
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return str(entry["sha256"])
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        sha = digest.hexdigest()
+
+        index[str(path.resolve())] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": sha,
+        }
+        _atomic_write_text(self._hash_index_path, json.dumps(index, indent=2))
+        return sha
+
+    def key_for(self, path: Path, variant: str = "") -> str:
+        """Cache key of ``path``; ``variant`` names the chunking settings."""
+        blob = f"{self.file_sha256(path)}|{converter_fingerprint()}|{variant}"
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # -- entries ------------------------------------------------------------
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def load_chunks(self, key: str) -> Optional[List[str]]:
+        path = self._entry(key) / "chunks.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_chunks(self, key: str, chunks: List[str], source: Optional[Path] = None) -> None:
+        entry = self._entry(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        _atomic_write_text(entry / "chunks.json", json.dumps(chunks, ensure_ascii=False))
+        meta = {"source": str(source) if source else None, "fingerprint": converter_fingerprint()}
+        _atomic_write_text(entry / "meta.json", json.dumps(meta, indent=2))
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    tmp.replace(path)
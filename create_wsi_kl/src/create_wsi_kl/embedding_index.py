@@ -0,0 +1,356 @@
+"""Incremental, persistent embedding index for knowledge chunks.
+
+Every text the knowledge store embeds is keyed by ``sha256(model + text)``.
+Vectors live in append-only NumPy shards (``.cache/embeddings/shard-*.npy``)
+that are opened with ``mmap_mode="r"``, and a small SQLite table maps each key
+to its shard and row. Rebuilding the knowledge store after adding one PDF or
+editing one JSON entry therefore only embeds the new or changed chunks; every
+other vector is read straight from the memory-mapped shards.
+
+Every ``add_many`` call writes one shard, so small shards are merged into one
+whenever more than ``max_small_shards`` of them pile up (checked when the
+index is opened and after each append), and at most ``max_open_shards`` are
+kept memory-mapped at a time (least recently used are closed first).
+
+:class:`CachingEmbeddingFunction` is a chromadb ``EmbeddingFunction`` and is
+plugged into the crew through the ``custom`` embedder provider. Set
+``WSI_EMBEDDING_CACHE=0`` to fall back to the stock Google embedder.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from create_wsi_kl.rate_limit import RateLimiter, estimate_tokens, shared_limiter
+from create_wsi_kl.settings import cache_dir, env_flag, env_float, env_int
+
+DEFAULT_EMBEDDING_MODEL = "models/text-embedding-004"
+# batchEmbedContents accepts at most 100 texts per request.
+DEFAULT_BATCH_SIZE = 100
+MAX_OPEN_SHARDS = 32
+# Shards with fewer rows than this are merged once there are too many of them.
+SMALL_SHARD_ROWS = 4096
+MAX_SMALL_SHARDS = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    shard TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    dim INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vectors_model ON vectors(model);
+"""
+
+
+def chunk_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingIndex:
+    """Key → vector store backed by memory-mapped ``.npy`` shards."""
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        max_open_shards: int = MAX_OPEN_SHARDS,
+        max_small_shards: int = MAX_SMALL_SHARDS,
+    ):
+        self.root = root or cache_dir("embeddings")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_open_shards = max(1, max_open_shards)
+        self.max_small_shards = max_small_shards
+        self._lock = threading.Lock()
+        self._shards: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._conn = sqlite3.connect(
+            str(self.root / "index.sqlite"), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        with self._lock:
+            self._compact_locked()
+
+    def _shard_path(self, shard: str) -> Path:
+        return self.root / f"shard-{shard}.npy"
+
+    def _shard(self, shard: str) -> np.ndarray:
+        if shard in self._shards:
+            self._shards.move_to_end(shard)
+        else:
+            self._shards[shard] = np.load(self._shard_path(shard), mmap_mode="r")
+            while len(self._shards) > self.max_open_shards:
+                # Rows are returned as copies, so dropping the map closes the file.
+                self._shards.popitem(last=False)
+        return self._shards[shard]
+
+    def _lookup_locked(self, keys: List[str]) -> List[tuple]:
+        rows: List[tuple] = []
+        # SQLite caps bound parameters, so look keys up in slices.
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(
+                self._conn.execute(
+                    f"SELECT key, shard, row FROM vectors WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+            )
+        return rows
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the stored vectors for whichever of ``keys`` are present."""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            rows = self._lookup_locked(keys)
+            for attempt in range(2):
+                moved: List[str] = []
+                for key, shard, row in rows:
+                    try:
+                        found[key] = np.array(self._shard(shard)[row])
+                    except FileNotFoundError:
+                        # Another process compacted the shard since the lookup.
+                        moved.append(key)
+                if not moved or attempt:
+                    break
+                rows = self._lookup_locked(moved)
+        return found
+
+    def _write_shard(self, vectors: np.ndarray) -> str:
+        # Unique shard names let several processes append without coordination.
+        shard = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:12]}"
+        path = self._shard_path(shard)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, vectors)
+        tmp.replace(path)
+        return shard
+
+    def add_many(self, model: str, keys: List[str], vectors: np.ndarray) -> None:
+        """Append ``vectors`` as a new shard and index them under ``keys``."""
+        if not keys:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            shard = self._write_shard(vectors)
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, model, shard, row, dim, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (key, model, shard, row, vectors.shape[1], now)
+                    for row, key in enumerate(keys)
+                ],
+            )
+            self._conn.commit()
+            self._compact_locked()
+
+    def _small_shards(self) -> List[str]:
+        return [
+            shard
+            for (shard,) in self._conn.execute(
+                "SELECT shard FROM vectors GROUP BY shard HAVING COUNT(*) < ?",
+                (SMALL_SHARD_ROWS,),
+            )
+        ]
+
+    def _compact_locked(self) -> None:
+        """Merge the small shards into one once there are more than ``max_small_shards``."""
+        if len(self._small_shards()) <= self.max_small_shards:
+            return
+        # The write lock keeps other processes from compacting or re-pointing
+        # the same rows until the merged shard is in place.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            small = self._small_shards()
+            if len(small) <= self.max_small_shards:
+                self._conn.rollback()
+                return
+            placeholders = ",".join("?" * len(small))
+            rows = self._conn.execute(
+                f"SELECT key, shard, row, dim FROM vectors WHERE shard IN ({placeholders}) "
+                "ORDER BY shard, row",
+                small,
+            ).fetchall()
+            by_dim: Dict[int, List[tuple]] = {}
+            for key, shard, row, dim in rows:
+                by_dim.setdefault(dim, []).append((key, shard, row))
+            for dim_rows in by_dim.values():
+                vectors = np.stack([np.asarray(self._shard(shard)[row]) for _, shard, row in dim_rows])
+                merged = self._write_shard(vectors.astype(np.float32, copy=False))
+                self._conn.executemany(
+                    "UPDATE vectors SET shard = ?, row = ? WHERE key = ?",
+                    [(merged, i, key) for i, (key, _, _) in enumerate(dim_rows)],
+                )
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        for shard in small:
+            self._shards.pop(shard, None)
+            self._shard_path(shard).unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class GeminiBatchEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Gemini embedder that sends up to ``batch_size`` texts per request.
+
+    Each request goes through ``limiter`` (see rate_limit.py) when given, so
+    quota errors are retried with backoff instead of failing the ingestion.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        task_type: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        if not api_key:
+            raise ValueError("Please provide a Google API key.")
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model_name = model_name
+        self.task_type = task_type
+        self.batch_size = batch_size
+        self.limiter = limiter
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        def request() -> List[List[float]]:
+            response = self._genai.embed_content(
+                model=self.model_name, content=batch, task_type=self.task_type
+            )
+            return response["embedding"]
+
+        if self.limiter is None:
+            return request()
+        return self.limiter.call(request, tokens=sum(estimate_tokens(t) for t in batch))
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings: List[List[float]] = []
+        for start in range(0, len(input), self.batch_size):
+            embeddings.extend(self._embed_batch(list(input[start : start + self.batch_size])))
+        return embeddings
+
+
+class CachingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Embeds only texts missing from the :class:`EmbeddingIndex`."""
+
+    def __init__(
+        self,
+        inner: EmbeddingFunction,
+        model_name: str,
+        index: Optional[EmbeddingIndex] = None,
+    ):
+        self.inner = inner
+        self.model_name = model_name
+        self.index = index or EmbeddingIndex()
+        self.reused = 0
+        self.computed = 0
+        self.embed_seconds = 0.0
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = list(input)
+        keys = [chunk_key(self.model_name, t) for t in texts]
+        found = self.index.get_many(list(dict.fromkeys(keys)))
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            started = time.perf_counter()
+            vectors = np.asarray(self.inner(list(missing.values())), dtype=np.float32)
+            self.embed_seconds += time.perf_counter() - started
+            self.index.add_many(self.model_name, list(missing.keys()), vectors)
+            found.update(zip(missing.keys(), vectors))
+
+        self.computed += len(missing)
+        self.reused += len(texts) - len(missing)
+        return [np.asarray(found[key], dtype=np.float32) for key in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.reused + self.computed
+        return {
+            "model": self.model_name,
+            "reused": self.reused,
+            "computed": self.computed,
+            "reuse_rate": (self.reused / total) if total else 0.0,
+            "embed_seconds": self.embed_seconds,
+            "index_size": len(self.index),
+        }
+
+
+def cache_enabled() -> bool:
+    return env_flag("WSI_EMBEDDING_CACHE", default=True)
+
+
+def embedder_provider() -> str:
+    """``gemini`` (default) or ``local`` from ``WSI_EMBEDDER_PROVIDER``."""
+    return os.getenv("WSI_EMBEDDER_PROVIDER", "gemini").strip().lower() or "gemini"
+
+
+def build_embedder_config(
+    api_key: Optional[str], model_name: str = DEFAULT_EMBEDDING_MODEL
+) -> Dict[str, Any]:
+    """Crew ``embedder`` config, routed through the index unless disabled.
+
+    With ``WSI_EMBEDDER_PROVIDER=local`` the offline hash embedder replaces
+    Gemini (under its own model name, so the index never mixes the two).
+    """
+    if embedder_provider() == "local":
+        from create_wsi_kl.local_provider import LOCAL_EMBEDDING_MODEL, HashEmbeddingFunction
+
+        local = HashEmbeddingFunction(latency_seconds=env_float("WSI_LOCAL_EMBED_LATENCY", 0.0))
+        if not cache_enabled():
+            return {"provider": "custom", "config": {"embedder": local}}
+        return {
+            "provider": "custom",
+            "config": {"embedder": CachingEmbeddingFunction(local, LOCAL_EMBEDDING_MODEL)},
+        }
+
+    if not cache_enabled():
+        return {
+            "provider": "google",
+            "config": {"model": model_name, "api_key": api_key},
+        }
+    inner = GeminiBatchEmbeddingFunction(
+        api_key=api_key,
+        model_name=model_name,
+        batch_size=env_int("WSI_EMBEDDING_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+        limiter=shared_limiter("embedding"),
+    )
+    return {
+        "provider": "custom",
+        "config": {"embedder": CachingEmbeddingFunction(inner, model_name)},
+    }
+
+
+def print_stats(embedder_config: Optional[Dict[str, Any]]) -> None:
+    """Print reuse counters when the config wraps a caching embedder."""
+    embedder = (embedder_config or {}).get("config", {}).get("embedder")
+    if not isinstance(embedder, CachingEmbeddingFunction):
+        return
+    s = embedder.stats()
+    print(
+        f"Embedding index: {s['reused']} reused, {s['computed']} computed "
+        f"({s['reuse_rate']:.0%} reuse), {s['index_size']} vectors stored"
+    )
@@ -0,0 +1,90 @@
+"""Thread-scoped routing of crewai bus events to per-run listeners.
+
+The crewai event bus is process-wide and has no public way to unregister a
+handler, so run listeners (telemetry, streaming) do not register their
+handlers on it directly. :func:`attach` registers one dispatcher per event
+type, once per process, through the bus's public ``register_handler``, and
+binds the listener to the calling thread (the one running ``kickoff``). The
+dispatcher hands every event to the listeners bound to the thread that
+emitted it, so concurrent batch crews never see each other's events, and
+:func:`detach` only removes the listener from this registry.
+
+Work that a run hands to helper threads (the fan-out section writers) stays
+attributed to the run when the helper binds the run's listeners with
+:func:`bound`.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Set
+
+Handler = Callable[[Any, Any], None]
+
+_lock = threading.Lock()
+# Event types that already have a dispatcher on the bus.
+_dispatching: Set[type] = set()
+_handlers: Dict[Any, Dict[type, Handler]] = {}
+_threads: Dict[int, List[Any]] = {}
+
+
+def _dispatcher(event_type: type) -> Handler:
+    def dispatch(source: Any, event: Any) -> None:
+        with _lock:
+            targets = [
+                _handlers[listener][event_type]
+                for listener in _threads.get(threading.get_ident(), ())
+                if event_type in _handlers.get(listener, {})
+            ]
+        for handler in targets:
+            try:
+                handler(source, event)
+            except Exception as e:
+                print(f"[EventBus Error] Handler '{handler.__name__}' failed for event '{event_type.__name__}': {e}")
+
+    return dispatch
+
+
+def attach(bus: Any, listener: Any, handlers: Dict[type, Handler]) -> None:
+    """Route ``handlers`` of ``listener`` for events emitted on the calling thread."""
+    with _lock:
+        _handlers[listener] = dict(handlers)
+        _threads.setdefault(threading.get_ident(), []).append(listener)
+        new = [event_type for event_type in handlers if event_type not in _dispatching]
+        _dispatching.update(new)
+    for event_type in new:
+        bus.register_handler(event_type, _dispatcher(event_type))
+
+
+def detach(listener: Any) -> None:
+    """Stop routing events to ``listener`` on every thread."""
+    with _lock:
+        _handlers.pop(listener, None)
+        for ident in list(_threads):
+            remaining = [other for other in _threads[ident] if other is not listener]
+            if remaining:
+                _threads[ident] = remaining
+            else:
+                del _threads[ident]
+
+
+def current() -> List[Any]:
+    """Listeners bound to the calling thread."""
+    with _lock:
+        return list(_threads.get(threading.get_ident(), ()))
+
+
+@contextmanager
+def bound(listeners: List[Any]) -> Iterator[None]:
+    """Bind ``listeners`` (from :func:`current` on the run's thread) to this thread."""
+    ident = threading.get_ident()
+    with _lock:
+        previous = _threads.get(ident)
+        _threads[ident] = [listener for listener in listeners if listener in _handlers]
+    try:
+        yield
+    finally:
+        with _lock:
+            if previous is None:
+                _threads.pop(ident, None)
+            else:
+                _threads[ident] = previous
@@ -0,0 +1,192 @@
+"""Fan-out section generation for ``description_generation_task``.
+
+In the default single-shot mode one ``description_generator`` call writes the
+whole description (about nine sections), which is the longest generation of a
+run. With fan-out enabled (``--fan-out`` / ``WSI_FAN_OUT=1``) the plan handed
+over by ``planning_task`` is split into its top-level markdown sections, each
+section is written by its own generator instance (same role, backstory, LLM
+and crew knowledge) on a thread pool, and the results are merged back in plan
+order. ``description_evaluation_task`` then receives the merged document
+exactly as it would the single-shot one.
+
+- ``WSI_FAN_OUT_WORKERS``       sections generated at once (default 4)
+- ``WSI_FAN_OUT_MAX_SECTIONS``  upper bound; extra plan sections are grouped
+  (default 9)
+
+When the plan has fewer than two sections, the focus areas listed in the
+generation task are used instead. Token usage of the section writers is
+added to the generator's counter, so crew usage metrics and telemetry token
+totals stay complete. The worker threads are bound to the run's telemetry
+and stream listeners (:mod:`create_wsi_kl.event_scope`), so the writers' LLM
+calls, retrievals and streamed chunks are recorded under the generation task.
+"""
+
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from crewai import Agent, Task
+from pydantic import Field
+
+from create_wsi_kl import event_scope
+from create_wsi_kl.settings import env_flag, env_int
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_SECTIONS = 9
+
+# Focus areas of description_generation_task, used when the plan has no usable headers.
+DEFAULT_SECTIONS = [
+    "Morphological Identification Characteristics",
+    "Visual and Architectural Features",
+    "Cellular Characteristics",
+    "Tissue Architecture",
+    "Diagnostic Markers",
+    "Immunohistochemical Correlations",
+    "Histopathological Grading",
+    "Vascular and Lymphatic Involvement",
+    "Clinical Significance",
+]
+
+_HEADER = re.compile(r"^(#{1,4})[ \t]+(.+?)[ \t]*#*[ \t]*$", re.MULTILINE)
+
+
+def fan_out_enabled() -> bool:
+    return env_flag("WSI_FAN_OUT")
+
+
+@dataclass
+class PlanSection:
+    title: str
+    guidance: str = ""
+
+
+def _clean_title(title: str) -> str:
+    title = re.sub(r"[*_`]", "", title).strip()
+    return re.sub(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.)\s+", "", title).strip() or title
+
+
+def split_plan(
+    plan: str, max_sections: int = DEFAULT_MAX_SECTIONS
+) -> Tuple[str, List[PlanSection]]:
+    """Split ``plan`` at its shallowest header level that occurs at least twice.
+
+    Returns the text before the first section (title, overview) and the
+    sections; no sections when the plan has no such level. More than
+    ``max_sections`` sections are grouped into consecutive runs of roughly
+    equal size.
+    """
+    headers = [(len(m.group(1)), m.group(2), m.start(), m.end()) for m in _HEADER.finditer(plan)]
+    for level in sorted({h[0] for h in headers}):
+        selected = [h for h in headers if h[0] == level]
+        if len(selected) >= 2:
+            break
+    else:
+        return plan.strip(), []
+
+    sections = []
+    for i, (_, title, _, body_start) in enumerate(selected):
+        body_end = selected[i + 1][2] if i + 1 < len(selected) else len(plan)
+        sections.append(PlanSection(_clean_title(title), plan[body_start:body_end].strip()))
+
+    if len(sections) > max_sections > 0:
+        size = math.ceil(len(sections) / max_sections)
+        sections = [
+            PlanSection(
+                " / ".join(s.title for s in group),
+                "\n\n".join(f"{s.title}:\n{s.guidance}" for s in group),
+            )
+            for group in (sections[i : i + size] for i in range(0, len(sections), size))
+        ]
+    return plan[: selected[0][2]].strip(), sections
+
+
+def _section_task(parent: Task, section: PlanSection, index: int, titles: List[str]) -> Task:
+    others = ", ".join(t for t in titles if t != section.title)
+    return Task(
+        description=(
+            f"{parent.description}\n\n"
+            f"Several writers produce this document in parallel. Write ONLY section "
+            f"{index + 1} of {len(titles)}: \"{section.title}\". The other sections "
+            f"({others}) are written separately; do not repeat their content."
+        ),
+        expected_output=(
+            f"The markdown for the \"{section.title}\" section only, starting with the "
+            f"header \"## {section.title}\", in professional medical language."
+        ),
+    )
+
+
+def _with_header(title: str, text: str) -> str:
+    text = text.strip()
+    return text if text.startswith("#") else f"## {title}\n\n{text}"
+
+
+class FanOutAgent(Agent):
+    """Agent that writes its task section by section on parallel instances."""
+
+    fan_out_workers: int = Field(
+        default_factory=lambda: env_int("WSI_FAN_OUT_WORKERS", DEFAULT_WORKERS)
+    )
+    fan_out_max_sections: int = Field(
+        default_factory=lambda: env_int("WSI_FAN_OUT_MAX_SECTIONS", DEFAULT_MAX_SECTIONS)
+    )
+
+    def _section_writer(self) -> Agent:
+        writer = Agent(
+            role=self.role,
+            goal=self.goal,
+            backstory=self.backstory,
+            llm=self.llm,
+            verbose=False,
+            allow_delegation=False,
+            max_iter=self.max_iter,
+            knowledge=self.knowledge,
+        )
+        writer.crew = self.crew
+        return writer
+
+    def execute_task(
+        self,
+        task: Task,
+        context: Optional[str] = None,
+        tools: Optional[List[Any]] = None,
+    ) -> str:
+        preamble, sections = split_plan(context or "", self.fan_out_max_sections)
+        if not sections:
+            sections = [PlanSection(title) for title in DEFAULT_SECTIONS]
+        titles = [s.title for s in sections]
+        writers = [self._section_writer() for _ in sections]
+        # Events are routed by thread; pool threads report to this kickoff's listeners.
+        listeners = event_scope.current()
+
+        def write(i: int) -> str:
+            section = sections[i]
+            section_context = "\n\n".join(
+                part for part in (preamble, f"Plan for \"{section.title}\":\n{section.guidance}") if part
+            )
+            with event_scope.bound(listeners):
+                return writers[i].execute_task(
+                    _section_task(task, section, i, titles), context=section_context, tools=tools
+                )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, self.fan_out_workers)) as pool:
+            outputs = list(pool.map(write, range(len(sections))))
+        if self.verbose:
+            print(
+                f"[fan-out] {len(sections)} sections in {time.perf_counter() - started:.1f}s "
+                f"({self.fan_out_workers} workers)"
+            )
+
+        for writer in writers:
+            usage = writer._token_process.get_summary()
+            self._token_process.sum_prompt_tokens(usage.prompt_tokens)
+            self._token_process.sum_cached_prompt_tokens(usage.cached_prompt_tokens)
+            self._token_process.sum_completion_tokens(usage.completion_tokens)
+            self._token_process.sum_successful_requests(usage.successful_requests)
+
+        return "\n\n".join(_with_header(title, text) for title, text in zip(titles, outputs))
+
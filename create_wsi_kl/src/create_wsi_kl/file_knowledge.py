@@ -0,0 +1,40 @@
+"""Crew knowledge sources for files ingested from ``knowledge/``.
+
+:mod:`create_wsi_kl.ingestion` does the discovery, conversion and chunking;
+this module only hands the finished chunks to crewai so they are embedded
+into the crew's knowledge collection, tagged with the file they came from.
+"""
+
+from typing import Any, List
+
+from crewai.knowledge.source.base_knowledge_source import BaseKnowledgeSource
+from pydantic import Field
+
+from create_wsi_kl.ingestion import IngestionReport
+
+
+class IngestedFileSource(BaseKnowledgeSource):
+    """Pre-computed chunks of one knowledge file."""
+
+    file_name: str = Field(...)
+
+    def validate_content(self) -> None:
+        if not self.file_name:
+            raise ValueError("IngestedFileSource needs a file_name")
+
+    def model_post_init(self, _: Any) -> None:
+        self.validate_content()
+
+    def add(self) -> None:
+        if not self.storage:
+            raise ValueError("No storage found to save documents.")
+        self.storage.save(self.chunks, {"source": self.file_name})
+
+
+def knowledge_sources(report: IngestionReport) -> List[IngestedFileSource]:
+    """One source per ingested file that produced chunks."""
+    return [
+        IngestedFileSource(file_name=f.name, chunks=f.chunks, metadata={"source": f.name})
+        for f in report.files
+        if f.chunks
+    ]
@@ -0,0 +1,287 @@
+"""Structural validation of the finalizer's JSON answer, with targeted retry.
+
+``finalization_task`` must answer with one key equal to ``cancer_type`` whose
+value is 5-15 plain sentences of at most 25 words, each starting with a
+capital letter and ending with a period. :func:`check_finalizer_output`
+checks this locally (no LLM, well under a millisecond) and repairs what can
+be repaired without changing the content:
+
+- a key that differs only in case/spacing, or a single other key, is renamed
+- a string value is split into sentences
+- list markers, markdown emphasis and surplus whitespace are stripped
+- a missing final period is added
+- empty and duplicate sentences are dropped
+
+Anything else (not JSON, nested values, wrong sentence count, overlong
+sentences, a sentence ending in ``!``/``?`` or starting with a lowercase
+word) is an error. Letter case is never changed; a lowercase first token
+followed by a digit or capital ("p53", "pT1a", "mRNA") is accepted as is.
+:class:`FinalizerGuardrail` plugs the check into crewai's task guardrail, so
+a failed answer is sent back to the ``finalizer_agent`` alone together with
+the error list; planning, generation and evaluation never rerun. After
+``WSI_FINALIZER_RETRIES`` retries (default 2) an answer that is still
+structurally usable is accepted and recorded as failed; only an unusable
+answer fails the run.
+
+Every checked kickoff is appended to ``.cache/finalizer_checks.jsonl`` so
+pass rates and retry counts accumulate across runs (``summarize_checks``).
+``WSI_FINALIZER_CHECK=0`` turns the check off.
+"""
+
+import json
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from create_wsi_kl.batch import parse_finalizer_output
+from create_wsi_kl.settings import cache_dir, env_flag, env_int
+
+MIN_SENTENCES = 5
+MAX_SENTENCES = 15
+MAX_WORDS = 25
+DEFAULT_RETRIES = 2
+
+_MARKER = re.compile(r"^\s*(?:[-*•–]+|\d+[.)]|[a-z][.)])\s+", re.IGNORECASE)
+_EMPHASIS = re.compile(r"(\*\*|__|`)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z])")
+# Lowercase-led names that may open a sentence: p53, pT1a, mRNA.
+_LOWERCASE_NAME = re.compile(r"^[a-z]+[0-9A-Z]")
+
+
+def check_enabled() -> bool:
+    return env_flag("WSI_FINALIZER_CHECK", default=True)
+
+
+def max_retries_from_env() -> int:
+    return env_int("WSI_FINALIZER_RETRIES", DEFAULT_RETRIES)
+
+
+@dataclass
+class CheckResult:
+    """Outcome of checking one finalizer answer."""
+
+    corpus: Optional[Dict[str, List[str]]] = None
+    errors: List[str] = field(default_factory=list)
+    fixes: List[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.corpus is not None and not self.errors
+
+    @property
+    def usable(self) -> bool:
+        """Parsed into ``{cancer_type: [sentences]}``, even if rules are broken."""
+        return self.corpus is not None and any(self.corpus.values())
+
+    def to_json(self) -> str:
+        return json.dumps(self.corpus, indent=2, ensure_ascii=False)
+
+
+def _normalize_sentence(text: str) -> str:
+    text = _EMPHASIS.sub("", _MARKER.sub("", text))
+    text = " ".join(text.split()).strip(" \"'")
+    if not text:
+        return ""
+    if text[-1] in ".!?":
+        return text
+    text = text.rstrip(",;: ")
+    return text + "." if text else ""
+
+
+def check_finalizer_output(raw: str, cancer_type: Optional[str]) -> CheckResult:
+    """Validate and normalize a finalizer answer for ``cancer_type``."""
+    result = CheckResult()
+    try:
+        data = parse_finalizer_output(raw)
+    except ValueError as e:
+        result.errors.append(f"The answer is not a valid JSON object ({e}).")
+        return result
+
+    keys = list(data)
+    if not keys:
+        result.errors.append("The JSON object is empty; it needs exactly one key.")
+        return result
+    key = keys[0]
+    if cancer_type:
+        canonical = " ".join(cancer_type.split()).lower()
+        matching = [k for k in keys if " ".join(str(k).split()).lower() == canonical]
+        if matching:
+            key = matching[0]
+        elif len(keys) > 1:
+            result.errors.append(
+                f"The object has keys {keys}; it needs exactly one key, \"{cancer_type}\"."
+            )
+            return result
+        if len(keys) > 1:
+            result.fixes.append(f"dropped extra keys {[k for k in keys if k != key]}")
+        if key != cancer_type:
+            result.fixes.append(f"renamed key \"{key}\" to \"{cancer_type}\"")
+    elif len(keys) > 1:
+        result.errors.append(f"The object has {len(keys)} keys; it needs exactly one.")
+        return result
+
+    value = data[key]
+    if isinstance(value, str):
+        value = _SENTENCE_END.split(value.strip())
+        result.fixes.append("split a string value into sentences")
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        result.errors.append("The value must be an array of plain-text sentences (no nested objects).")
+        return result
+
+    sentences: List[str] = []
+    seen = set()
+    for original in value:
+        sentence = _normalize_sentence(original)
+        if sentence != original:
+            result.fixes.append(f"normalized \"{original.strip()[:40]}\"")
+        if not sentence or sentence.lower() in seen:
+            result.fixes.append("dropped an empty or duplicate sentence")
+            continue
+        seen.add(sentence.lower())
+        sentences.append(sentence)
+
+    if not MIN_SENTENCES <= len(sentences) <= MAX_SENTENCES:
+        result.errors.append(
+            f"There are {len(sentences)} sentences; provide between {MIN_SENTENCES} and {MAX_SENTENCES}."
+        )
+    for i, sentence in enumerate(sentences, 1):
+        words = len(sentence.split())
+        if words > MAX_WORDS:
+            result.errors.append(
+                f"Sentence {i} has {words} words (max {MAX_WORDS}); shorten it: \"{sentence}\""
+            )
+        if sentence[0].islower() and not _LOWERCASE_NAME.match(sentence):
+            result.errors.append(f"Sentence {i} must start with a capital letter: \"{sentence}\"")
+        if not sentence.endswith("."):
+            result.errors.append(
+                f"Sentence {i} must end with a period, not \"{sentence[-1]}\": \"{sentence}\""
+            )
+    result.corpus = {cancer_type or key: sentences}
+    return result
+
+
+class FinalizerGuardrail:
+    """crewai task guardrail running :func:`check_finalizer_output`.
+
+    ``reset`` starts a new kickoff; afterwards ``summary`` describes how the
+    answer fared and ``record`` appends it to the persistent check log.
+    """
+
+    def __init__(self, max_retries: Optional[int] = None):
+        self.max_retries = max_retries_from_env() if max_retries is None else max_retries
+        self.reset(None)
+
+    def reset(self, cancer_type: Optional[str]) -> None:
+        self.cancer_type = cancer_type
+        self.attempts = 0
+        self.attempt_errors: List[List[str]] = []
+        self.fixes: List[str] = []
+        self.status: Optional[str] = None
+        self.check_seconds = 0.0
+
+    def __call__(self, output: Any) -> Tuple[bool, Any]:
+        started = time.perf_counter()
+        result = check_finalizer_output(output.raw, self.cancer_type)
+        self.check_seconds += time.perf_counter() - started
+        self.attempts += 1
+        self.attempt_errors.append(result.errors)
+        if result.passed:
+            self.status, self.fixes = "passed", result.fixes
+            return True, result.to_json()
+        if self.attempts > self.max_retries and result.usable:
+            # Out of retries: keep a usable answer rather than failing the whole run.
+            self.status, self.fixes = "accepted_with_errors", result.fixes
+            print(f"[finalizer-check] accepting answer with {len(result.errors)} unresolved error(s)")
+            return True, result.to_json()
+        if self.attempts > self.max_retries:
+            self.status = "failed"
+        errors = "\n".join(f"- {e}" for e in result.errors)
+        return False, (
+            f"The JSON answer for \"{self.cancer_type}\" breaks the required format:\n{errors}\n"
+            "Return the corrected JSON object only."
+        )
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "cancer_type": self.cancer_type,
+            "status": self.status or "not_run",
+            "passed": self.status == "passed",
+            "first_try": self.status == "passed" and self.attempts == 1,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "errors": self.attempt_errors,
+            "fixes": len(self.fixes),
+            "check_seconds": round(self.check_seconds, 6),
+        }
+
+    def record(self) -> Optional[Dict[str, Any]]:
+        """Append this kickoff to the check log; no-op if the check never ran."""
+        if not self.attempts:
+            return None
+        summary = {"ts": time.time(), **self.summary()}
+        with _LOG_LOCK, open(check_log_path(), "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        return summary
+
+
+_LOG_LOCK = threading.Lock()
+
+
+def check_log_path() -> Path:
+    return cache_dir() / "finalizer_checks.jsonl"
+
+
+@dataclass
+class CheckStats:
+    runs: int = 0
+    passed: int = 0
+    first_try: int = 0
+    retries: int = 0
+
+    @property
+    def pass_rate(self) -> float:
+        return self.passed / self.runs if self.runs else 0.0
+
+    @property
+    def first_try_rate(self) -> float:
+        return self.first_try / self.runs if self.runs else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "pass_rate": self.pass_rate, "first_try_rate": self.first_try_rate}
+
+
+def summarize_checks(path: Optional[Path] = None) -> CheckStats:
+    """Pass and first-try rates over every recorded kickoff."""
+    stats = CheckStats()
+    try:
+        with open(path or check_log_path(), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                stats.runs += 1
+                stats.passed += bool(record.get("passed"))
+                stats.first_try += bool(record.get("first_try"))
+                stats.retries += int(record.get("retries", 0))
+    except FileNotFoundError:
+        pass
+    return stats
+
+
+def print_stats() -> None:
+    """One-line pass/retry summary of every recorded finalizer check."""
+    stats = summarize_checks()
+    if not stats.runs:
+        return
+    print(
+        f"Finalizer check: {stats.pass_rate:.0%} passed, {stats.first_try_rate:.0%} on the first try, "
+        f"{stats.retries} retries over {stats.runs} run(s) ({check_log_path()})"
+    )
@@ -0,0 +1,310 @@
+"""Discovery and parallel ingestion of the ``knowledge/`` directory.
+
+Every supported file under ``knowledge/`` is ingested, filtered by glob
+patterns matched against the path relative to ``knowledge/`` (or the bare
+file name):
+
+- ``WSI_KNOWLEDGE_INCLUDE``  patterns to ingest (default ``*``)
+- ``WSI_KNOWLEDGE_EXCLUDE``  patterns to skip (default
+  ``cancer_descriptions.json``, the corpus this crew produces and which
+  ``--json-source`` / ``validate`` read separately)
+
+Both accept ``,`` or ``;`` separated lists. Hidden files are always skipped.
+
+PDFs are converted by Docling ``WSI_INGEST_PAGES_PER_BATCH`` pages at a time
+(default 8) and each page batch is chunked as soon as it is converted, so a
+large textbook never has to be held in memory as one document. Other Docling
+formats (DOCX, HTML, Markdown, ...) are converted whole. Files missing from
+the Docling cache are converted on a process pool of ``WSI_INGEST_WORKERS``
+processes (default: up to 4); cached files and plain text / JSON files are
+handled in-process without starting the pool. Text and JSON are read as a
+stream and cut into the fixed-size, overlapping windows crewai uses for text
+sources.
+
+This module only imports the standard library at import time so that pool
+workers start quickly; Docling is imported inside the conversion function.
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from create_wsi_kl.docling_cache import DoclingConversionCache, cache_enabled
+from create_wsi_kl.settings import KNOWLEDGE_DIR, env_int
+
+DOCLING_SUFFIXES = {".pdf", ".docx", ".pptx", ".xlsx", ".html", ".htm", ".md", ".adoc"}
+TEXT_SUFFIXES = {".txt"}
+JSON_SUFFIXES = {".json"}
+SUPPORTED_SUFFIXES = DOCLING_SUFFIXES | TEXT_SUFFIXES | JSON_SUFFIXES
+
+DEFAULT_INCLUDE = ["*"]
+DEFAULT_EXCLUDE = ["cancer_descriptions.json"]
+DEFAULT_PAGES_PER_BATCH = 8
+DEFAULT_MAX_WORKERS = 4
+
+# Same window as crewai's BaseKnowledgeSource defaults.
+CHUNK_SIZE = 4000
+CHUNK_OVERLAP = 200
+
+
+def patterns_from_env(name: str, default: List[str]) -> List[str]:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return list(default)
+    return [p.strip() for p in value.replace(";", ",").split(",") if p.strip()]
+
+
+def default_workers() -> int:
+    return env_int("WSI_INGEST_WORKERS", min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1))
+
+
+def _matches(rel_path: str, patterns: List[str]) -> bool:
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatch(rel_path, p) or fnmatch(name, p) for p in patterns)
+
+
+def discover(
+    directory: Optional[Path] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[Path]:
+    """Supported files under ``directory`` selected by the include/exclude patterns."""
+    root = Path(directory or KNOWLEDGE_DIR)
+    if include is None:
+        include = patterns_from_env("WSI_KNOWLEDGE_INCLUDE", DEFAULT_INCLUDE)
+    if exclude is None:
+        exclude = patterns_from_env("WSI_KNOWLEDGE_EXCLUDE", DEFAULT_EXCLUDE)
+    if not root.is_dir():
+        return []
+
+    files = []
+    for path in sorted(root.rglob("*")):
+        rel = path.relative_to(root)
+        if not path.is_file() or path.suffix.lower() not in SUPPORTED_SUFFIXES:
+            continue
+        if any(part.startswith(".") for part in rel.parts):
+            continue
+        if _matches(rel.as_posix(), include) and not _matches(rel.as_posix(), exclude):
+            files.append(path)
+    return files
+
+
+# ----------------------------------------------------------------------
+# Chunking
+# ----------------------------------------------------------------------
+def iter_text_chunks(
+    pieces: Iterable[str], size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP
+) -> Iterator[str]:
+    """Cut a stream of text into ``size``-character windows overlapping by ``overlap``.
+
+    Only about one window is buffered at a time. Unlike slicing the whole
+    text, no trailing chunk is emitted that would repeat only the overlap.
+    """
+    buf = ""
+    fresh = False
+    for piece in pieces:
+        buf += piece
+        fresh = fresh or bool(piece)
+        while len(buf) >= size:
+            yield buf[:size]
+            buf = buf[size - overlap :]
+            fresh = len(buf) > overlap
+    if fresh and buf.strip():
+        yield buf
+
+
+def _iter_json_lines(path: Path) -> Iterator[str]:
+    """``key: value`` lines of a JSON file, one per list item for list values."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    items = data.items() if isinstance(data, dict) else enumerate(data if isinstance(data, list) else [data])
+    for key, value in items:
+        for item in value if isinstance(value, list) else [value]:
+            text = item if isinstance(item, str) else json.dumps(item, ensure_ascii=False)
+            yield f"{key}: {text}\n"
+
+
+def pdf_page_count(path: Path) -> int:
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(str(path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def iter_docling_chunks(path: Path, pages_per_batch: int = DEFAULT_PAGES_PER_BATCH) -> Iterator[str]:
+    """Docling chunks of ``path``; PDFs are converted ``pages_per_batch`` pages at a time."""
+    from docling.document_converter import DocumentConverter
+    from docling_core.transforms.chunker.hierarchical_chunker import HierarchicalChunker
+
+    converter = DocumentConverter()
+    chunker = HierarchicalChunker()
+    if path.suffix.lower() == ".pdf" and pages_per_batch > 0:
+        total = pdf_page_count(path)
+        ranges = [(s, min(total, s + pages_per_batch - 1)) for s in range(1, total + 1, pages_per_batch)]
+    else:
+        ranges = [None]
+    for page_range in ranges:
+        if page_range is None:
+            doc = converter.convert(path).document
+        else:
+            doc = converter.convert(path, page_range=page_range).document
+        for chunk in chunker.chunk(doc):
+            yield chunk.text
+        # Only the current page batch is ever held in memory.
+        del doc
+
+
+def _convert(path: str, pages_per_batch: int) -> Tuple[List[str], Optional[int], float]:
+    """Pool worker: chunks, page count (PDFs) and seconds spent on one file."""
+    started = time.perf_counter()
+    file_path = Path(path)
+    chunks = [c for c in iter_docling_chunks(file_path, pages_per_batch) if c.strip()]
+    pages = pdf_page_count(file_path) if file_path.suffix.lower() == ".pdf" else None
+    return chunks, pages, time.perf_counter() - started
+
+
+# ----------------------------------------------------------------------
+# Ingestion
+# ----------------------------------------------------------------------
+@dataclass
+class IngestedFile:
+    name: str
+    status: str  # "cached", "converted", "read" or "failed"
+    chunks: List[str] = field(default_factory=list, repr=False)
+    pages: Optional[int] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "chunks": len(self.chunks),
+            "pages": self.pages,
+            "seconds": round(self.seconds, 3),
+            "error": self.error,
+        }
+
+
+@dataclass
+class IngestionReport:
+    files: List[IngestedFile]
+    seconds: float
+    workers: int
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(len(f.chunks) for f in self.files)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files": [f.to_dict() for f in self.files],
+            "chunks": self.chunk_count,
+            "seconds": round(self.seconds, 3),
+            "workers": self.workers,
+        }
+
+    def print(self) -> None:
+        print(
+            f"Knowledge ingestion: {len(self.files)} file(s), {self.chunk_count} chunk(s) "
+            f"in {self.seconds:.1f}s ({self.workers} worker(s))"
+        )
+        for f in self.files:
+            pages = f"{f.pages} pages" if f.pages is not None else ""
+            line = f"  {f.name:<40} {f.status:<9} {pages:>10} {len(f.chunks):>6} chunks {f.seconds:>7.1f}s"
+            print(line + (f"  {f.error}" if f.error else ""))
+
+
+def _read_text_file(path: Path, name: str) -> IngestedFile:
+    started = time.perf_counter()
+    try:
+        if path.suffix.lower() in JSON_SUFFIXES:
+            chunks = list(iter_text_chunks(_iter_json_lines(path)))
+        else:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                chunks = list(iter_text_chunks(f))
+    except (OSError, ValueError) as e:
+        return IngestedFile(name, "failed", seconds=time.perf_counter() - started, error=str(e))
+    return IngestedFile(name, "read", chunks, seconds=time.perf_counter() - started)
+
+
+def ingest_knowledge(
+    directory: Optional[Path] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    pages_per_batch: Optional[int] = None,
+) -> IngestionReport:
+    """Chunk every discovered knowledge file, converting cache misses in parallel.
+
+    Files that fail to convert are reported with status ``"failed"`` and no
+    chunks instead of aborting the whole ingestion.
+    """
+    started = time.perf_counter()
+    root = Path(directory or KNOWLEDGE_DIR)
+    workers = max(1, workers if workers is not None else default_workers())
+    if pages_per_batch is None:
+        pages_per_batch = env_int("WSI_INGEST_PAGES_PER_BATCH", DEFAULT_PAGES_PER_BATCH)
+    variant = f"pages_per_batch={pages_per_batch}"
+    cache = DoclingConversionCache() if cache_enabled() else None
+
+    results: Dict[Path, IngestedFile] = {}
+    pending: List[Tuple[Path, Optional[str]]] = []
+    paths = discover(root, include, exclude)
+    for path in paths:
+        name = path.relative_to(root).as_posix()
+        if path.suffix.lower() not in DOCLING_SUFFIXES:
+            results[path] = _read_text_file(path, name)
+            continue
+        lookup_started = time.perf_counter()
+        key = cache.key_for(path, variant) if cache else None
+        chunks = cache.load_chunks(key) if key else None
+        if chunks is not None:
+            results[path] = IngestedFile(name, "cached", chunks, seconds=time.perf_counter() - lookup_started)
+        else:
+            pending.append((path, key))
+
+    def record(path: Path, key: Optional[str], converted: Tuple[List[str], Optional[int], float]) -> None:
+        chunks, pages, seconds = converted
+        if key:
+            cache.save_chunks(key, chunks, path)
+        results[path] = IngestedFile(path.relative_to(root).as_posix(), "converted", chunks, pages, seconds)
+
+    def failed(path: Path, error: Exception) -> None:
+        results[path] = IngestedFile(path.relative_to(root).as_posix(), "failed", error=str(error))
+
+    pool_size = min(workers, len(pending))
+    if pool_size <= 1:
+        for path, key in pending:
+            try:
+                record(path, key, _convert(str(path), pages_per_batch))
+            except Exception as e:
+                failed(path, e)
+    else:
+        # spawn: the caller may be multi-threaded (event bus, chromadb, asyncio).
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=pool_size, mp_context=context) as pool:
+            futures = {
+                pool.submit(_convert, str(path), pages_per_batch): (path, key) for path, key in pending
+            }
+            for future in as_completed(futures):
+                path, key = futures[future]
+                try:
+                    record(path, key, future.result())
+                except Exception as e:
+                    failed(path, e)
+
+    return IngestionReport(
+        files=[results[p] for p in paths],
+        seconds=time.perf_counter() - started,
+        workers=max(1, pool_size),
+    )
@@ -2,19 +2,24 @@ from __future__ import annotations
 
 """Central place to configure the default LLM for the package.
 
-This is executed on import (see __init__.py) so every Agent/Task that
-omits an explicit ``llm=...`` parameter will automatically use the
-Gemini model selected when you ran ``crewai create``.
+Importing this module only loads the project ``.env``; a Gemini ``LLM`` is
+built the first time :func:`get_llm` (or :func:`get_default_llm`) asks for it
+(normally when a crew creates its agents). That keeps crewai/litellm out of
+pure-local commands and lets them run without a ``GEMINI_API_KEY``.
 
 If you later want to change temperature/model etc. you only need to
-edit this file.
+edit this file; per-agent models are set in ``config/llm_routing.yaml``.
 """
 
+import json
 import os
+import threading
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
-from crewai import LLM  # type: ignore
+
+from .settings import env_flag, env_float
 
 # ---------------------------------------------------------------------------
 # Load environment variables
@@ -26,21 +31,135 @@ from crewai import LLM  # type: ignore
 _project_root = Path(__file__).resolve().parents[2]
 load_dotenv(_project_root / ".env", override=True)  # silently skip if missing
 
-# ---------------------------------------------------------------------------
-# Create the default Gemini LLM instance
-# ---------------------------------------------------------------------------
-_GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not _GEMINI_API_KEY:
-    raise RuntimeError(
-        "GEMINI_API_KEY not found in environment. Add it to your .env file or "
-        'export it in your shell (e.g. `export GEMINI_API_KEY="sk-..."`).'
-    )
-
-# You can tweak temperature, max_tokens, etc. here if desired.
-_default_llm = LLM(
+# You can tweak temperature, max_tokens, etc. here if desired. Per-agent
+# overrides live in config/llm_routing.yaml.
+DEFAULT_LLM_SETTINGS = dict(
     model="gemini/gemini-2.5-pro",
-    api_key=_GEMINI_API_KEY,
     temperature=0.2,
 )
 
-# Value re-exported for other modules to import.
+# One LLM per distinct settings (see llm_routing.py), shared by every agent
+# and crew that routes to the same settings.
+_llm_instances: Dict[str, Any] = {}
+_llm_lock = threading.Lock()
+_response_cache: Optional[Any] = None
+
+
+def llm_provider() -> str:
+    """``gemini`` (default) or ``local`` from ``WSI_LLM_PROVIDER``."""
+    return os.getenv("WSI_LLM_PROVIDER", "gemini").strip().lower() or "gemini"
+
+
+def _require_api_key() -> str:
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError(
+            "GEMINI_API_KEY not found in environment. Add it to your .env file or "
+            'export it in your shell (e.g. `export GEMINI_API_KEY="sk-..."`).'
+        )
+    return api_key
+
+
+def _build_llm(settings: Dict[str, Any]) -> Any:
+    # -----------------------------------------------------------------------
+    # Offline provider
+    # -----------------------------------------------------------------------
+    # WSI_LLM_PROVIDER=local swaps Gemini for the deterministic FakeLLM (see
+    # local_provider.py); WSI_LOCAL_LLM_LATENCY sets its per-call delay.
+    # -----------------------------------------------------------------------
+    if llm_provider() == "local":
+        from .local_provider import FakeLLM
+
+        return FakeLLM(
+            latency_seconds=env_float("WSI_LOCAL_LLM_LATENCY", 0.0),
+            jitter_seconds=env_float("WSI_LOCAL_LLM_JITTER", 0.0),
+            stream=env_flag("WSI_LLM_STREAM"),
+        )
+
+    from .rate_limit import shared_limiter
+    from .rate_limited_llm import RateLimitedLLM
+
+    # -----------------------------------------------------------------------
+    # Rate limiting
+    # -----------------------------------------------------------------------
+    # Every Gemini call waits for WSI_LLM_RPM / WSI_LLM_TPM budget and 429/503
+    # answers are retried with backoff (see rate_limit.py; WSI_RATE_LIMIT=0
+    # turns it off). WSI_LLM_STREAM=1 (``run --stream``) streams tokens as
+    # they arrive.
+    # -----------------------------------------------------------------------
+    llm_kwargs = dict(
+        settings,
+        api_key=_require_api_key(),
+        limiter=shared_limiter("llm"),
+        stream=env_flag("WSI_LLM_STREAM"),
+    )
+
+    # -----------------------------------------------------------------------
+    # Optional response cache
+    # -----------------------------------------------------------------------
+    # Set WSI_LLM_CACHE=1 to answer repeated prompts from the local SQLite
+    # cache (see llm_cache.py for the size/age limits and the bypass switch).
+    # -----------------------------------------------------------------------
+    from .llm_cache import CachedLLM, cache_enabled, default_cache
+
+    global _response_cache
+    if cache_enabled():
+        if _response_cache is None:
+            _response_cache = default_cache()
+        return CachedLLM(
+            cache=_response_cache,
+            bypass=env_flag("WSI_LLM_CACHE_BYPASS"),
+            **llm_kwargs,
+        )
+    return RateLimitedLLM(**llm_kwargs)
+
+
+def llm_settings(agent_name: Optional[str] = None) -> Dict[str, Any]:
+    """LLM settings for ``agent_name`` after per-agent routing (default when ``None``)."""
+    from .llm_routing import agent_llm_settings
+
+    return agent_llm_settings(agent_name, DEFAULT_LLM_SETTINGS)
+
+
+def get_llm(agent_name: Optional[str] = None) -> Any:
+    """Return the LLM routed to ``agent_name``, creating it on first use.
+
+    Agents whose routed settings are identical share one instance. The
+    offline provider ignores routing and always returns the same FakeLLM.
+    """
+    if llm_provider() == "local":
+        settings: Dict[str, Any] = {}
+        key = "local"
+    else:
+        settings = llm_settings(agent_name)
+        key = json.dumps(settings, sort_keys=True, default=str)
+    llm = _llm_instances.get(key)
+    if llm is None:
+        with _llm_lock:
+            llm = _llm_instances.get(key)
+            if llm is None:
+                llm = _llm_instances[key] = _build_llm(settings)
+    return llm
+
+
+def get_default_llm() -> Any:
+    """Return the shared default LLM (Gemini unless configured otherwise)."""
+    return get_llm(None)
+
+
+def built_llms() -> List[Any]:
+    """Every LLM some crew already created, in creation order."""
+    return list(_llm_instances.values())
+
+
+def default_llm_if_built() -> Optional[Any]:
+    """The first LLM some crew already created, else ``None``."""
+    llms = built_llms()
+    return llms[0] if llms else None
+
+
+def __getattr__(name: str) -> Any:
+    # Backwards compatible ``from create_wsi_kl.init_llm import _default_llm``.
+    if name == "_default_llm":
+        return get_default_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,270 @@
+"""Per-cancer-type knowledge from a cancer descriptions JSON file.
+
+``--json-source`` files map each cancer type to its list of descriptions; a
+corpus store reference (``wsi_corpus.db`` or ``wsi_corpus.db@<version>``, see
+:mod:`create_wsi_kl.corpus_store`) is read straight from SQLite instead.
+Instead of concatenating the whole file into one string, the file is streamed
+one top-level entry at a time and every wanted cancer type becomes its own
+knowledge source whose chunks carry ``cancer_type`` metadata. Retrieval is
+then filtered to the requested type plus an explicit shared set
+(``WSI_SHARED_CANCER_TYPES``), so a LUAD run never pulls renal or lymph-node
+chunks into its context. The collection name is keyed on a hash of the
+loaded descriptions, so chunks stored by earlier runs from an edited or
+trimmed file are never searched. Searches go through the retrieval query
+cache (:mod:`create_wsi_kl.query_cache`).
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from crewai.knowledge.knowledge import Knowledge
+from crewai.knowledge.source.base_knowledge_source import BaseKnowledgeSource
+from pydantic import Field
+
+from create_wsi_kl.corpus_store import open_store, parse_store_ref
+from create_wsi_kl.query_cache import QueryCachingKnowledgeStorage
+
+COLLECTION_NAME = "json_descriptions"
+SOURCE_NAME = "json_cancer_descriptions"
+SHARED_TYPES_SEPARATOR = ";"
+
+_WHITESPACE = " \t\n\r"
+
+
+def shared_types_from_env() -> List[str]:
+    """Cancer types listed in ``WSI_SHARED_CANCER_TYPES`` (``;``-separated)."""
+    value = os.getenv("WSI_SHARED_CANCER_TYPES", "")
+    return [t.strip() for t in value.split(SHARED_TYPES_SEPARATOR) if t.strip()]
+
+
+def iter_cancer_descriptions(
+    file_path: str, read_size: int = 64 * 1024
+) -> Iterator[Tuple[str, Any]]:
+    """Yield ``(cancer_type, descriptions)`` pairs from a top-level JSON object.
+
+    The file is read in ``read_size`` blocks and each entry is decoded as soon
+    as it is complete, so memory stays bounded by the largest single entry.
+    Raises ``ValueError`` (``json.JSONDecodeError``) on malformed input.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def more() -> bool:
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            block = f.read(read_size)
+            if not block:
+                eof = True
+                return False
+            buf = buf[pos:] + block
+            pos = 0
+            return True
+
+        def skip_ws() -> Optional[str]:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if not more():
+                    return None
+
+        def decode() -> Any:
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if more():
+                        continue
+                    raise
+                # A number at the very end of the buffer may still be growing.
+                if end == len(buf) and more():
+                    continue
+                pos = end
+                return value
+
+        def expect(char: str) -> None:
+            nonlocal pos
+            found = skip_ws()
+            if found != char:
+                raise json.JSONDecodeError(f"Expected '{char}'", buf, pos)
+            pos += 1
+
+        expect("{")
+        if skip_ws() == "}":
+            return
+        while True:
+            if skip_ws() != '"':
+                raise json.JSONDecodeError("Expected a cancer type key", buf, pos)
+            key = decode()
+            expect(":")
+            if skip_ws() is None:
+                raise json.JSONDecodeError("Unexpected end of file", buf, pos)
+            yield key, decode()
+            found = skip_ws()
+            pos += 1
+            if found == "}":
+                return
+            if found != ",":
+                raise json.JSONDecodeError("Expected ',' or '}'", buf, pos - 1)
+
+
+class CancerTypeKnowledgeSource(BaseKnowledgeSource):
+    """Descriptions of one cancer type, chunked on sentence boundaries."""
+
+    cancer_type: str = Field(...)
+    descriptions: List[str] = Field(default_factory=list)
+
+    def validate_content(self) -> None:
+        if not self.cancer_type:
+            raise ValueError("CancerTypeKnowledgeSource needs a cancer_type")
+
+    def model_post_init(self, _: Any) -> None:
+        self.validate_content()
+
+    def _chunk_descriptions(self) -> List[str]:
+        """Pack ``- description`` lines into chunks of at most ``chunk_size``.
+
+        Every chunk starts with the ``=== <cancer type> ===`` header so it is
+        self-describing and its content hash never collides with another type.
+        """
+        header = f"=== {self.cancer_type} ===\n"
+        chunks: List[str] = []
+        lines: List[str] = []
+        size = len(header)
+        for desc in self.descriptions:
+            line = f"- {desc}\n"
+            if lines and size + len(line) > self.chunk_size:
+                chunks.append(header + "".join(lines))
+                lines, size = [], len(header)
+            lines.append(line)
+            size += len(line)
+        if lines:
+            chunks.append(header + "".join(lines))
+        return chunks
+
+    def add(self) -> None:
+        self.chunks.extend(self._chunk_descriptions())
+        if not self.storage:
+            raise ValueError("No storage found to save documents.")
+        metadata = {"source": SOURCE_NAME, "cancer_type": self.cancer_type}
+        self.storage.save(self.chunks, [dict(metadata) for _ in self.chunks])
+
+
+class CancerTypeKnowledgeStorage(QueryCachingKnowledgeStorage):
+    """Knowledge storage whose searches only see the allowed cancer types.
+
+    The type filter is part of the query cache key, so cached results never
+    leak across types.
+    """
+
+    def __init__(
+        self,
+        cancer_types: Optional[List[str]] = None,
+        embedder: Optional[Dict[str, Any]] = None,
+        collection_name: Optional[str] = None,
+    ):
+        super().__init__(embedder=embedder, collection_name=collection_name)
+        self.cancer_types = cancer_types
+
+    def search(
+        self,
+        query: List[str],
+        limit: int = 3,
+        filter: Optional[dict] = None,
+        score_threshold: float = 0.35,
+    ) -> List[Dict[str, Any]]:
+        if filter is None and self.cancer_types:
+            filter = {"cancer_type": {"$in": list(self.cancer_types)}}
+        return super().search(query, limit=limit, filter=filter, score_threshold=score_threshold)
+
+
+def _iter_source(
+    file_path: str, cancer_types: Optional[List[str]] = None
+) -> Iterator[Tuple[str, Any]]:
+    """Entries of a descriptions JSON file or of a corpus store (``path.db[@version]``)."""
+    if parse_store_ref(file_path) is not None:
+        store, version = open_store(file_path)
+        return store.iter_corpus(version, cancer_types=cancer_types)
+    return iter_cancer_descriptions(file_path)
+
+
+def load_sources(
+    file_path: str, cancer_types: Optional[List[str]] = None
+) -> List[CancerTypeKnowledgeSource]:
+    """One knowledge source per wanted cancer type (all types when ``None``)."""
+    wanted = set(cancer_types) if cancer_types is not None else None
+    sources = []
+    for cancer_type, descriptions in _iter_source(file_path, cancer_types):
+        if wanted is not None and cancer_type not in wanted:
+            continue
+        if isinstance(descriptions, str):
+            descriptions = [descriptions]
+        sources.append(
+            CancerTypeKnowledgeSource(
+                cancer_type=cancer_type,
+                descriptions=[str(d) for d in descriptions],
+                metadata={"source": SOURCE_NAME, "cancer_type": cancer_type},
+            )
+        )
+    return sources
+
+
+def collection_name(sources: List[CancerTypeKnowledgeSource]) -> str:
+    """``json_descriptions_<hash>`` of the types and descriptions in ``sources``.
+
+    Chroma collections persist across runs; keying the name on the content
+    means a changed corpus gets a fresh collection instead of searching the
+    chunks left behind by the old one; corpus store versions
+    (``wsi_corpus.db@<version>``) with different sentences never share one.
+    """
+    digest = hashlib.sha256()
+    for source in sorted(sources, key=lambda s: s.cancer_type):
+        digest.update(json.dumps([source.cancer_type, source.descriptions], ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\0")
+    return f"{COLLECTION_NAME}_{digest.hexdigest()[:16]}"
+
+
+def build_knowledge(
+    file_path: str,
+    cancer_type: Optional[str] = None,
+    shared_types: Optional[List[str]] = None,
+    embedder: Optional[Dict[str, Any]] = None,
+) -> Optional[Knowledge]:
+    """Crew knowledge restricted to ``cancer_type`` plus ``shared_types``.
+
+    With no ``cancer_type`` every type is loaded and searched, matching the
+    old single-source behaviour. ``shared_types`` defaults to
+    ``WSI_SHARED_CANCER_TYPES``. Returns ``None`` when nothing was loaded.
+    """
+    if shared_types is None:
+        shared_types = shared_types_from_env()
+    allowed = None
+    if cancer_type is not None:
+        allowed = list(dict.fromkeys([cancer_type, *shared_types]))
+
+    sources = load_sources(file_path, allowed)
+    found = {s.cancer_type for s in sources}
+    for missing in [t for t in (allowed or []) if t not in found]:
+        print(f"Cancer type '{missing}' not found in {file_path}")
+    if not sources:
+        return None
+
+    name = collection_name(sources)
+    knowledge = Knowledge(
+        collection_name=name,
+        sources=sources,
+        storage=CancerTypeKnowledgeStorage(
+            cancer_types=allowed, embedder=embedder, collection_name=name
+        ),
+    )
+    knowledge.add_sources()
+    return knowledge
@@ -0,0 +1,247 @@
+"""Persistent on-disk cache for LLM responses.
+
+Responses are stored in a local SQLite database keyed on a SHA-256 of the
+model, the agent's full routed LLM settings (temperature, max tokens,
+timeout, ...), stop words and the full message list. Calls that offer tools
+are never cached, since their answers depend on tool side effects. Entries are
+evicted least-recently-used first once the store exceeds its size budget, and
+entries older than the configured age are dropped on access and on eviction.
+
+The cache is opt-in and controlled from the environment (or ``.env``):
+
+- ``WSI_LLM_CACHE=1``              enable the cache
+- ``WSI_LLM_CACHE_BYPASS=1``       skip lookups but still refresh stored answers
+- ``WSI_LLM_CACHE_MAX_MB``         size budget in megabytes (default 256)
+- ``WSI_LLM_CACHE_MAX_AGE_DAYS``   maximum entry age in days (default 30)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from create_wsi_kl.rate_limited_llm import RateLimitedLLM
+from create_wsi_kl.settings import cache_dir, env_flag, env_float
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created_at);
+"""
+
+
+def make_cache_key(
+    model: str,
+    temperature: Optional[float],
+    messages: Union[str, List[Dict[str, Any]]],
+    tools: Optional[List[dict]] = None,
+    stop: Optional[List[str]] = None,
+    settings: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Stable hash of everything that influences the model's answer.
+
+    ``settings`` are the remaining constructor arguments of the LLM (the
+    routed ``max_tokens``, ``timeout``, ``top_p``, ...).
+    """
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": messages,
+        "tools": tools or [],
+        "stop": list(stop or []),
+        "settings": settings or {},
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed LRU store for LLM responses, safe to share across threads."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            self.writes += 1
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float) -> None:
+        cur = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,)
+        )
+        self.evictions += max(cur.rowcount, 0)
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until we are back under budget.
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+# Keyed separately, irrelevant to the answer, or not hashable into a stable key.
+_UNKEYED_SETTINGS = {"model", "temperature", "stop", "api_key", "limiter", "stream", "callbacks"}
+
+
+class CachedLLM(RateLimitedLLM):
+    """``crewai.LLM`` that answers repeated prompts from a :class:`ResponseCache`.
+
+    Only plain-text answers to calls without tools are cached; whenever
+    ``tools`` or ``available_functions`` are passed the call always goes to
+    the provider because the answer depends on side effects. Cache hits never
+    touch the rate limiter.
+    """
+
+    def __init__(self, *args: Any, cache: ResponseCache, bypass: bool = False, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.bypass = bypass
+        self.cache_settings = {k: v for k, v in kwargs.items() if k not in _UNKEYED_SETTINGS}
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        from_task: Optional[Any] = None,
+        from_agent: Optional[Any] = None,
+    ) -> Union[str, Any]:
+        cacheable = not tools and not available_functions
+        key = make_cache_key(
+            self.model, self.temperature, messages, stop=self.stop, settings=self.cache_settings
+        )
+        if cacheable and not self.bypass:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = super().call(
+            messages,
+            tools=tools,
+            callbacks=callbacks,
+            available_functions=available_functions,
+            from_task=from_task,
+            from_agent=from_agent,
+        )
+        if cacheable and isinstance(response, str) and response:
+            self.cache.put(key, self.model, response)
+        return response
+
+
+def cache_enabled() -> bool:
+    return env_flag("WSI_LLM_CACHE")
+
+
+def default_cache() -> ResponseCache:
+    """Build the project cache from the ``WSI_LLM_CACHE_*`` settings."""
+    return ResponseCache(
+        cache_dir() / "llm_responses.sqlite",
+        max_bytes=int(env_float("WSI_LLM_CACHE_MAX_MB", 256) * 1024 * 1024),
+        max_age_seconds=env_float("WSI_LLM_CACHE_MAX_AGE_DAYS", 30) * 24 * 3600,
+    )
+
+
+def print_stats(llm: Any) -> None:
+    """Print hit/miss counters when ``llm`` is cache-backed."""
+    if not isinstance(llm, CachedLLM):
+        return
+    s = llm.cache.stats()
+    print(
+        f"LLM cache: {s['hits']} hits, {s['misses']} misses "
+        f"({s['hit_rate']:.0%} hit rate), {s['entries']} entries, "
+        f"{s['bytes'] / 1024:.0f} KiB at {s['path']}"
+    )
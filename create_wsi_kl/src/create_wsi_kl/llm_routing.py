@@ -0,0 +1,87 @@
+"""Per-agent LLM routing and token pricing.
+
+``config/llm_routing.yaml`` (or the file named by ``WSI_LLM_ROUTING``) picks
+the LLM settings for each agent of ``CreateWsiKl``::
+
+    default:                    # applies to every agent (on top of init_llm defaults)
+      model: gemini/gemini-2.5-pro
+    agents:
+      finalizer_agent:          # agent name as in agents.yaml
+        model: gemini/gemini-2.5-flash
+        temperature: 0.0
+        max_tokens: 4096
+        timeout: 120
+    pricing:                    # USD per million tokens, for cost reports
+      gemini/gemini-2.5-flash: {input: 0.30, output: 2.50}
+
+Any ``crewai.LLM`` keyword is accepted per agent; ``model``, ``temperature``,
+``max_tokens`` and ``timeout`` are the usual ones. Agents without an entry
+use ``default``. ``WSI_LLM_ROUTING=off`` ignores the file, so every agent uses
+the default model.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+ROUTING_FILE = Path(__file__).resolve().parent / "config" / "llm_routing.yaml"
+
+_OFF = {"0", "off", "false", "no", "none"}
+
+
+def routing_path() -> Optional[Path]:
+    """Routing file in use, or ``None`` when routing is switched off."""
+    value = (os.getenv("WSI_LLM_ROUTING") or "").strip()
+    if value.lower() in _OFF:
+        return None
+    return Path(value) if value else ROUTING_FILE
+
+
+@lru_cache(maxsize=8)
+def _load(path: Optional[Path]) -> Dict[str, Any]:
+    if path is None or not path.exists():
+        return {}
+    import yaml
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"LLM routing file {path} must contain a mapping")
+    return data
+
+
+def load_routing() -> Dict[str, Any]:
+    return _load(routing_path())
+
+
+def agent_llm_settings(agent_name: Optional[str], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """``defaults`` overlaid with the routing ``default`` and the agent's entry."""
+    routing = load_routing()
+    settings = dict(defaults)
+    settings.update(routing.get("default") or {})
+    if agent_name:
+        settings.update((routing.get("agents") or {}).get(agent_name) or {})
+    return settings
+
+
+def token_cost_usd(
+    model: Optional[str],
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_prompt_tokens: int = 0,
+) -> float:
+    """Cost of the given usage from the routing ``pricing`` table (0 if unpriced).
+
+    Cached prompt tokens are charged at ``cached_input`` when listed and at
+    ``input`` otherwise.
+    """
+    price = (load_routing().get("pricing") or {}).get(model or "")
+    if not price:
+        return 0.0
+    cached = min(cached_prompt_tokens, prompt_tokens)
+    return (
+        (prompt_tokens - cached) * float(price.get("input", 0))
+        + cached * float(price.get("cached_input", price.get("input", 0)))
+        + completion_tokens * float(price.get("output", 0))
+    ) / 1_000_000
@@ -0,0 +1,64 @@
+"""Token usage of each LLM call, kept on the thread that made the call.
+
+crewai counts tokens through litellm callbacks, and ``LLM.set_callbacks``
+installs every call's callbacks as litellm's process-wide callback list. With
+concurrent crews (batch, serve) or fan-out writers, litellm can hand one
+call's usage to another agent's counter, so ``agent._token_process`` is only
+approximate under concurrency.
+
+The project's LLMs (:class:`~create_wsi_kl.rate_limited_llm.RateLimitedLLM`,
+and through it ``CachedLLM``, plus the offline ``FakeLLM``) add a fresh
+:class:`UsageRecorder` to every call. crewai reports the response's usage to
+the call's own callbacks on the calling thread, right before it emits
+``LLMCallCompletedEvent``; the recorder ignores reports from any other
+thread (litellm's logging workers) and parks the usage in a thread-local, so
+an event listener on that thread can :func:`take` exactly its call's tokens.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from litellm.integrations.custom_logger import CustomLogger
+
+_local = threading.local()
+
+
+def _tokens(usage: Any) -> Dict[str, int]:
+    def get(obj: Any, name: str) -> Any:
+        return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+    details = get(usage, "prompt_tokens_details")
+    return {
+        "prompt_tokens": int(get(usage, "prompt_tokens") or 0),
+        "cached_prompt_tokens": int((get(details, "cached_tokens") if details else 0) or 0),
+        "completion_tokens": int(get(usage, "completion_tokens") or 0),
+    }
+
+
+class UsageRecorder(CustomLogger):
+    """litellm callback that records the usage of one call on its own thread."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.thread = threading.get_ident()
+        self.usage: Optional[Dict[str, int]] = None
+
+    def log_success_event(self, kwargs: Any, response_obj: Any, start_time: Any, end_time: Any) -> None:
+        if threading.get_ident() != self.thread or self.usage is not None:
+            return
+        usage = response_obj.get("usage") if isinstance(response_obj, dict) else None
+        if usage:
+            self.usage = _tokens(usage)
+            _local.usage = self.usage
+
+
+def with_recorder(callbacks: Optional[List[Any]]) -> List[Any]:
+    """``callbacks`` plus a :class:`UsageRecorder` for the call about to be made."""
+    return [*(callbacks or []), UsageRecorder()]
+
+
+def take() -> Optional[Dict[str, int]]:
+    """Usage recorded by the last call on this thread, cleared once read."""
+    usage = getattr(_local, "usage", None)
+    _local.usage = None
+    return usage
@@ -0,0 +1,231 @@
+"""Deterministic offline stand-ins for Gemini: a scripted LLM and a hash embedder.
+
+Selected with ``WSI_LLM_PROVIDER=local`` and ``WSI_EMBEDDER_PROVIDER=local``.
+Neither needs a network connection or ``GEMINI_API_KEY``, and the same prompt
+(or text) always produces the same answer (or vector), so benchmarks measure
+the pipeline's own overhead (crew builds, knowledge ingestion, task hand-offs)
+with a fixed, configurable model latency instead of Gemini's.
+
+:class:`FakeLLM` answers in the ReAct format the crewai agent executor
+expects, returns the one-key dictionary-of-list JSON for the finalization
+task, emits the same LLM call events as the real ``LLM`` (so telemetry keeps
+working) and reports estimated token usage to the call's callbacks (the
+agent's token counter and telemetry's per-call recorder).
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from crewai.llms.base_llm import BaseLLM
+from crewai.utilities.events import (
+    LLMCallCompletedEvent,
+    LLMCallStartedEvent,
+    LLMCallType,
+    LLMStreamChunkEvent,
+)
+from crewai.utilities.events.crewai_event_bus import crewai_event_bus
+
+from create_wsi_kl import llm_usage
+
+LOCAL_LLM_MODEL = "local/fake-llm"
+LOCAL_EMBEDDING_MODEL = "local/hash-embedding"
+DEFAULT_EMBEDDING_DIM = 768
+
+_FINALIZER_PATTERN = re.compile(r"summary for the validated (.+?) description")
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+_SUBJECTS = [
+    "Tumour cells", "The neoplastic glands", "Atypical nuclei", "The stroma",
+    "Infiltrating cells", "The lesion", "Necrotic foci", "Lymphovascular spaces",
+]
+_VERBS = [
+    "show", "display", "demonstrate", "contain", "form", "exhibit", "surround",
+]
+_OBJECTS = [
+    "clear cytoplasm with delicate vasculature", "papillary architecture",
+    "prominent nucleoli at high magnification", "solid nests and sheets",
+    "brisk mitotic activity", "desmoplastic stromal reaction",
+    "well-formed glandular structures", "focal keratinisation",
+    "moderate nuclear pleomorphism", "a pushing tumour border",
+]
+
+
+def _prompt_text(messages: Union[str, List[Dict[str, str]]]) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+
+def _estimate_tokens(text: str) -> int:
+    # Rough Gemini-like ratio; only used for relative comparisons.
+    return max(1, len(text) // 4)
+
+
+def scripted_response(prompt: str, sentences: int = 8) -> str:
+    """Deterministic answer for ``prompt`` in the shape the pipeline expects."""
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    lines = [
+        f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}."
+        for _ in range(sentences)
+    ]
+    if "Final Answer" not in prompt:
+        # Knowledge search query rewriting and other direct calls.
+        return lines[0].rstrip(".").lower()
+
+    finalizer = _FINALIZER_PATTERN.search(prompt)
+    if finalizer:
+        body = json.dumps({finalizer.group(1): lines}, indent=2, ensure_ascii=False)
+    else:
+        body = "## Findings\n\n" + "\n".join(f"- {line}" for line in lines)
+    return f"Thought: I now can give a great answer\nFinal Answer: {body}"
+
+
+class FakeLLM(BaseLLM):
+    """Scripted, deterministic LLM with configurable latency.
+
+    ``latency_seconds`` is slept on every call, plus up to ``jitter_seconds``
+    derived from the prompt hash (so it is deterministic too). ``responder``
+    replaces :func:`scripted_response` for custom scripts. With ``stream`` the
+    answer is also emitted word by word as ``LLMStreamChunkEvent``s, the
+    delay spread evenly over the chunks.
+    """
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.0,
+        jitter_seconds: float = 0.0,
+        sentences: int = 8,
+        responder: Optional[Callable[[str], str]] = None,
+        model: str = LOCAL_LLM_MODEL,
+        stream: bool = False,
+    ):
+        super().__init__(model=model, temperature=0.0)
+        self.stream = stream
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.sentences = sentences
+        self.responder = responder
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.sleep_seconds = 0.0
+
+    def _delay(self, prompt: str) -> float:
+        delay = self.latency_seconds
+        if self.jitter_seconds:
+            fraction = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+            delay += self.jitter_seconds * fraction
+        return delay
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        from_task: Optional[Any] = None,
+        from_agent: Optional[Any] = None,
+    ) -> Union[str, Any]:
+        crewai_event_bus.emit(
+            self,
+            event=LLMCallStartedEvent(
+                messages=messages,
+                tools=tools,
+                callbacks=callbacks,
+                available_functions=available_functions,
+                from_task=from_task,
+                from_agent=from_agent,
+            ),
+        )
+        callbacks = llm_usage.with_recorder(callbacks)
+        prompt = _prompt_text(messages)
+        delay = self._delay(prompt)
+        if self.responder is not None:
+            response = self.responder(prompt)
+        else:
+            response = scripted_response(prompt, self.sentences)
+        if self.stream:
+            self._stream_chunks(response, delay, from_task, from_agent)
+        elif delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.calls += 1
+            self.sleep_seconds += delay
+
+        usage = SimpleNamespace(
+            prompt_tokens=_estimate_tokens(prompt),
+            completion_tokens=_estimate_tokens(response),
+            prompt_tokens_details=None,
+        )
+        for callback in callbacks or []:
+            if hasattr(callback, "log_success_event"):
+                callback.log_success_event({}, {"usage": usage}, 0.0, delay)
+
+        crewai_event_bus.emit(
+            self,
+            event=LLMCallCompletedEvent(
+                response=response,
+                call_type=LLMCallType.LLM_CALL,
+                from_task=from_task,
+                from_agent=from_agent,
+            ),
+        )
+        return response
+
+    def _stream_chunks(
+        self, response: str, delay: float, from_task: Optional[Any], from_agent: Optional[Any]
+    ) -> None:
+        chunks = re.findall(r"\S+\s*|\s+", response) or [response]
+        for chunk in chunks:
+            if delay > 0:
+                time.sleep(delay / len(chunks))
+            crewai_event_bus.emit(
+                self,
+                event=LLMStreamChunkEvent(chunk=chunk, from_task=from_task, from_agent=from_agent),
+            )
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"model": self.model, "calls": self.calls, "sleep_seconds": self.sleep_seconds}
+
+
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Feature-hashing embedder: signed token counts folded into ``dim`` slots.
+
+    Texts sharing words get similar unit vectors, which is enough for chromadb
+    retrieval to behave sensibly in offline runs.
+    """
+
+    def __init__(self, dim: int = DEFAULT_EMBEDDING_DIM, latency_seconds: float = 0.0):
+        self.dim = dim
+        self.latency_seconds = latency_seconds
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if (value >> 63) & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            vector[0] = 1.0
+            return vector
+        return vector / norm
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        return [self._embed(text) for text in input]
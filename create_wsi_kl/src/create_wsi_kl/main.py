@@ -6,14 +6,47 @@ import os
 
 from datetime import datetime
 
-from create_wsi_kl.crew import CreateWsiKl
-
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
 # This main file is intended to be a way for you to run your
 # crew locally, so refrain from adding unnecessary logic into this file.
 # Replace with inputs you want to test with, it will automatically
 # interpolate any tasks and agents information
+#
+# crewai/docling/litellm are imported inside the commands that build a crew,
+# so local-only commands such as ``validate`` start instantly and do not need
+# a GEMINI_API_KEY.
+
+
+def _print_cache_stats(crew_instance=None):
+    """Print cache counters and telemetry for the finished command."""
+    from create_wsi_kl.init_llm import default_llm_if_built
+
+    # Routed LLMs share one response cache, so one of them reports for all.
+    llm = default_llm_if_built()
+    if llm is not None:
+        from create_wsi_kl.llm_cache import print_stats as print_llm_cache_stats
+
+        print_llm_cache_stats(llm)
+    from create_wsi_kl.rate_limit import print_stats as print_rate_limit_stats
+
+    print_rate_limit_stats()
+    from create_wsi_kl.finalizer_check import print_stats as print_finalizer_check_stats
+
+    print_finalizer_check_stats()
+    if crew_instance is not None and crew_instance.embedder_config:
+        from create_wsi_kl.embedding_index import print_stats as print_embedding_stats
+
+        print_embedding_stats(crew_instance.embedder_config)
+    # Only crew builds load these modules (and crewai with them).
+    for name in ("create_wsi_kl.query_cache", "create_wsi_kl.context_budget"):
+        module = sys.modules.get(name)
+        if module is not None:
+            module.print_stats()
+    if crew_instance is not None and crew_instance.telemetry is not None:
+        from create_wsi_kl.telemetry import print_summary as print_telemetry
+
+        print_telemetry(crew_instance.telemetry)
 
 
 def run():
@@ -21,16 +54,40 @@ def run():
     Run the WSI Cancer Description Multi-Agent System.
     """
     import argparse
-    
+    from create_wsi_kl.crew import CreateWsiKl
+
     parser = argparse.ArgumentParser(description="WSI Cancer Description Analysis")
     parser.add_argument("cancer_type", nargs="?", default="No Tumor (Negative Lymph Nodes)", 
                        help="Cancer type to analyze")
     parser.add_argument("--json-source", type=str, 
                        help="Path to JSON file containing cancer descriptions")
+    parser.add_argument("--shared-type", action="append", dest="shared_types",
+                       help="Cancer type from --json-source that is always retrievable; repeatable "
+                            "(default: WSI_SHARED_CANCER_TYPES, ';'-separated)")
+    parser.add_argument("--memoize", action="store_true", default=None,
+                       help="Reuse stored stage outputs whose inputs are unchanged (also WSI_TASK_MEMO=1)")
+    parser.add_argument("--quiet", action="store_true", default=None,
+                       help="Suppress verbose agent/crew output (also WSI_QUIET=1)")
+    parser.add_argument("--telemetry-dir", type=str,
+                       help="Write a JSONL trace and Prometheus textfile for this run here (also WSI_TELEMETRY=1)")
+    parser.add_argument("--fan-out", action="store_true", default=None,
+                       help="Generate description sections in parallel (also WSI_FAN_OUT=1)")
+    parser.add_argument("--stream", action="store_true",
+                       help="Print each stage's output as it completes, stream LLM tokens, and append "
+                            "events to a JSONL file")
+    parser.add_argument("--events-file", type=str,
+                       help="JSONL event file for --stream (default: wsi_cancer_description.events.jsonl)")
     
     args = parser.parse_args()
     
     cancer_type = args.cancer_type
+    stream_events = None
+    if args.stream or args.events_file:
+        from create_wsi_kl.stream import default_events_path
+
+        stream_events = args.events_file or default_events_path("wsi_cancer_description.md")
+        # The shared LLM is built lazily (by the crew below), so it picks this up
+        os.environ["WSI_LLM_STREAM"] = "1"
     use_json_source = args.json_source is not None
 
     inputs = {
@@ -46,56 +103,151 @@ def run():
         print(f"JSON Source: {args.json_source}")
     print("-" * 50)
 
+    crew_instance = None
     try:
         crew_instance = CreateWsiKl(
             use_json_source=use_json_source,
-            json_file_path=args.json_source
+            json_file_path=args.json_source,
+            memoize_tasks=args.memoize,
+            quiet=args.quiet,
+            telemetry_dir=args.telemetry_dir,
+            cancer_type=cancer_type,
+            shared_cancer_types=args.shared_types,
+            stream_events=stream_events,
+            fan_out=args.fan_out,
         )
         result = crew_instance.crew().kickoff(inputs=inputs)
         print(f"\nWSI Cancer Description completed successfully!")
         print(f"Output saved to: wsi_cancer_description.md")
+        _store_generated("run", cancer_type, result.raw)
+        if crew_instance.stream is not None:
+            if "json_file" in crew_instance.stream.outputs:
+                print(f"JSON saved to: {crew_instance.stream.outputs['json_file']}")
+            print(f"Events: {crew_instance.stream.events_path}")
+        _print_cache_stats(crew_instance)
         return result
     except Exception as e:
+        if crew_instance is not None:
+            crew_instance.finish_telemetry("failed")
+            crew_instance.finish_stream("failed")
         raise Exception(
             f"An error occurred while running the WSI cancer description system: {e}"
         )
 
 
-def train():
+def batch():
     """
-    Train the WSI Cancer Description crew for a given number of iterations.
+    Run the WSI Cancer Description crew for many cancer types concurrently.
     """
-    if len(sys.argv) < 3:
-        print(
-            "Usage: python main.py train <n_iterations> <training_file> [cancer_type]"
-        )
-        sys.exit(1)
+    import argparse
+    from create_wsi_kl import batch as batch_runner
+    from create_wsi_kl import corpus_store
+
+    parser = argparse.ArgumentParser(description="WSI Cancer Description Batch Analysis")
+    parser.add_argument("cancer_types", nargs="*",
+                       help="Cancer types to analyze")
+    parser.add_argument("--from-json", type=str,
+                       help="Analyze every cancer type (top-level key) in this JSON file")
+    parser.add_argument("--json-source", type=str,
+                       help="Path to JSON file containing cancer descriptions")
+    parser.add_argument("--shared-type", action="append", dest="shared_types",
+                       help="Cancer type from --json-source that is always retrievable; repeatable "
+                            "(default: WSI_SHARED_CANCER_TYPES, ';'-separated)")
+    parser.add_argument("--concurrency", type=int, default=batch_runner.DEFAULT_CONCURRENCY,
+                       help="Maximum number of crews running at the same time")
+    parser.add_argument("--output-dir", type=str,
+                       help="Relative directory for per-type outputs (default: batch_outputs/<timestamp>)")
+    parser.add_argument("--corpus-file", type=str,
+                       help="Merged corpus JSON path (default: <output-dir>/cancer_descriptions.json)")
+    parser.add_argument("--quiet", action="store_true", default=None,
+                       help="Suppress verbose agent/crew output (also WSI_QUIET=1)")
+    parser.add_argument("--telemetry-dir", type=str,
+                       help="Write one JSONL trace and Prometheus textfile per cancer type here")
+    parser.add_argument("--fan-out", action="store_true", default=None,
+                       help="Generate description sections in parallel (also WSI_FAN_OUT=1)")
+
+    args = parser.parse_args(_cli_args("batch"))
+
+    cancer_types = list(args.cancer_types)
+    if args.from_json:
+        cancer_types += batch_runner.load_cancer_types(args.from_json)
+    if not cancer_types:
+        parser.error("provide at least one cancer type or --from-json")
+    if args.output_dir and (os.path.isabs(args.output_dir) or ".." in args.output_dir.replace("\\", "/").split("/")):
+        # CrewAI rejects absolute and '..' output_file paths
+        parser.error("--output-dir must be a relative path without '..'")
+
+    output_dir = args.output_dir or os.path.join(
+        batch_runner.DEFAULT_OUTPUT_ROOT, datetime.now().strftime("%Y%m%d_%H%M%S")
+    )
+    corpus_file = args.corpus_file or os.path.join(output_dir, "cancer_descriptions.json")
+
+    print(f"Starting WSI Cancer Description batch for {len(cancer_types)} cancer type(s)")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"Output Directory: {output_dir}")
+    print("-" * 50)
 
-    cancer_type = "Clear Cell Renal Cell Carcinoma (ccRCC)"
-    if len(sys.argv) > 3:
-        cancer_type = sys.argv[3]
+    results = batch_runner.run_batch(
+        cancer_types,
+        concurrency=args.concurrency,
+        output_dir=output_dir,
+        use_json_source=args.json_source is not None,
+        json_file_path=args.json_source,
+        quiet=args.quiet,
+        telemetry_dir=args.telemetry_dir,
+        shared_cancer_types=args.shared_types,
+        fan_out=args.fan_out,
+    )
+
+    corpus = batch_runner.merge_corpus(results)
+    batch_runner.write_corpus(corpus, corpus_file)
+    batch_runner.write_report(results, os.path.join(output_dir, "batch_report.json"))
+    batch_runner.print_summary(results)
+    _print_cache_stats()
+    print(f"\nMerged corpus saved to: {corpus_file}")
+    version = corpus_store.record_corpus("batch", corpus, source=output_dir)
+    if version is not None:
+        print(f"Corpus store version: {version}")
+
+    if not all(r.succeeded for r in results):
+        sys.exit(1)
+    return results
 
-    inputs = {
-        "cancer_type": cancer_type,
-        "current_year": str(datetime.now().year),
-        "analysis_date": datetime.now().strftime("%Y-%m-%d"),
-    }
 
-    try:
-        CreateWsiKl().crew().train(
-            n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs
-        )
-        print(f"Training completed for {cancer_type} cancer descriptions")
-    except Exception as e:
-        raise Exception(
-            f"An error occurred while training the WSI cancer description crew: {e}"
-        )
+def train():
+    """
+    Train the WSI Cancer Description crew for a given number of iterations.
+    """
+    args = _eval_args(
+        "train", "training_file", "File the trained agent data is saved to",
+        "Answer every training feedback prompt with this text in parallel runs (default: empty)",
+    )
+    if not args.parallel:
+        from create_wsi_kl.crew import CreateWsiKl
+        from create_wsi_kl.batch import build_inputs
+
+        cancer_type = args.cancer_types[0]
+        try:
+            CreateWsiKl().crew().train(
+                n_iterations=args.n_iterations, filename=args.training_file,
+                inputs=build_inputs(cancer_type),
+            )
+            print(f"Training completed for {cancer_type} cancer descriptions")
+            _print_cache_stats()
+        except Exception as e:
+            raise Exception(
+                f"An error occurred while training the WSI cancer description crew: {e}"
+            )
+        return None
+    return _run_parallel_eval("train", args, feedback=args.feedback or "")
 
 
 def replay():
     """
     Replay the WSI Cancer Description crew execution from a specific task.
     """
+    from create_wsi_kl.crew import CreateWsiKl
+
     if len(sys.argv) < 2:
         print("Usage: python main.py replay <task_id>")
         sys.exit(1)
@@ -113,62 +265,151 @@ def test():
     """
     Test the WSI Cancer Description crew execution and returns the results.
     """
-    if len(sys.argv) < 3:
-        print("Usage: python main.py test <n_iterations> <eval_llm> [cancer_type]")
-        sys.exit(1)
+    args = _eval_args("test", "eval_llm", "LLM that scores every task output")
+    if not args.parallel:
+        from create_wsi_kl.crew import CreateWsiKl
+        from create_wsi_kl.batch import build_inputs
 
-    cancer_type = "Clear Cell Renal Cell Carcinoma (ccRCC)"
-    if len(sys.argv) > 3:
-        cancer_type = sys.argv[3]
+        cancer_type = args.cancer_types[0]
+        try:
+            result = (
+                CreateWsiKl()
+                .crew()
+                .test(n_iterations=args.n_iterations, eval_llm=args.eval_llm,
+                      inputs=build_inputs(cancer_type))
+            )
+            print(f"Testing completed for {cancer_type} cancer descriptions")
+            _print_cache_stats()
+            return result
+        except Exception as e:
+            raise Exception(
+                f"An error occurred while testing the WSI cancer description crew: {e}"
+            )
+    return _run_parallel_eval("test", args, eval_llm=args.eval_llm)
 
-    inputs = {
-        "cancer_type": cancer_type,
-        "current_year": str(datetime.now().year),
-        "analysis_date": datetime.now().strftime("%Y-%m-%d"),
-    }
 
-    try:
-        result = (
-            CreateWsiKl()
-            .crew()
-            .test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
-        )
-        print(f"Testing completed for {cancer_type} cancer descriptions")
-        return result
-    except Exception as e:
-        raise Exception(
-            f"An error occurred while testing the WSI cancer description crew: {e}"
-        )
+def _eval_args(mode, target, target_help, feedback_help=None):
+    """Parse ``train``/``test`` arguments; ``parallel`` is set when more than one
+    cancer type or ``--workers`` is given."""
+    import argparse
+    from create_wsi_kl import batch as batch_runner
+
+    parser = argparse.ArgumentParser(description=f"WSI Cancer Description {mode}")
+    parser.add_argument("n_iterations", type=int, help="Iterations per cancer type")
+    parser.add_argument(target, help=target_help)
+    parser.add_argument("cancer_types", nargs="*",
+                       help="Cancer types (default: Clear Cell Renal Cell Carcinoma (ccRCC))")
+    parser.add_argument("--from-json", type=str,
+                       help="Also use every cancer type (top-level key) in this JSON file")
+    parser.add_argument("--json-source", type=str,
+                       help="Path to JSON file containing cancer descriptions (parallel runs)")
+    parser.add_argument("--workers", type=int,
+                       help="Run iterations in parallel on this many processes "
+                            "(default with several cancer types: WSI_EVAL_WORKERS or 2)")
+    parser.add_argument("--output-dir", type=str,
+                       help="Relative directory for per-iteration files and report.json "
+                            f"(default: eval_runs/{mode}_<timestamp>)")
+    if feedback_help:
+        parser.add_argument("--feedback", type=str, help=feedback_help)
+    parser.add_argument("--verbose", action="store_true",
+                       help="Keep agent/crew output of parallel workers")
+
+    args = parser.parse_args(_cli_args(mode))
+    if args.from_json:
+        args.cancer_types += batch_runner.load_cancer_types(args.from_json)
+    if not args.cancer_types:
+        args.cancer_types = ["Clear Cell Renal Cell Carcinoma (ccRCC)"]
+    args.parallel = args.workers is not None or len(args.cancer_types) > 1
+    if args.json_source and not args.parallel:
+        parser.error("--json-source needs a parallel run (--workers or several cancer types)")
+    return args
+
+
+def _run_parallel_eval(mode, args, **unit_kwargs):
+    """Run ``train``/``test`` iterations on worker processes and merge the scores."""
+    import time
+    from pathlib import Path
+    from create_wsi_kl import parallel_eval
+
+    output_dir = Path(args.output_dir or os.path.join(
+        parallel_eval.DEFAULT_OUTPUT_ROOT, f"{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    ))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = args.workers or parallel_eval.default_workers()
+    units = parallel_eval.plan_units(
+        mode, args.cancer_types, args.n_iterations, output_dir,
+        # Workers run inside their own directories.
+        json_source=os.path.abspath(args.json_source) if args.json_source else None,
+        quiet=not args.verbose,
+        **unit_kwargs,
+    )
+
+    print(f"Starting parallel {mode}: {len(args.cancer_types)} cancer type(s) x "
+          f"{args.n_iterations} iteration(s) on {workers} worker(s)")
+    print(f"Output Directory: {output_dir}")
+    print("-" * 50)
+
+    def progress(result):
+        status = "ok" if result.succeeded else f"FAILED: {result.error.splitlines()[0]}"
+        print(f"[{mode}] {result.cancer_type} #{result.iteration} {result.seconds:.1f}s {status}")
+
+    started = time.perf_counter()
+    results = parallel_eval.run_units(units, workers=workers, on_result=progress)
+    report = parallel_eval.aggregate(results, time.perf_counter() - started, workers)
+    if mode == "train":
+        agents = parallel_eval.merge_trained_files(results, args.training_file)
+        print(f"Merged trained data for {agents} agent(s) into {args.training_file}")
+    parallel_eval.write_report(report, output_dir / "report.json")
+    parallel_eval.print_report(report)
+    print(f"\nReport saved to: {output_dir / 'report.json'}")
+
+    if report["failed"]:
+        sys.exit(1)
+    return report
 
 
 def validate():
     """
     Validate and select descriptions from cancer_descriptions.json file.
     """
-    if len(sys.argv) < 2:
-        print("Usage: python main.py validate [cancer_type]")
-        print("If no cancer_type is specified, all cancer types in cancer_descriptions.json will be validated")
-        sys.exit(1)
-
-    # Path to cancer descriptions file
-    cancer_descriptions_path = os.path.join("knowledge", "cancer_descriptions.json")
-    
-    if not os.path.exists(cancer_descriptions_path):
-        print(f"Error: {cancer_descriptions_path} not found")
-        sys.exit(1)
+    import argparse
+    from pathlib import Path
+    from create_wsi_kl import corpus_store, validation
+
+    parser = argparse.ArgumentParser(
+        description="Validate and select descriptions from cancer_descriptions.json. "
+        "If no cancer_type is specified, all cancer types are validated."
+    )
+    parser.add_argument("cancer_type", nargs="?", help="Cancer type to validate")
+    parser.add_argument("--input", type=str, default=os.path.join("knowledge", "cancer_descriptions.json"),
+                       help="Cancer descriptions JSON file, or corpus store (wsi_corpus.db[@version])")
+    parser.add_argument("--scorer", choices=validation.SCORERS, default="local",
+                       help="local = rule-based (process pool), llm = blended with Gemini ratings (thread pool)")
+    parser.add_argument("--workers", type=int, help="Maximum number of cancer types validated at once")
+    parser.add_argument("--run-dir", type=str,
+                       help="Checkpoint directory; finished types found here are skipped")
+    parser.add_argument("--resume", action="store_true",
+                       help=f"Resume the most recent run under {validation.DEFAULT_RUN_ROOT}/")
+
+    args = parser.parse_args(_cli_args("validate"))
+
+    # Path to cancer descriptions file (or corpus store, optionally @<version>)
+    cancer_descriptions_path = args.input
 
     # Load existing cancer descriptions
     try:
-        with open(cancer_descriptions_path, 'r') as f:
-            existing_descriptions = json.load(f)
+        existing_descriptions = corpus_store.load_corpus(cancer_descriptions_path)
+    except FileNotFoundError:
+        print(f"Error: {cancer_descriptions_path} not found")
+        sys.exit(1)
     except Exception as e:
         print(f"Error loading {cancer_descriptions_path}: {e}")
         sys.exit(1)
 
     # Determine which cancer types to validate
-    if len(sys.argv) > 2:
+    if args.cancer_type:
         # Validate specific cancer type
-        cancer_type = sys.argv[2]
+        cancer_type = args.cancer_type
         if cancer_type not in existing_descriptions:
             print(f"Error: Cancer type '{cancer_type}' not found in {cancer_descriptions_path}")
             print(f"Available cancer types: {list(existing_descriptions.keys())}")
@@ -178,27 +419,61 @@ def validate():
         # Validate all cancer types
         cancer_types_to_validate = list(existing_descriptions.keys())
 
+    run_dir = Path(args.run_dir) if args.run_dir else None
+    if run_dir is None and args.resume:
+        run_dir = validation.latest_run_dir()
+    if run_dir is None:
+        run_dir = validation.new_run_dir()
+
     print(f"Validating and selecting descriptions for {len(cancer_types_to_validate)} cancer type(s)")
+    print(f"Scorer: {args.scorer}")
+    print(f"Checkpoint Directory: {run_dir}")
     print("-" * 50)
 
-    validated_results = {}
-    
-    for cancer_type in cancer_types_to_validate:
-        print(f"\nProcessing: {cancer_type}")
-        
-        # Get existing descriptions for this cancer type
-        descriptions = existing_descriptions[cancer_type]
-        
+    # Each validated type is appended to the corpus store as soon as it finishes
+    store, store_version = None, None
+    store_path = corpus_store.store_path_from_env()
+    if store_path is not None:
         try:
-            # Validate and select best descriptions
-            selected_descriptions = _validate_and_select_descriptions(cancer_type, descriptions)
-            validated_results[cancer_type] = selected_descriptions
-            
-            print(f"✓ Selected {len(selected_descriptions)} descriptions for {cancer_type}")
-            
+            store = corpus_store.CorpusStore(store_path)
+            store_version = store.start_run(
+                "validate", source=cancer_descriptions_path, details={"scorer": args.scorer}
+            )
         except Exception as e:
-            print(f"✗ Validation failed for {cancer_type}: {e}")
-            validated_results[cancer_type] = descriptions  # Keep original if validation fails
+            print(f"Warning: could not open corpus store {store_path}: {e}")
+            store = None
+
+    def report(cancer_type, result, error):
+        if error is not None:
+            print(f"✗ Validation failed for {cancer_type}: {error}")
+        else:
+            print(f"✓ Selected {len(result['selected'])} descriptions for {cancer_type}")
+            if store is not None:
+                try:
+                    store.add_validation(store_version, result)
+                except Exception as e:
+                    print(f"Warning: {cancer_type} not written to the corpus store: {e}")
+
+    results = validation.run_validation(
+        {ct: existing_descriptions[ct] for ct in cancer_types_to_validate},
+        run_dir,
+        scorer=args.scorer,
+        max_workers=args.workers,
+        on_result=report,
+    )
+
+    if store is not None:
+        store.finish_run(
+            store_version, "success" if len(results) == len(cancer_types_to_validate) else "failed"
+        )
+        print(f"Corpus store version: {store_version} ({store_path})")
+
+    validated_results = {}
+    for cancer_type in cancer_types_to_validate:
+        if cancer_type in results:
+            validated_results[cancer_type] = results[cancer_type]["selected"]
+        else:
+            validated_results[cancer_type] = existing_descriptions[cancer_type]  # Keep original if validation fails
 
     # Save validated results
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -219,14 +494,191 @@ def validate():
     print(f"  Original descriptions: {total_original}")
     print(f"  Selected descriptions: {total_selected}")
     print(f"  Cancer types processed: {len(cancer_types_to_validate)}")
+    print(f"  Cancer types failed: {len(cancer_types_to_validate) - len(results)}")
 
     return validated_results
 
 
-def _compare_descriptions(cancer_type, existing_descriptions, new_descriptions):
+def serve():
+    """
+    Serve the WSI Cancer Description crew over HTTP with warm, reusable crews.
+    """
+    import argparse
+    import asyncio
+    from create_wsi_kl import service
+
+    parser = argparse.ArgumentParser(description="WSI Cancer Description Service")
+    parser.add_argument("--host", type=str, default=service.DEFAULT_HOST,
+                       help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=service.DEFAULT_PORT,
+                       help="Port to listen on")
+    parser.add_argument("--concurrency", type=int, default=service.DEFAULT_CONCURRENCY,
+                       help="Maximum number of crews running at the same time")
+    parser.add_argument("--max-queued", type=int, default=service.DEFAULT_MAX_QUEUED,
+                       help="Reject new jobs with 503 once this many are waiting")
+    parser.add_argument("--output-dir", type=str, default=service.DEFAULT_OUTPUT_ROOT,
+                       help="Relative directory for per-job outputs")
+    parser.add_argument("--json-source", type=str,
+                       help="Path to JSON file containing cancer descriptions")
+    parser.add_argument("--shared-type", action="append", dest="shared_types",
+                       help="Cancer type from --json-source that is always retrievable; repeatable "
+                            "(default: WSI_SHARED_CANCER_TYPES, ';'-separated)")
+    parser.add_argument("--warm-type", action="append", dest="warm_types",
+                       help="Build a crew for this cancer type before accepting requests; repeatable "
+                            "(default: one crew for the PDF knowledge, none with --json-source)")
+    parser.add_argument("--no-warm", action="store_true",
+                       help="Build crews lazily on the first request instead")
+    parser.add_argument("--quiet", action="store_true", default=None,
+                       help="Suppress verbose agent/crew output (also WSI_QUIET=1)")
+    parser.add_argument("--telemetry-dir", type=str,
+                       help="Write one JSONL trace and Prometheus textfile per job here")
+    parser.add_argument("--fan-out", action="store_true", default=None,
+                       help="Generate description sections in parallel (also WSI_FAN_OUT=1)")
+
+    args = parser.parse_args(_cli_args("serve"))
+
+    warm_types = args.warm_types
+    if warm_types is None and not args.no_warm and args.json_source is None:
+        # PDF knowledge does not depend on the cancer type; any type warms it.
+        warm_types = ["No Tumor (Negative Lymph Nodes)"]
+    if args.no_warm:
+        warm_types = []
+
+    wsi_service = service.WsiService(
+        concurrency=args.concurrency,
+        max_queued=args.max_queued,
+        output_dir=args.output_dir,
+        use_json_source=args.json_source is not None,
+        json_file_path=args.json_source,
+        quiet=args.quiet,
+        telemetry_dir=args.telemetry_dir,
+        shared_cancer_types=args.shared_types,
+        fan_out=args.fan_out,
+    )
+    try:
+        asyncio.run(wsi_service.serve(args.host, args.port, warm_types=warm_types))
+    except KeyboardInterrupt:
+        print("\n[serve] stopped")
+    _print_cache_stats()
+
+
+def corpus():
+    """
+    Inspect, export and import the SQLite corpus store.
+    """
+    import argparse
+    from create_wsi_kl import corpus_store
+
+    parser = argparse.ArgumentParser(description="WSI corpus store")
+    parser.add_argument("--db", type=str,
+                       help=f"Corpus store (default: WSI_CORPUS_DB or {corpus_store.DEFAULT_DB_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runs_parser = commands.add_parser("runs", help="List versions (runs), newest first")
+    runs_parser.add_argument("--limit", type=int, default=20)
+    export_parser = commands.add_parser("export", help="Write a cancer descriptions JSON file")
+    export_parser.add_argument("output", help="JSON file to write")
+    export_parser.add_argument("--version", type=int, help="Corpus as of this version (default: latest)")
+    export_parser.add_argument("--status", choices=["accepted", "generated"],
+                               help="Only validated/imported or only generated versions "
+                                    "(default: newest of either, without rejected sentences)")
+    export_parser.add_argument("--cancer-type", action="append", dest="cancer_types",
+                               help="Export only this cancer type; repeatable")
+    import_parser = commands.add_parser("import", help="Append a cancer descriptions JSON file")
+    import_parser.add_argument("input", help="JSON file to import")
+    import_parser.add_argument("--status", choices=["accepted", "generated"], default="accepted")
+
+    args = parser.parse_args(_cli_args("corpus"))
+
+    path = args.db or corpus_store.store_path_from_env()
+    if path is None:
+        parser.error("the corpus store is disabled (WSI_CORPUS_DB=off); pass --db")
+    store = corpus_store.CorpusStore(path, create=args.command == "import")
+
+    if args.command == "runs":
+        runs = store.runs(args.limit)
+        for r in runs:
+            print(f"  v{r['version']:<5} {r['kind']:<9} {r['status']:<8} {r['started_at']}  "
+                  f"{r['cancer_types']} type(s), {r['sentences']} sentence(s)"
+                  + (f"  [{r['source']}]" if r["source"] else ""))
+        return runs
+    if args.command == "export":
+        exported = store.export(args.version, args.status, args.cancer_types)
+        from create_wsi_kl.batch import write_corpus
+
+        write_corpus(exported, args.output)
+        print(f"Exported {len(exported)} cancer type(s) to {args.output}")
+        return exported
+    imported = corpus_store.load_corpus(args.input)
+    version = store.record("import", imported, status=args.status, source=args.input)
+    print(f"Imported {len(imported)} cancer type(s) from {args.input} as version {version}")
+    return version
+
+
+def _store_generated(kind, cancer_type, raw):
+    """Append the finalizer answer of a finished run to the corpus store."""
+    from create_wsi_kl.batch import _descriptions_for, parse_finalizer_output
+    from create_wsi_kl.corpus_store import record_corpus
+
+    try:
+        descriptions = _descriptions_for(cancer_type, parse_finalizer_output(raw))
+    except ValueError as e:
+        print(f"Corpus store: finalizer output not recorded ({e})")
+        return None
+    version = record_corpus(kind, {cancer_type: descriptions})
+    if version is not None:
+        print(f"Corpus store version: {version}")
+    return version
+
+
+def warm_cache():
+    """
+    Ingest the knowledge directory ahead of time so the next crew build starts from the Docling cache.
+    """
+    import argparse
+    from create_wsi_kl.ingestion import ingest_knowledge
+
+    parser = argparse.ArgumentParser(description="Pre-convert and chunk the knowledge files")
+    parser.add_argument("--include", action="append",
+                       help="Glob of files to ingest, relative to knowledge/; repeatable "
+                            "(default: WSI_KNOWLEDGE_INCLUDE or every supported file)")
+    parser.add_argument("--exclude", action="append",
+                       help="Glob of files to skip; repeatable "
+                            "(default: WSI_KNOWLEDGE_EXCLUDE or cancer_descriptions.json)")
+    parser.add_argument("--workers", type=int,
+                       help="Conversion processes (default: WSI_INGEST_WORKERS or up to 4)")
+    parser.add_argument("--report", type=str,
+                       help="Also write the per-file ingestion report to this JSON file")
+
+    args = parser.parse_args(_cli_args("warm-cache"))
+
+    report = ingest_knowledge(include=args.include, exclude=args.exclude, workers=args.workers)
+    report.print()
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, indent=2)
+    return report
+
+
+def _cli_args(mode):
+    """Return CLI arguments after the mode word.
+
+    Works both for ``python -m create_wsi_kl.main <mode> ...`` and for the
+    installed ``<mode> ...`` console script.
+    """
+    args = sys.argv[1:]
+    if args and args[0].lower() == mode:
+        args = args[1:]
+    return args
+
+
+def _compare_descriptions(cancer_type, existing_descriptions, new_descriptions, method="jaccard"):
     """
     Compare existing descriptions with newly generated ones and provide validation analysis.
     """
+    from create_wsi_kl.similarity import DescriptionSimilarity
+
+    # One vectorized all-pairs pass feeds overlap and both uniqueness lists.
+    similarity = DescriptionSimilarity(existing_descriptions, new_descriptions, method=method)
     return {
         "status": "success",
         "cancer_type": cancer_type,
@@ -235,46 +687,29 @@ def _compare_descriptions(cancer_type, existing_descriptions, new_descriptions):
         "comparison": {
             "existing_count": len(existing_descriptions),
             "new_count": len(new_descriptions),
-            "overlapping_content": _find_overlapping_content(existing_descriptions, new_descriptions),
-            "unique_to_existing": _find_unique_content(existing_descriptions, new_descriptions),
-            "unique_to_new": _find_unique_content(new_descriptions, existing_descriptions),
+            "overlapping_content": _find_overlapping_content(existing_descriptions, new_descriptions, similarity),
+            "unique_to_existing": _find_unique_content(existing_descriptions, new_descriptions, similarity),
+            "unique_to_new": [new_descriptions[j] for j in similarity.unique_right()],
             "quality_assessment": _assess_quality_differences(existing_descriptions, new_descriptions)
         },
         "validation_notes": _generate_validation_notes(existing_descriptions, new_descriptions)
     }
 
 
-def _find_overlapping_content(list1, list2):
+def _find_overlapping_content(list1, list2, similarity=None):
     """Find content that appears in both description lists."""
-    overlaps = []
-    for desc1 in list1:
-        for desc2 in list2:
-            # Simple similarity check - could be enhanced with more sophisticated NLP
-            if _descriptions_similar(desc1, desc2):
-                overlaps.append({"existing": desc1, "new": desc2})
-    return overlaps
+    from create_wsi_kl.similarity import DescriptionSimilarity
+
+    similarity = similarity or DescriptionSimilarity(list1, list2)
+    return [{"existing": list1[i], "new": list2[j]} for i, j in similarity.overlapping_pairs()]
 
 
-def _find_unique_content(source_list, comparison_list):
+def _find_unique_content(source_list, comparison_list, similarity=None):
     """Find content that appears only in the source list."""
-    unique = []
-    for desc in source_list:
-        if not any(_descriptions_similar(desc, comp_desc) for comp_desc in comparison_list):
-            unique.append(desc)
-    return unique
-
-
-def _descriptions_similar(desc1, desc2, threshold=0.6):
-    """Simple similarity check between two descriptions."""
-    # Convert to lowercase and split into words
-    words1 = set(desc1.lower().split())
-    words2 = set(desc2.lower().split())
-    
-    # Calculate Jaccard similarity
-    intersection = len(words1.intersection(words2))
-    union = len(words1.union(words2))
-    
-    return (intersection / union) if union > 0 else 0 >= threshold
+    from create_wsi_kl.similarity import DescriptionSimilarity
+
+    similarity = similarity or DescriptionSimilarity(source_list, comparison_list)
+    return [source_list[i] for i in similarity.unique_left()]
 
 
 def _assess_quality_differences(existing_descriptions, new_descriptions):
@@ -320,6 +755,16 @@ if __name__ == "__main__":
             replay()
         elif mode == "test":
             test()
+        elif mode == "batch":
+            batch()
+        elif mode == "serve":
+            serve()
+        elif mode == "corpus":
+            corpus()
+        elif mode == "warm-cache":
+            warm_cache()
+        elif mode == "validate":
+            validate()
         else:
             # Treat the first argument as cancer type
             run()
@@ -0,0 +1,32 @@
+"""File and directory names derived from cancer type labels."""
+
+import re
+from typing import Dict, Iterable
+
+
+def slugify(cancer_type: str) -> str:
+    """Turn a cancer type label into a filesystem-safe file stem."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", cancer_type).strip("_").lower()
+    return slug or "cancer_type"
+
+
+def unique_slugs(cancer_types: Iterable[str]) -> Dict[str, str]:
+    """Slug per distinct label, suffixed ``_2``, ``_3``, ... where labels collide.
+
+    Different labels can slugify alike ("LUAD (Lung)" and "luad-lung"); the
+    first one in ``cancer_types`` keeps the plain slug, so names stay stable
+    for the same ordered input.
+    """
+    slugs: Dict[str, str] = {}
+    used = set()
+    for cancer_type in cancer_types:
+        if cancer_type in slugs:
+            continue
+        base = slug = slugify(cancer_type)
+        n = 1
+        while slug in used:
+            n += 1
+            slug = f"{base}_{n}"
+        used.add(slug)
+        slugs[cancer_type] = slug
+    return slugs
@@ -0,0 +1,308 @@
+"""Parallel ``train`` / ``test`` iterations across cancer types.
+
+``crew.train`` and ``crew.test`` run their iterations one after another for a
+single input. Here every (cancer type, iteration) pair is an independent
+unit that runs in its own worker process with its own working directory
+under ``<output_dir>/<type>/iter_<n>/``. That directory holds the unit's
+``training_data.pkl`` / trained-agents file (train) or ``eval.json`` (test) and
+its ``wsi_cancer_description.md``, so concurrent units never share a file.
+crewai's own storage (knowledge and memory Chroma stores, kickoff outputs)
+is pinned to ``<work dir>/crewai_storage`` as well; otherwise crewai would
+name it after the current directory and every ``iter_<n>`` unit of every
+type would write to the same store.
+At most ``workers`` units run at once (default ``WSI_EVAL_WORKERS`` or 2;
+every unit makes its own LLM calls, so this is mostly bounded by rate limits).
+
+When every unit has finished, the scores are merged into
+``<output_dir>/report.json``, which has per-type mean and variance and the
+total wall time:
+
+- test: per-task and crew quality (1-10, from the eval LLM) and execution
+  time per iteration
+- train: the trainer's per-agent quality score; the per-unit suggestions are
+  also merged into one trained-agents file (the usual ``train`` filename)
+
+Training normally asks for human feedback on every task. Worker processes
+cannot share the terminal, so parallel training feeds the same ``feedback``
+text (possibly empty) to every prompt.
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from create_wsi_kl.batch import build_inputs
+from create_wsi_kl.naming import unique_slugs
+from create_wsi_kl.settings import env_int
+
+DEFAULT_OUTPUT_ROOT = "eval_runs"
+DEFAULT_WORKERS = 2
+TRAINED_FILE = "trained_agents_data.pkl"
+EVAL_FILE = "eval.json"
+STORAGE_DIR = "crewai_storage"
+_FEEDBACK_PROMPTS = 1000
+
+
+def default_workers() -> int:
+    return env_int("WSI_EVAL_WORKERS", DEFAULT_WORKERS)
+
+
+@dataclass
+class EvalUnit:
+    mode: str  # "train" or "test"
+    cancer_type: str
+    iteration: int
+    work_dir: str
+    eval_llm: Optional[str] = None
+    feedback: str = ""
+    json_source: Optional[str] = None
+    quiet: bool = True
+
+
+@dataclass
+class UnitResult:
+    mode: str
+    cancer_type: str
+    iteration: int
+    work_dir: str
+    status: str = "success"
+    seconds: float = 0.0
+    task_names: List[str] = field(default_factory=list)
+    task_scores: List[float] = field(default_factory=list)
+    task_seconds: List[float] = field(default_factory=list)
+    agent_quality: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == "success"
+
+
+def _build_crew(unit: EvalUnit) -> Any:
+    from create_wsi_kl.crew import CreateWsiKl
+
+    return CreateWsiKl(
+        use_json_source=unit.json_source is not None,
+        json_file_path=unit.json_source,
+        quiet=unit.quiet,
+        cancer_type=unit.cancer_type,
+    ).crew()
+
+
+def _test_unit(unit: EvalUnit, result: UnitResult) -> None:
+    from collections import defaultdict
+
+    from crewai.utilities.evaluators.crew_evaluator_handler import CrewEvaluator
+    from crewai.utilities.llm_utils import create_llm
+
+    crew = _build_crew(unit)
+    evaluator = CrewEvaluator(crew, create_llm(unit.eval_llm))
+    # The evaluator keeps scores in class attributes; pool processes run many units.
+    evaluator.tasks_scores = defaultdict(list)
+    evaluator.run_execution_times = defaultdict(list)
+    evaluator.set_iteration(1)
+    crew.kickoff(inputs=build_inputs(unit.cancer_type))
+
+    result.task_names = [task.name or f"task_{i + 1}" for i, task in enumerate(crew.tasks)]
+    result.task_scores = [float(s) for s in evaluator.tasks_scores[1]]
+    result.task_seconds = [float(s or 0) for s in evaluator.run_execution_times[1]]
+    with open(EVAL_FILE, "w", encoding="utf-8") as f:
+        json.dump(asdict(result), f, indent=2, ensure_ascii=False)
+
+
+def _train_unit(unit: EvalUnit, result: UnitResult) -> None:
+    from crewai.utilities.training_handler import CrewTrainingHandler
+
+    crew = _build_crew(unit)
+    # Answer every training feedback prompt with the same text.
+    sys.stdin = io.StringIO((unit.feedback.replace("\n", " ") + "\n") * _FEEDBACK_PROMPTS)
+    crew.train(n_iterations=1, filename=TRAINED_FILE, inputs=build_inputs(unit.cancer_type))
+    trained = CrewTrainingHandler(TRAINED_FILE).load() or {}
+    result.agent_quality = {
+        role: float(data.get("quality", 0)) for role, data in trained.items() if isinstance(data, dict)
+    }
+
+
+def run_unit(unit: EvalUnit) -> UnitResult:
+    """Pool worker: run one iteration for one cancer type inside its work dir."""
+    result = UnitResult(unit.mode, unit.cancer_type, unit.iteration, unit.work_dir)
+    started = time.perf_counter()
+    Path(unit.work_dir).mkdir(parents=True, exist_ok=True)
+    os.chdir(unit.work_dir)
+    # crewai stores under user_data_dir(<this>); an absolute path keeps the
+    # unit's Chroma collections inside its work dir.
+    os.environ["CREWAI_STORAGE_DIR"] = str(Path(unit.work_dir) / STORAGE_DIR)
+    try:
+        (_test_unit if unit.mode == "test" else _train_unit)(unit, result)
+    except Exception as e:
+        result.status = "failed"
+        result.error = f"{e}\n{traceback.format_exc(limit=3)}"
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def plan_units(
+    mode: str,
+    cancer_types: List[str],
+    n_iterations: int,
+    output_dir: Path,
+    **unit_kwargs: Any,
+) -> List[EvalUnit]:
+    """Every (cancer type, iteration) pair; iterations are interleaved across types.
+
+    Types whose names slugify alike get ``_2``, ``_3``, ... work directories.
+    """
+    slugs = unique_slugs(cancer_types)
+    return [
+        EvalUnit(
+            mode=mode,
+            cancer_type=cancer_type,
+            iteration=i,
+            work_dir=str((output_dir / slug / f"iter_{i}").resolve()),
+            **unit_kwargs,
+        )
+        for i in range(1, n_iterations + 1)
+        for cancer_type, slug in slugs.items()
+    ]
+
+
+def run_units(
+    units: List[EvalUnit],
+    workers: Optional[int] = None,
+    on_result: Optional[Callable[[UnitResult], None]] = None,
+) -> List[UnitResult]:
+    """Run ``units`` on at most ``workers`` processes; results in unit order."""
+    workers = max(1, workers if workers is not None else default_workers())
+    results: Dict[int, UnitResult] = {}
+    # spawn: each worker gets its own crewai event bus and working directory.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(run_unit, unit): i for i, unit in enumerate(units)}
+        for future in as_completed(futures):
+            unit = units[futures[future]]
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process itself died
+                result = UnitResult(unit.mode, unit.cancer_type, unit.iteration, unit.work_dir,
+                                    status="failed", error=str(e))
+            results[futures[future]] = result
+            if on_result:
+                on_result(result)
+    return [results[i] for i in range(len(units))]
+
+
+def _stats(values: List[float]) -> Dict[str, Any]:
+    return {
+        "n": len(values),
+        "mean": statistics.fmean(values) if values else None,
+        "variance": statistics.variance(values) if len(values) > 1 else 0.0 if values else None,
+        "values": values,
+    }
+
+
+def aggregate(results: List[UnitResult], wall_seconds: float, workers: int) -> Dict[str, Any]:
+    """Per-type mean/variance of scores and timings, plus the overall wall time."""
+    types: Dict[str, Dict[str, Any]] = {}
+    for cancer_type in dict.fromkeys(r.cancer_type for r in results):
+        done = [r for r in results if r.cancer_type == cancer_type and r.succeeded]
+        entry: Dict[str, Any] = {
+            "iterations": sum(1 for r in results if r.cancer_type == cancer_type),
+            "failed": sum(1 for r in results if r.cancer_type == cancer_type and not r.succeeded),
+            "seconds": _stats([r.seconds for r in done]),
+        }
+        scored = [r for r in done if r.task_scores]
+        if scored:
+            entry["crew_score"] = _stats([statistics.fmean(r.task_scores) for r in scored])
+            names = scored[0].task_names
+            entry["tasks"] = {
+                name: _stats([r.task_scores[i] for r in scored if i < len(r.task_scores)])
+                for i, name in enumerate(names)
+            }
+        roles = sorted({role for r in done for role in r.agent_quality})
+        if roles:
+            entry["agents"] = {
+                role: _stats([r.agent_quality[role] for r in done if role in r.agent_quality])
+                for role in roles
+            }
+        types[cancer_type] = entry
+    return {
+        "mode": results[0].mode if results else None,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "wall_seconds": wall_seconds,
+        "unit_seconds": sum(r.seconds for r in results),
+        "workers": workers,
+        "units": len(results),
+        "failed": sum(1 for r in results if not r.succeeded),
+        "types": types,
+        "results": [asdict(r) for r in results],
+    }
+
+
+def merge_trained_files(results: List[UnitResult], filename: str) -> int:
+    """Merge the per-unit trained-agents files into ``filename``; returns agent count.
+
+    Suggestions are de-duplicated in order, quality is averaged, and the
+    distinct final summaries are joined.
+    """
+    from crewai.utilities.training_handler import CrewTrainingHandler
+
+    merged: Dict[str, Dict[str, Any]] = {}
+    for r in results:
+        path = Path(r.work_dir) / TRAINED_FILE
+        if not r.succeeded or not path.exists():
+            continue
+        for role, data in (CrewTrainingHandler(str(path)).load() or {}).items():
+            entry = merged.setdefault(role, {"suggestions": [], "quality": [], "final_summary": []})
+            entry["suggestions"].extend(s for s in data.get("suggestions", []) if s not in entry["suggestions"])
+            entry["quality"].append(float(data.get("quality", 0)))
+            if data.get("final_summary") and data["final_summary"] not in entry["final_summary"]:
+                entry["final_summary"].append(data["final_summary"])
+
+    handler = CrewTrainingHandler(filename)
+    for role, entry in merged.items():
+        handler.save_trained_data(
+            agent_id=role,
+            trained_data={
+                "suggestions": entry["suggestions"],
+                "quality": statistics.fmean(entry["quality"]) if entry["quality"] else 0.0,
+                "final_summary": "\n".join(entry["final_summary"]),
+            },
+        )
+    return len(merged)
+
+
+def write_report(report: Dict[str, Any], path: Path) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    tmp.replace(path)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    def fmt(stats: Optional[Dict[str, Any]]) -> str:
+        if not stats or stats["mean"] is None:
+            return "n/a"
+        return f"mean {stats['mean']:.2f}, var {stats['variance']:.2f}"
+
+    print(f"\n{report['mode'].capitalize()} report: {report['units']} iteration(s), "
+          f"{report['failed']} failed, {report['wall_seconds']:.1f}s wall "
+          f"({report['unit_seconds']:.1f}s of work on {report['workers']} worker(s))")
+    for cancer_type, entry in report["types"].items():
+        print(f"  {cancer_type}: {entry['iterations'] - entry['failed']}/{entry['iterations']} ok, "
+              f"seconds {fmt(entry['seconds'])}")
+        if "crew_score" in entry:
+            print(f"    crew score: {fmt(entry['crew_score'])}")
+            for name, stats in entry["tasks"].items():
+                print(f"    {name}: {fmt(stats)}")
+        for role, stats in entry.get("agents", {}).items():
+            print(f"    {role}: quality {fmt(stats)}")
@@ -0,0 +1,259 @@
+"""Persistent LRU cache for knowledge retrieval queries.
+
+Every agent searches the same crew knowledge collection, and for one cancer
+type planning, generation, evaluation and finalization ask nearly the same
+questions, within a run and again in the next one. Stock crewai re-embeds the
+query remotely and re-runs the vector search each time.
+:class:`QueryCachingKnowledgeStorage` instead caches the top-k results, keyed
+on the *index version* + normalized query text (case-folded, whitespace
+collapsed, surrounding quotes/punctuation dropped) + ``k`` + metadata filter.
+The score threshold is applied after the lookup, so one entry serves every
+threshold. On a miss the query is embedded as written; the embedder's own
+index (:mod:`create_wsi_kl.embedding_index`) keeps those vectors.
+
+The index version is a hash of the embedding model, the collection name and
+the ids of every chunk in the collection. Chunk ids are content hashes, so
+adding, changing or removing a knowledge file yields a new version and stale
+results are simply never looked up again. The version is recomputed whenever
+the collection's size changes or the storage saves new chunks.
+
+The cache lives in ``.cache/query_cache.sqlite``, shared by all crews of a
+process (batch, serve) and across runs, with a small in-memory LRU in front:
+
+- ``WSI_QUERY_CACHE=0``              disable the cache
+- ``WSI_QUERY_CACHE_MAX_ENTRIES``    result sets kept on disk, least
+  recently used evicted first (default 10000)
+- ``WSI_QUERY_CACHE_MEMORY_ENTRIES`` result sets kept in memory (default 256)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from crewai.knowledge.storage.knowledge_storage import KnowledgeStorage, suppress_logging
+
+from create_wsi_kl.settings import cache_dir, env_flag, env_int
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MEMORY_ENTRIES = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    index_version TEXT NOT NULL,
+    results TEXT NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at);
+"""
+
+_EDGE_PUNCTUATION = " \t\n\r\"'`.,;:!?"
+
+
+def normalize_query(text: str) -> str:
+    """Case-folded query with collapsed whitespace and no surrounding punctuation."""
+    return " ".join(text.split()).strip(_EDGE_PUNCTUATION).casefold()
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def result_key(index_version: str, query: str, limit: int, filter: Optional[dict]) -> str:
+    return _hash("results", index_version, query, str(limit), json.dumps(filter, sort_keys=True))
+
+
+class QueryCache:
+    """Top-k retrieval results in SQLite, safe to share across threads."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.embed_seconds = 0.0
+        self._memory: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _remember_locked(self, key: str, value: List[Dict[str, Any]]) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_results(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            row = self._conn.execute("SELECT results FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            value = json.loads(row[0])
+            self._remember_locked(key, value)
+            self.hits += 1
+            return value
+
+    def put_results(self, key: str, index_version: str, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, index_version, json.dumps(results, ensure_ascii=False), time.time()),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+            if count > self.max_entries:
+                # Least recently used rows go first.
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+            self._remember_locked(key, results)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": entries,
+            "embed_seconds": self.embed_seconds,
+        }
+
+
+class QueryCachingKnowledgeStorage(KnowledgeStorage):
+    """Knowledge storage whose searches go through a :class:`QueryCache`.
+
+    Behaves exactly like ``KnowledgeStorage`` (same results, same score
+    filtering) when ``cache`` is ``None`` or several queries are passed.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Dict[str, Any]] = None,
+        collection_name: Optional[str] = None,
+        cache: Optional[QueryCache] = None,
+    ):
+        super().__init__(embedder=embedder, collection_name=collection_name)
+        self.cache = cache if cache is not None else shared_query_cache()
+        self.model_name = getattr(self.embedder, "model_name", None) or type(self.embedder).__name__
+        self._version: Optional[str] = None
+        self._version_count = -1
+
+    def index_version(self) -> str:
+        """Hash of the embedding model, collection and the ids of its chunks."""
+        count = self.collection.count()
+        if self._version is None or count != self._version_count:
+            ids = self.collection.get(include=[])["ids"]
+            digest = hashlib.sha256(f"{self.model_name}\0{self.collection_name}".encode("utf-8"))
+            for chunk_id in sorted(ids):
+                digest.update(chunk_id.encode("utf-8"))
+            self._version, self._version_count = digest.hexdigest()[:16], count
+        return self._version
+
+    def save(self, documents: List[str], metadata: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None):
+        super().save(documents, metadata)
+        self._version = None
+
+    def _embed(self, query: str) -> List[float]:
+        started = time.perf_counter()
+        vector = [float(x) for x in self.embedder([query])[0]]
+        self.cache.embed_seconds += time.perf_counter() - started
+        return vector
+
+    def search(
+        self,
+        query: List[str],
+        limit: int = 3,
+        filter: Optional[dict] = None,
+        score_threshold: float = 0.35,
+    ) -> List[Dict[str, Any]]:
+        if self.cache is None or len(query) != 1 or not self.collection:
+            return super().search(query, limit=limit, filter=filter, score_threshold=score_threshold)
+
+        version = self.index_version()
+        key = result_key(version, normalize_query(query[0]), limit, filter)
+        results = self.cache.get_results(key)
+        if results is None:
+            embedding = self._embed(query[0])
+            with suppress_logging():
+                fetched = self.collection.query(
+                    query_embeddings=[embedding], n_results=limit, where=filter
+                )
+            results = [
+                {
+                    "id": fetched["ids"][0][i],
+                    "metadata": fetched["metadatas"][0][i],
+                    "context": fetched["documents"][0][i],
+                    "score": fetched["distances"][0][i],
+                }
+                for i in range(len(fetched["ids"][0]))
+            ]
+            self.cache.put_results(key, version, results)
+        return [r for r in results if r["score"] >= score_threshold]
+
+
+_shared: Optional[QueryCache] = None
+_shared_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    return env_flag("WSI_QUERY_CACHE", default=True)
+
+
+def shared_query_cache() -> Optional[QueryCache]:
+    """Process-wide query cache, or ``None`` when ``WSI_QUERY_CACHE=0``."""
+    global _shared
+    if not cache_enabled():
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = QueryCache(
+                cache_dir() / "query_cache.sqlite",
+                max_entries=env_int("WSI_QUERY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+                memory_entries=env_int("WSI_QUERY_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES),
+            )
+        return _shared
+
+
+def print_stats() -> None:
+    """Print hit rates of the shared query cache if it saw any lookups."""
+    if _shared is None:
+        return
+    s = _shared.stats()
+    if not s["hits"] + s["misses"]:
+        return
+    print(
+        f"Query cache: {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.0%} hit rate, "
+        f"{s['embed_seconds']:.1f}s embedding misses); {s['entries']} result sets at {s['path']}"
+    )
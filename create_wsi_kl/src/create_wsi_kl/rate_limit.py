@@ -0,0 +1,377 @@
+"""Client-side rate limiting for Gemini calls shared by every crew in a process.
+
+A :class:`RateLimiter` combines
+
+- two token buckets, one for requests per minute and one for (estimated)
+  tokens per minute; a bucket with rate ``0`` is unlimited,
+- an AIMD concurrency gate: the number of calls in flight halves on every
+  throttling error and grows by one after ``limit`` consecutive successes,
+- retries with jittered exponential backoff for 429 / 503 errors. A
+  ``Retry-After`` header (or Gemini's ``retryDelay``) is a lower bound for the
+  delay and pauses *all* callers of the limiter, not just the one that was
+  throttled.
+
+The LLM and the embedder each get their own process-wide limiter (Gemini
+quotas are separate) from :func:`shared_limiter`, configured from the
+environment:
+
+- ``WSI_RATE_LIMIT=0``                    disable limiting and retries
+- ``WSI_LLM_RPM`` / ``WSI_LLM_TPM``        request / token budgets (0 = unlimited)
+- ``WSI_LLM_MAX_CONCURRENCY``             upper bound for calls in flight (default 8)
+- ``WSI_EMBEDDING_RPM`` / ``_TPM`` / ``_MAX_CONCURRENCY``  the same for embeddings
+- ``WSI_RATE_LIMIT_MAX_RETRIES``          retries per call (default 6)
+- ``WSI_RATE_LIMIT_BASE_DELAY`` / ``_MAX_DELAY``  backoff bounds in seconds
+
+This module only uses the standard library so it can be exercised against the
+local quota stub in ``benchmarks/rate_limit.py`` without crewai installed.
+"""
+
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+from create_wsi_kl.settings import env_flag, env_float, env_int
+
+T = TypeVar("T")
+
+THROTTLE_STATUS_CODES = (429, 503)
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+_THROTTLE_MARKERS = ("resource_exhausted", "rate limit", "ratelimit", "too many requests", "quota")
+_THROTTLE_CLASS_NAMES = ("RateLimit", "ResourceExhausted", "TooManyRequests", "ServiceUnavailable")
+_RETRY_DELAY_PATTERN = re.compile(
+    r"retry[-_ ]?(?:after|delay|in)[\"']?\s*[:=]?\s*[\"']?(\d+(?:\.\d+)?)\s*(ms|s)?",
+    re.IGNORECASE,
+)
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a call is still throttled after every retry."""
+
+
+# ---------------------------------------------------------------------------
+# Error classification
+# ---------------------------------------------------------------------------
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        try:
+            return int(value)  # also covers http.HTTPStatus
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """True for quota (429) and overload (503) errors from any client library."""
+    if _status_code(exc) in THROTTLE_STATUS_CODES:
+        return True
+    if any(name in type(exc).__name__ for name in _THROTTLE_CLASS_NAMES):
+        return True
+    message = str(exc).lower()
+    return "429" in message or any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+def _headers(exc: BaseException) -> Dict[str, str]:
+    for candidate in (
+        getattr(getattr(exc, "response", None), "headers", None),
+        getattr(exc, "headers", None),
+        getattr(exc, "litellm_response_headers", None),
+    ):
+        if candidate:
+            try:
+                return {str(k).lower(): str(v) for k, v in dict(candidate).items()}
+            except (TypeError, ValueError):
+                continue
+    return {}
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-requested delay from ``Retry-After``/``retry-after-ms`` or the message."""
+    headers = _headers(exc)
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    if "retry-after" in headers:
+        value = headers["retry-after"]
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    match = _RETRY_DELAY_PATTERN.search(str(exc))
+    if match:
+        seconds = float(match.group(1))
+        return seconds / 1000.0 if (match.group(2) or "").lower() == "ms" else seconds
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Building blocks
+# ---------------------------------------------------------------------------
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``per_minute / 60`` tokens per second.
+
+    ``per_minute <= 0`` means unlimited. Requests larger than the bucket are
+    admitted once it is full, and :meth:`adjust` may push the level below zero
+    (token debt) when a call turned out bigger than its estimate.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.per_minute = per_minute
+        self.capacity = capacity if capacity is not None else per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until ``amount`` tokens are available; returns seconds waited."""
+        if self.unlimited or amount <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return waited
+                delay = (amount - self._level) * 60.0 / self.per_minute
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, delta: float) -> None:
+        """Give back (``delta > 0``) or take away (``delta < 0``) tokens."""
+        if self.unlimited:
+            return
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level + delta)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on calls in flight between ``minimum`` and ``maximum``."""
+
+    def __init__(self, maximum: int, minimum: int = 1, initial: Optional[int] = None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, initial or self.maximum)
+        self.in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._successes = 0
+
+
+# ---------------------------------------------------------------------------
+# Limiter
+# ---------------------------------------------------------------------------
+class RateLimiter:
+    """Token buckets + adaptive concurrency + backoff around provider calls."""
+
+    def __init__(
+        self,
+        name: str = "llm",
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.calls = 0
+        self.successes = 0
+        self.throttled = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.wait_seconds = 0.0
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Jittered exponential delay, never shorter than ``retry_after``."""
+        exponential = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(exponential / 2, exponential)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _wait_for_pause(self) -> float:
+        with self._lock:
+            remaining = self._paused_until - time.monotonic()
+        if remaining > 0:
+            self._sleep(remaining)
+            return remaining
+        return 0.0
+
+    def _pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        tokens: float = 0,
+        actual_tokens: Optional[Callable[[T], float]] = None,
+    ) -> T:
+        """Run ``fn`` under the limits, retrying throttling errors.
+
+        ``tokens`` is the estimated token cost charged up front; when
+        ``actual_tokens(result)`` is given the difference is settled afterwards.
+        """
+        attempt = 0
+        while True:
+            waited = self._wait_for_pause()
+            with self.concurrency.slot():
+                waited += self.requests.acquire(1)
+                waited += self.tokens.acquire(tokens)
+                with self._lock:
+                    self.calls += 1
+                    self.wait_seconds += waited
+                try:
+                    result = fn()
+                except Exception as e:
+                    if not is_throttle_error(e):
+                        raise
+                    self.concurrency.on_throttle()
+                    retry_after = retry_after_seconds(e)
+                    with self._lock:
+                        self.throttled += 1
+                        exhausted = attempt >= self.max_retries
+                        if exhausted:
+                            self.gave_up += 1
+                        else:
+                            self.retries += 1
+                    if exhausted:
+                        raise RateLimitExceeded(
+                            f"{self.name} still throttled after {self.max_retries} retries: {e}"
+                        ) from e
+                    delay = self.backoff_delay(attempt, retry_after)
+                    if retry_after is not None:
+                        self._pause(retry_after)
+                else:
+                    self.concurrency.on_success()
+                    with self._lock:
+                        self.successes += 1
+                    if actual_tokens is not None:
+                        self.tokens.adjust(tokens - actual_tokens(result))
+                    return result
+            self._sleep(delay)
+            with self._lock:
+                self.wait_seconds += delay
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "successes": self.successes,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "gave_up": self.gave_up,
+                "wait_seconds": self.wait_seconds,
+                "concurrency_limit": self.concurrency.limit,
+            }
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token) used for TPM budgeting."""
+    return max(1, len(text) // 4)
+
+
+_shared: Dict[str, RateLimiter] = {}
+_shared_lock = threading.Lock()
+
+
+def rate_limit_enabled() -> bool:
+    return env_flag("WSI_RATE_LIMIT", default=True)
+
+
+def limiter_from_env(name: str) -> RateLimiter:
+    prefix = f"WSI_{name.upper()}"
+    return RateLimiter(
+        name=name,
+        requests_per_minute=env_float(f"{prefix}_RPM", 0),
+        tokens_per_minute=env_float(f"{prefix}_TPM", 0),
+        max_concurrency=env_int(f"{prefix}_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+        max_retries=env_int("WSI_RATE_LIMIT_MAX_RETRIES", DEFAULT_MAX_RETRIES),
+        base_delay=env_float("WSI_RATE_LIMIT_BASE_DELAY", DEFAULT_BASE_DELAY),
+        max_delay=env_float("WSI_RATE_LIMIT_MAX_DELAY", DEFAULT_MAX_DELAY),
+    )
+
+
+def shared_limiter(name: str) -> Optional[RateLimiter]:
+    """Process-wide limiter for ``name`` (``llm`` or ``embedding``), or ``None`` if disabled."""
+    if not rate_limit_enabled():
+        return None
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = limiter_from_env(name)
+        return _shared[name]
+
+
+def print_stats() -> None:
+    """Print counters of every shared limiter that saw traffic."""
+    for limiter in list(_shared.values()):
+        s = limiter.stats()
+        if not s["calls"]:
+            continue
+        print(
+            f"Rate limiter ({s['name']}): {s['calls']} calls, {s['throttled']} throttled, "
+            f"{s['retries']} retries, {s['wait_seconds']:.1f}s waiting, "
+            f"concurrency {s['concurrency_limit']}"
+        )
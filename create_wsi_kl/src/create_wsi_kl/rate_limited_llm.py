@@ -0,0 +1,60 @@
+"""``crewai.LLM`` whose provider calls go through a :class:`RateLimiter`.
+
+Every provider call also carries a :class:`~create_wsi_kl.llm_usage.UsageRecorder`,
+so telemetry can attribute its tokens to the calling thread's task.
+"""
+
+from typing import Any, Dict, List, Optional, Union
+
+from crewai import LLM  # type: ignore
+
+from create_wsi_kl import llm_usage
+from create_wsi_kl.rate_limit import RateLimiter, estimate_tokens
+
+# Completion tokens charged up front for TPM budgeting; settled afterwards.
+DEFAULT_COMPLETION_ESTIMATE = 1024
+
+
+def _prompt_tokens(messages: Union[str, List[Dict[str, str]]]) -> int:
+    if isinstance(messages, str):
+        return estimate_tokens(messages)
+    return sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+
+
+class RateLimitedLLM(LLM):
+    """Waits for request/token budget, and retries 429/503 with backoff.
+
+    ``limiter=None`` makes it behave exactly like ``crewai.LLM``.
+    """
+
+    def __init__(self, *args: Any, limiter: Optional[RateLimiter] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        from_task: Optional[Any] = None,
+        from_agent: Optional[Any] = None,
+    ) -> Union[str, Any]:
+        def request() -> Union[str, Any]:
+            return super(RateLimitedLLM, self).call(
+                messages,
+                tools=tools,
+                callbacks=llm_usage.with_recorder(callbacks),
+                available_functions=available_functions,
+                from_task=from_task,
+                from_agent=from_agent,
+            )
+
+        if self.limiter is None:
+            return request()
+        prompt_tokens = _prompt_tokens(messages)
+        return self.limiter.call(
+            request,
+            tokens=prompt_tokens + (self.max_tokens or DEFAULT_COMPLETION_ESTIMATE),
+            actual_tokens=lambda response: prompt_tokens + estimate_tokens(str(response)),
+        )
@@ -0,0 +1,332 @@
+"""Long-running HTTP service that keeps crews warm between requests.
+
+A CLI run pays for interpreter start-up, the crewai/docling imports, Docling
+conversion and knowledge-store setup before the first LLM call. ``serve``
+pays that once: crews are built up front (or on first use) and returned to a
+pool after every job, so later jobs for the same knowledge scope start with
+their agents, LLMs and embedded knowledge already in place. PDF knowledge is
+shared by every cancer type; with ``--json-source`` crews are pooled per type.
+Whichever crew runs a job writes its markdown to ``<output_dir>/<job id>.md``.
+
+Jobs run with at most ``concurrency`` crews in flight. A request for a cancer
+type that already has a queued or running job (compared ignoring spacing and
+case) is coalesced into that job instead of starting a second identical crew,
+and every requester gets the same result. Finished results are appended to
+the corpus store as well; a job whose result cannot be saved fails.
+
+Endpoints (JSON in and out, plain asyncio streams, no extra dependencies):
+
+- ``POST /jobs``              ``{"cancer_type": "...", "wait": false}`` -> job
+- ``GET  /jobs``              all known jobs
+- ``GET  /jobs/<id>``         job status, timings and error
+- ``GET  /jobs/<id>/result``  the finalized ``{cancer_type: [sentences]}``
+- ``GET  /health``            queue depth and pool size
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from create_wsi_kl.batch import (
+    _descriptions_for,
+    _telemetry_totals,
+    build_inputs,
+    parse_finalizer_output,
+    write_corpus,
+)
+from create_wsi_kl.corpus_store import record_corpus
+from create_wsi_kl.naming import slugify
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CONCURRENCY = 2
+DEFAULT_MAX_QUEUED = 100
+DEFAULT_OUTPUT_ROOT = "service_outputs"
+MAX_FINISHED_JOBS = 1000
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _inflight_key(cancer_type: str) -> str:
+    """Requests whose cancer types differ only in spacing or case share one job."""
+    return " ".join(cancer_type.split()).casefold()
+
+
+@dataclass
+class Job:
+    """One crew run, possibly shared by several coalesced requests."""
+
+    id: str
+    cancer_type: str
+    status: str = "queued"
+    requests: int = 1
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, List[str]]] = None
+    result_file: Optional[str] = None
+    telemetry: Optional[Dict[str, Any]] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "cancer_type": self.cancer_type,
+            "status": self.status,
+            "requests": self.requests,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": (
+                self.finished_at - self.started_at if self.finished_at and self.started_at else None
+            ),
+            "error": self.error,
+            "result_file": self.result_file,
+            "telemetry": self.telemetry,
+        }
+
+
+class CrewPool:
+    """Idle, fully built crews kept per knowledge scope for reuse."""
+
+    def __init__(self, crew_kwargs: Dict[str, Any], output_dir: Path, max_idle: int):
+        self.crew_kwargs = crew_kwargs
+        self.output_dir = output_dir
+        self.max_idle = max_idle
+        self._idle: Dict[Optional[str], List[Tuple[Any, Any]]] = {}
+        self._built = 0
+
+    def _scope(self, cancer_type: str) -> Optional[str]:
+        # PDF knowledge is the same for every type; JSON knowledge is per type.
+        return cancer_type if self.crew_kwargs.get("use_json_source") else None
+
+    def _build(self, cancer_type: str) -> Tuple[Any, Any]:
+        from create_wsi_kl.crew import CreateWsiKl
+
+        self._built += 1
+        crew_instance = CreateWsiKl(
+            output_file=str(self.output_dir / f"{slugify(cancer_type)}_{self._built}.md"),
+            cancer_type=cancer_type,
+            **self.crew_kwargs,
+        )
+        return crew_instance, crew_instance.crew()
+
+    async def acquire(self, cancer_type: str) -> Tuple[Any, Any]:
+        idle = self._idle.get(self._scope(cancer_type))
+        if idle:
+            return idle.pop()
+        return await asyncio.to_thread(self._build, cancer_type)
+
+    def release(self, cancer_type: str, item: Tuple[Any, Any]) -> None:
+        idle = self._idle.setdefault(self._scope(cancer_type), [])
+        if len(idle) < self.max_idle:
+            idle.append(item)
+
+    async def warm(self, cancer_type: str) -> None:
+        self.release(cancer_type, await asyncio.to_thread(self._build, cancer_type))
+
+    def size(self) -> int:
+        return sum(len(items) for items in self._idle.values())
+
+
+class WsiService:
+    """Job registry, coalescing and bounded execution behind the HTTP API."""
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        output_dir: str = DEFAULT_OUTPUT_ROOT,
+        **crew_kwargs: Any,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.pool = CrewPool(crew_kwargs, self.output_dir, max_idle=concurrency)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[str, Job] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+    def counts(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    def submit(self, cancer_type: str) -> Tuple[Job, bool]:
+        """Start (or join) the job for ``cancer_type``; returns ``(job, coalesced)``."""
+        cancer_type = " ".join(cancer_type.split())
+        key = _inflight_key(cancer_type)
+        existing = self._inflight.get(key)
+        if existing is not None:
+            existing.requests += 1
+            return existing, True
+        if self.counts()["queued"] >= self.max_queued:
+            raise OverflowError(f"more than {self.max_queued} jobs queued")
+        job = Job(id=uuid.uuid4().hex[:12], cancer_type=cancer_type)
+        self.jobs[job.id] = job
+        self._inflight[key] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._prune()
+        return job, False
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    async def _run(self, job: Job) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job.started_at = time.time()
+                print(f"[serve] started {job.id}: {job.cancer_type}")
+                item = None
+                try:
+                    item = await self.pool.acquire(job.cancer_type)
+                    crew_instance, crew = item
+                    crew_instance.set_output_file(str(self.output_dir / f"{job.id}.md"))
+                    output = await crew.kickoff_async(inputs=build_inputs(job.cancer_type))
+                    descriptions = _descriptions_for(
+                        job.cancer_type, parse_finalizer_output(output.raw)
+                    )
+                    result = {job.cancer_type: descriptions}
+                    result_file = self.output_dir / f"{job.id}.json"
+                    write_corpus(result, str(result_file))
+                    record_corpus("serve", result, source=job.id)
+                    job.result, job.result_file = result, str(result_file)
+                    job.telemetry = _telemetry_totals(crew_instance, "success")
+                    job.status = "succeeded"
+                    self.pool.release(job.cancer_type, item)
+                except Exception as e:
+                    job.status, job.error = "failed", str(e)
+                    if item is not None:
+                        # A crew whose job failed is not reused.
+                        job.telemetry = _telemetry_totals(item[0], "failed")
+                print(f"[serve] {job.status} {job.id}: {job.cancer_type}")
+        finally:
+            if not job.finished:
+                # Cancelled (service shutdown) before the job could finish.
+                job.status, job.error = "failed", job.error or "cancelled"
+            job.finished_at = time.time()
+            self._inflight.pop(_inflight_key(job.cancer_type), None)
+            job.done.set()
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return 200, {"status": "ok", "warm_crews": self.pool.size(), **self.counts()}
+        if parts == ["jobs"]:
+            if method == "GET":
+                return 200, [job.to_dict() for job in self.jobs.values()]
+            if method == "POST":
+                return await self._post_job(body)
+            return 405, {"error": "use GET or POST"}
+        if len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"error": f"unknown job {parts[1]}"}
+            if len(parts) == 2:
+                return 200, job.to_dict()
+            if parts[2] == "result":
+                return self._result(job)
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def _post_job(self, body: bytes) -> Tuple[int, Any]:
+        try:
+            request = json.loads(body or b"{}")
+            cancer_type = str(request["cancer_type"]).strip()
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'expected {"cancer_type": "..."}'}
+        if not cancer_type:
+            return 400, {"error": "cancer_type must not be empty"}
+        try:
+            job, coalesced = self.submit(cancer_type)
+        except OverflowError as e:
+            return 503, {"error": str(e)}
+        if request.get("wait"):
+            await job.done.wait()
+            status, payload = self._result(job)
+            return status, payload
+        return 202, {**job.to_dict(), "coalesced": coalesced}
+
+    @staticmethod
+    def _result(job: Job) -> Tuple[int, Any]:
+        if job.status == "succeeded":
+            return 200, job.result
+        if job.status == "failed":
+            return 500, {"id": job.id, "status": job.status, "error": job.error}
+        return 202, {"id": job.id, "status": job.status}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            method, target = request_line.split(" ")[:2]
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length") or 0))
+            status, payload = await self.route(method.upper(), urlsplit(target).path, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "malformed HTTP request"}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            writer.write(head.encode("latin-1") + data)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        warm_types: Optional[List[str]] = None,
+    ) -> None:
+        """Warm the pool, then answer requests until cancelled."""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        for cancer_type in warm_types or []:
+            started = time.perf_counter()
+            await self.pool.warm(cancer_type)
+            print(f"[serve] warmed crew for {cancer_type} ({time.perf_counter() - started:.1f}s)")
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"[serve] listening on http://{host}:{port} (concurrency {self.concurrency})")
+        async with server:
+            await server.serve_forever()
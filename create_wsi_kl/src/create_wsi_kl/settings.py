@@ -0,0 +1,45 @@
+"""Shared paths and environment-driven switches.
+
+Everything here is read lazily from ``os.environ`` so values placed in the
+project ``.env`` (loaded by ``init_llm``) are honoured no matter which module
+is imported first.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+# Project root is two levels above this file (src/create_wsi_kl/settings.py).
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+KNOWLEDGE_DIR = PROJECT_ROOT / "knowledge"
+
+_TRUTHY = {"1", "true", "yes", "on"}
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Interpret an environment variable as a boolean switch."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in _TRUTHY
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def cache_dir(name: Optional[str] = None) -> Path:
+    """Return (and create) the on-disk cache directory.
+
+    Defaults to ``<project>/.cache``; override with ``WSI_CACHE_DIR``.
+    """
+    root = Path(os.getenv("WSI_CACHE_DIR") or PROJECT_ROOT / ".cache")
+    path = root / name if name else root
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,146 @@
+"""Vectorized all-pairs similarity between two sets of descriptions.
+
+Each description is tokenized exactly once (lower-cased, whitespace split,
+the same rule the original pairwise helper used) and turned into a row of a
+sparse token matrix. All-pairs similarity is then a single sparse matrix
+product instead of ``len(left) * len(right)`` Python calls:
+
+- ``jaccard``: binary token-set matrices, ``|A ∩ B| = A @ B.T`` and
+  ``|A ∪ B| = |A| + |B| - |A ∩ B|``.
+- ``tfidf``: L2-normalised TF-IDF rows, cosine ``= A @ B.T``.
+
+Only pairs that share at least one token are ever materialised, so comparing
+tens of thousands of generated sentences against the corpus stays sparse.
+"""
+
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+DEFAULT_THRESHOLD = 0.6
+METHODS = ("jaccard", "tfidf")
+
+
+def tokenize(text: str) -> List[str]:
+    return text.lower().split()
+
+
+def _vocabulary(token_lists: Iterable[Sequence[str]]) -> Dict[str, int]:
+    vocab: Dict[str, int] = {}
+    for tokens in token_lists:
+        for token in tokens:
+            if token not in vocab:
+                vocab[token] = len(vocab)
+    return vocab
+
+
+def _count_matrix(
+    token_lists: Sequence[Sequence[str]], vocab: Dict[str, int]
+) -> sparse.csr_matrix:
+    """Rows = documents, columns = vocabulary, values = token counts."""
+    indptr = [0]
+    indices: List[int] = []
+    for tokens in token_lists:
+        indices.extend(vocab[t] for t in tokens)
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float64)
+    matrix = sparse.csr_matrix(
+        (data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(token_lists), len(vocab)),
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+
+def jaccard_matrix(
+    left_tokens: Sequence[Sequence[str]], right_tokens: Sequence[Sequence[str]]
+) -> sparse.csr_matrix:
+    """Sparse Jaccard scores for every pair sharing at least one token."""
+    vocab = _vocabulary(list(left_tokens) + list(right_tokens))
+    a = _count_matrix(left_tokens, vocab)
+    b = _count_matrix(right_tokens, vocab)
+    a.data[:] = 1.0
+    b.data[:] = 1.0
+    a_sizes = np.asarray(a.sum(axis=1)).ravel()
+    b_sizes = np.asarray(b.sum(axis=1)).ravel()
+
+    intersection = (a @ b.T).tocoo()
+    union = a_sizes[intersection.row] + b_sizes[intersection.col] - intersection.data
+    scores = intersection.data / union
+    return sparse.csr_matrix(
+        (scores, (intersection.row, intersection.col)), shape=intersection.shape
+    )
+
+
+def tfidf_cosine_matrix(
+    left_tokens: Sequence[Sequence[str]], right_tokens: Sequence[Sequence[str]]
+) -> sparse.csr_matrix:
+    """Sparse TF-IDF cosine scores (smoothed IDF over both sets)."""
+    all_tokens = list(left_tokens) + list(right_tokens)
+    vocab = _vocabulary(all_tokens)
+    counts = _count_matrix(all_tokens, vocab)
+
+    df = np.bincount(counts.indices, minlength=len(vocab))
+    idf = np.log((1 + counts.shape[0]) / (1 + df)) + 1.0
+    weighted = counts.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    weighted = sparse.diags(1.0 / norms) @ weighted
+
+    n_left = len(left_tokens)
+    a, b = weighted[:n_left], weighted[n_left:]
+    return (a @ b.T).tocsr()
+
+
+class DescriptionSimilarity:
+    """All-pairs similarity between ``left`` and ``right`` description lists."""
+
+    def __init__(
+        self,
+        left: Sequence[str],
+        right: Sequence[str],
+        threshold: float = DEFAULT_THRESHOLD,
+        method: str = "jaccard",
+    ):
+        if method not in METHODS:
+            raise ValueError(f"Unknown similarity method '{method}', expected one of {METHODS}")
+        self.left = list(left)
+        self.right = list(right)
+        self.threshold = threshold
+        self.method = method
+
+        left_tokens = [tokenize(d) for d in self.left]
+        right_tokens = [tokenize(d) for d in self.right]
+        if method == "jaccard":
+            self.scores = jaccard_matrix(left_tokens, right_tokens)
+        else:
+            self.scores = tfidf_cosine_matrix(left_tokens, right_tokens)
+
+        shape = (len(self.left), len(self.right))
+        if threshold <= 0:
+            # Pairs without shared tokens score 0 and still pass the cutoff.
+            self.matches = sparse.csr_matrix(np.ones(shape, dtype=bool))
+        else:
+            coo = self.scores.tocoo()
+            keep = coo.data >= threshold
+            self.matches = sparse.csr_matrix(
+                (np.ones(int(keep.sum()), dtype=bool), (coo.row[keep], coo.col[keep])),
+                shape=shape,
+            )
+
+    def overlapping_pairs(self) -> List[Tuple[int, int]]:
+        """``(left_index, right_index)`` of similar pairs in row-major order."""
+        coo = self.matches.tocoo()
+        order = np.lexsort((coo.col, coo.row))
+        return list(zip(coo.row[order].tolist(), coo.col[order].tolist()))
+
+    def unique_left(self) -> List[int]:
+        """Indices of ``left`` descriptions with no similar ``right`` description."""
+        has_match = np.asarray(self.matches.sum(axis=1)).ravel() > 0
+        return np.flatnonzero(~has_match).tolist()
+
+    def unique_right(self) -> List[int]:
+        """Indices of ``right`` descriptions with no similar ``left`` description."""
+        has_match = np.asarray(self.matches.sum(axis=0)).ravel() > 0
+        return np.flatnonzero(~has_match).tolist()
@@ -0,0 +1,187 @@
+"""Streaming of task results and LLM tokens while a crew is running.
+
+``RunStream`` listens on the crewai event bus and appends one JSON line per
+event to an events file as soon as it happens:
+
+- ``run_started`` / ``run_finished`` (with the status and output paths),
+- ``task_started`` and ``task_completed`` / ``task_failed`` (with the full
+  task output, also printed to stdout),
+- ``llm_chunk`` for every streamed token chunk when the LLM streams
+  (``WSI_LLM_STREAM=1``; crewai itself echoes the chunks to stdout).
+
+The file is append-only and every line is flushed, so a consumer can tail it
+and show the planning output within seconds instead of waiting for the final
+markdown. Like telemetry, events are scoped to the thread that created the
+stream (the one calling ``kickoff``, see :mod:`create_wsi_kl.event_scope`).
+
+When the run finishes, the finalizer's markdown and its parsed JSON
+dictionary are written with a temp file + rename, so readers never see a
+half-written result.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, TextIO
+
+from crewai.utilities.events import (
+    LLMStreamChunkEvent,
+    TaskCompletedEvent,
+    TaskFailedEvent,
+    TaskStartedEvent,
+)
+from crewai.utilities.events.base_event_listener import BaseEventListener
+
+from create_wsi_kl import event_scope
+from create_wsi_kl.batch import parse_finalizer_output
+from create_wsi_kl.naming import slugify
+
+
+def default_events_path(output_file: str) -> str:
+    """``wsi_cancer_description.md`` -> ``wsi_cancer_description.events.jsonl``."""
+    return str(Path(output_file).with_suffix(".events.jsonl"))
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Write ``text`` to ``path`` through a temp file and rename."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    tmp.replace(path)
+
+
+class RunStream(BaseEventListener):
+    """Event listener that streams one crew run to stdout and a JSONL file."""
+
+    def __init__(
+        self,
+        events_path: str,
+        output_file: Optional[str] = None,
+        cancer_type: str = "",
+        run_id: Optional[str] = None,
+        out: Optional[TextIO] = None,
+    ):
+        self.cancer_type = cancer_type
+        if run_id is None:
+            run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if cancer_type:
+                run_id += f"_{slugify(cancer_type)}"
+        self.run_id = run_id
+        self.events_path = Path(events_path)
+        self.events_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_file = Path(output_file) if output_file else None
+        self.json_path = self.output_file.with_suffix(".json") if self.output_file else None
+        self.out = out or sys.stdout
+
+        self._lock = threading.Lock()
+        self._task: Optional[str] = None
+        self._started = time.perf_counter()
+        self._events = open(self.events_path, "a", encoding="utf-8")
+        self.status: Optional[str] = None
+        self.outputs: Dict[str, Any] = {}
+        self.chunks = 0
+        super().__init__()
+        self._write({"event": "run_started"})
+
+    # ------------------------------------------------------------------
+    # Event handling
+    # ------------------------------------------------------------------
+    def setup_listeners(self, crewai_event_bus: Any) -> None:
+        event_scope.attach(
+            crewai_event_bus,
+            self,
+            {
+                TaskStartedEvent: self._task_started,
+                TaskCompletedEvent: self._task_completed,
+                TaskFailedEvent: self._task_failed,
+                LLMStreamChunkEvent: self._llm_chunk,
+            },
+        )
+
+    def _mine(self) -> bool:
+        return self.status is None
+
+    @staticmethod
+    def _agent_role(task: Any) -> str:
+        return getattr(getattr(task, "agent", None), "role", "") or ""
+
+    def _task_started(self, source: Any, event: Any) -> None:
+        task = event.task
+        if task is None or not self._mine():
+            return
+        self._task = task.name or ""
+        self._write({"event": "task_started", "task": self._task, "agent": self._agent_role(task)})
+
+    def _task_completed(self, source: Any, event: Any) -> None:
+        task = event.task
+        if task is None or not self._mine():
+            return
+        name, agent = task.name or "", self._agent_role(task)
+        raw = getattr(event.output, "raw", "") or ""
+        self._write({"event": "task_completed", "task": name, "agent": agent, "output": raw})
+        self._task = None
+        self.out.write(f"\n===== {name} ({agent}) =====\n{raw}\n")
+        self.out.flush()
+
+    def _task_failed(self, source: Any, event: Any) -> None:
+        task = event.task
+        if task is None or not self._mine():
+            return
+        self._write({"event": "task_failed", "task": task.name or "", "error": str(event.error)})
+        self._task = None
+
+    def _llm_chunk(self, source: Any, event: Any) -> None:
+        if not self._mine() or not event.chunk:
+            return
+        self.chunks += 1
+        self._write({"event": "llm_chunk", "task": event.task_name or self._task, "chunk": event.chunk})
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        record = {"run_id": self.run_id, "cancer_type": self.cancer_type, "ts": time.time(), **record}
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if not self._events.closed:
+                self._events.write(line + "\n")
+                self._events.flush()
+
+    # ------------------------------------------------------------------
+    # Final outputs
+    # ------------------------------------------------------------------
+    def _write_outputs(self, raw: str) -> Dict[str, Any]:
+        written: Dict[str, Any] = {}
+        if self.output_file is None:
+            return written
+        write_atomic(self.output_file, raw)
+        written["output_file"] = str(self.output_file)
+        try:
+            finalized = parse_finalizer_output(raw)
+        except ValueError as e:
+            written["json_error"] = str(e)
+        else:
+            write_atomic(self.json_path, json.dumps(finalized, indent=2, ensure_ascii=False) + "\n")
+            written["json_file"] = str(self.json_path)
+        return written
+
+    def finish(self, status: str = "success", output: Any = None) -> None:
+        """Write the final outputs (on success), the closing event, and detach.
+
+        Safe to call more than once; only the first call has an effect.
+        """
+        if self.status is not None:
+            return
+        record: Dict[str, Any] = {"event": "run_finished", "status": status}
+        if status == "success" and output is not None:
+            self.outputs = self._write_outputs(getattr(output, "raw", None) or str(output))
+            record.update(self.outputs)
+        record["seconds"] = time.perf_counter() - self._started
+        record["llm_chunks"] = self.chunks
+        self._write(record)
+        self.status = status
+        event_scope.detach(self)
+        with self._lock:
+            self._events.close()
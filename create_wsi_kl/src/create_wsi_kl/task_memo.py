@@ -0,0 +1,204 @@
+"""Task-level output memoization for the four-stage pipeline.
+
+Each stage's output is stored under ``.cache/task_outputs/<key>.json`` where
+the key hashes everything that determines the answer:
+
+- the interpolated task description and expected output (so the
+  ``cancer_type`` and any edit to ``tasks.yaml``),
+- the agent's role, goal, backstory and model (so any edit to
+  ``agents.yaml`` or the LLM routing),
+- the context handed over by the upstream stages.
+
+Because the upstream outputs are part of the key, a run naturally resumes at
+the first invalidated stage: unchanged stages are served from disk, and
+everything downstream of a stage that produced a different answer reruns.
+Unlike ``crewai replay`` this needs no task id and survives across runs.
+
+A stored output goes through the same steps as a fresh one: the task events
+are emitted, the guardrail runs (a failing guardrail retries the task for
+real, exactly like crewai does), then callbacks and ``output_file``. Guardrail
+retries themselves are never memoized; only the output that finally passes
+is stored, under the key of the original context.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+from crewai.utilities.events.crewai_event_bus import crewai_event_bus
+from crewai.utilities.guardrail import process_guardrail
+from pydantic import PrivateAttr
+
+from create_wsi_kl.settings import cache_dir, env_flag
+
+# Bump when the key recipe or stored payload changes.
+MEMO_VERSION = 1
+
+
+def memo_enabled() -> bool:
+    return env_flag("WSI_TASK_MEMO")
+
+
+def _agent_fingerprint(agent: Any) -> Dict[str, Any]:
+    llm = getattr(agent, "llm", None)
+    fingerprint = {
+        "role": getattr(agent, "role", None),
+        "goal": getattr(agent, "goal", None),
+        "backstory": getattr(agent, "backstory", None),
+        "model": getattr(llm, "model", None),
+        "temperature": getattr(llm, "temperature", None),
+    }
+    # Fan-out output is assembled from sections, so it must not share a key
+    # with the single-shot answer.
+    max_sections = getattr(agent, "fan_out_max_sections", None)
+    if max_sections:
+        fingerprint["fan_out_max_sections"] = max_sections
+    return fingerprint
+
+
+def task_key(task: Task, agent: Any, context: Optional[str]) -> str:
+    payload = {
+        "version": MEMO_VERSION,
+        "name": task.name,
+        "description": task.description,
+        "expected_output": task.expected_output,
+        "agent": _agent_fingerprint(agent),
+        "context": context or "",
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class TaskOutputStore:
+    """Directory of JSON-serialized ``TaskOutput`` objects keyed by hash."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or cache_dir("task_outputs")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.root / f"{key}.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, key: str, output: TaskOutput) -> None:
+        record = {
+            "name": output.name,
+            "description": output.description,
+            "expected_output": output.expected_output,
+            "raw": output.raw,
+            "json_dict": output.json_dict,
+            "agent": output.agent,
+        }
+        path = self.root / f"{key}.json"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        tmp.replace(path)
+
+
+class MemoizedTask(Task):
+    """``Task`` that reuses a stored output when its inputs are unchanged.
+
+    Overrides ``_execute_core`` (shared by the sync and async paths) so the
+    crew's sequential context hand-off is exactly the same on a hit or a miss.
+    """
+
+    _memo_depth: int = PrivateAttr(default=0)
+
+    def _execute_core(
+        self,
+        agent: Optional[Any],
+        context: Optional[str],
+        tools: Optional[List[Any]],
+    ) -> TaskOutput:
+        if self._memo_depth:
+            # A guardrail retry re-enters with the validation error as context.
+            return super()._execute_core(agent, context, tools)
+
+        agent = agent or self.agent
+        store = TaskOutputStore()
+        key = task_key(self, agent, context)
+        self._memo_depth += 1
+        try:
+            record = store.load(key)
+            if record is None:
+                output = super()._execute_core(agent, context, tools)
+            else:
+                print(f"[memo] reusing stored output for {self.name} ({key[:12]})")
+                output = self._replay(record, agent, context, tools)
+        finally:
+            self._memo_depth -= 1
+        store.save(key, output)
+        return output
+
+    def _replay(
+        self,
+        record: Dict[str, Any],
+        agent: Any,
+        context: Optional[str],
+        tools: Optional[List[Any]],
+    ) -> TaskOutput:
+        """Finish the task with a stored output, mirroring ``Task._execute_core``."""
+        try:
+            self.agent = agent
+            self.start_time = datetime.now()
+            self.prompt_context = context
+            self.processed_by_agents.add(agent.role)
+            crewai_event_bus.emit(self, TaskStartedEvent(context=context, task=self))
+
+            output = TaskOutput(
+                name=record.get("name") or self.name,
+                description=self.description,
+                expected_output=self.expected_output,
+                raw=record["raw"],
+                json_dict=record.get("json_dict"),
+                agent=record.get("agent") or getattr(agent, "role", ""),
+            )
+            if self._guardrail:
+                result = process_guardrail(
+                    output=output, guardrail=self._guardrail, retry_count=self.retry_count
+                )
+                if not result.success:
+                    if self.retry_count >= self.max_retries:
+                        raise Exception(
+                            f"Task failed guardrail validation after {self.max_retries} retries. "
+                            f"Last error: {result.error}"
+                        )
+                    print(f"[memo] stored output for {self.name} failed the guardrail, retrying: {result.error}")
+                    self.retry_count += 1
+                    retry_context = self.i18n.errors("validation_error").format(
+                        guardrail_result_error=result.error, task_output=output.raw
+                    )
+                    return self._execute_core(agent, retry_context, tools)
+                if result.result is None:
+                    raise Exception("Task guardrail returned None as result. This is not allowed.")
+                if isinstance(result.result, str):
+                    output.raw = result.result
+                    output.pydantic, output.json_dict = self._export_output(result.result)
+                elif isinstance(result.result, TaskOutput):
+                    output = result.result
+
+            self.output = output
+            self.end_time = datetime.now()
+            if self.callback:
+                self.callback(output)
+            crew = getattr(agent, "crew", None)
+            if crew and crew.task_callback and crew.task_callback != self.callback:
+                crew.task_callback(output)
+            if self.output_file:
+                self._save_file(output.json_dict or output.raw)
+            crewai_event_bus.emit(self, TaskCompletedEvent(output=output, task=self))
+            return output
+        except Exception as e:
+            self.end_time = datetime.now()
+            crewai_event_bus.emit(self, TaskFailedEvent(error=str(e), task=self))
+            raise
@@ -0,0 +1,425 @@
+"""Per-agent / per-task performance telemetry for one crew run.
+
+``RunTelemetry`` listens on the crewai event bus and records, for every task
+and for every agent:
+
+- wall time (task started -> completed/failed),
+- LLM call count, failures and time spent inside LLM calls,
+- prompt / cached prompt / completion tokens, taken per LLM call from the
+  provider response (see :mod:`create_wsi_kl.llm_usage`),
+- knowledge retrieval time and the number of knowledge search queries,
+- the agent's model and the estimated cost of its tokens (prices from the
+  ``pricing`` table in ``config/llm_routing.yaml``).
+
+The event bus is process-wide, so events are attributed through the thread
+that emitted them (see :mod:`create_wsi_kl.event_scope`). A sequential crew
+runs every task (and emits its LLM and knowledge events) on the thread that
+called ``kickoff``; the recorder is created on that thread and only receives
+its events, so concurrent batch crews never mix their numbers. Token counts
+follow the same rule: they come from the usage each call reported on its own
+thread, not from the agent's token counter, which litellm's process-wide
+callbacks can credit with other crews' calls. This also holds for the task
+copies that ``Crew.train``/``Crew.test`` execute. LLMs other than the
+project's own (``RateLimitedLLM``/``CachedLLM``/``FakeLLM``) report no
+per-call usage and are counted with zero tokens.
+
+Each run writes ``<run_id>.jsonl`` (one line per task, LLM call and retrieval
+span, then a run summary) and ``<run_id>.prom`` (Prometheus textfile
+collector format) to the telemetry directory. LLM cache hits never reach
+Gemini and are not counted as calls.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from crewai.utilities.events import (
+    LLMCallCompletedEvent,
+    LLMCallFailedEvent,
+    LLMCallStartedEvent,
+    TaskCompletedEvent,
+    TaskFailedEvent,
+    TaskStartedEvent,
+)
+from crewai.utilities.events.base_event_listener import BaseEventListener
+from crewai.utilities.events.knowledge_events import (
+    KnowledgeQueryStartedEvent,
+    KnowledgeRetrievalCompletedEvent,
+    KnowledgeRetrievalStartedEvent,
+    KnowledgeSearchQueryFailedEvent,
+)
+
+from create_wsi_kl import event_scope, llm_usage
+from create_wsi_kl.naming import slugify
+from create_wsi_kl.llm_routing import token_cost_usd
+from create_wsi_kl.settings import env_flag
+
+DEFAULT_TELEMETRY_DIR = "telemetry"
+METRIC_PREFIX = "wsi"
+
+# (field, metric suffix, type, help) exported per task and per agent.
+_METRICS = [
+    ("wall_seconds", "wall_seconds", "gauge", "Wall time"),
+    ("llm_calls", "llm_calls_total", "counter", "LLM calls that reached the provider"),
+    ("llm_failures", "llm_failures_total", "counter", "Failed LLM calls"),
+    ("llm_seconds", "llm_seconds", "gauge", "Time spent inside LLM calls"),
+    ("prompt_tokens", "prompt_tokens_total", "counter", "Prompt tokens"),
+    ("cached_prompt_tokens", "cached_prompt_tokens_total", "counter", "Cached prompt tokens"),
+    ("completion_tokens", "completion_tokens_total", "counter", "Completion tokens"),
+    ("retrieval_seconds", "retrieval_seconds", "gauge", "Knowledge retrieval time"),
+    ("knowledge_queries", "knowledge_queries_total", "counter", "Knowledge search queries"),
+    ("cost_usd", "cost_usd_total", "counter", "Estimated LLM cost in USD"),
+]
+
+
+def telemetry_dir_from_env() -> Optional[str]:
+    """Telemetry directory configured through ``WSI_TELEMETRY``/``WSI_TELEMETRY_DIR``."""
+    directory = os.getenv("WSI_TELEMETRY_DIR")
+    if directory:
+        return directory
+    return DEFAULT_TELEMETRY_DIR if env_flag("WSI_TELEMETRY") else None
+
+
+@dataclass
+class SpanStats:
+    """Counters for one task (or, summed, one agent or the whole run)."""
+
+    wall_seconds: float = 0.0
+    llm_calls: int = 0
+    llm_failures: int = 0
+    llm_seconds: float = 0.0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retrieval_seconds: float = 0.0
+    knowledge_queries: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, other: "SpanStats") -> None:
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+
+@dataclass
+class _ActiveTask:
+    task: str
+    agent: str
+    stats: SpanStats
+    started: float
+    model: str = ""
+    # Keyed by thread: fan-out section writers call the LLM concurrently.
+    llm_started: Dict[int, float] = field(default_factory=dict)
+    retrieval_started: Dict[int, float] = field(default_factory=dict)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    return ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in pairs)
+
+
+class RunTelemetry(BaseEventListener):
+    """Event listener that accounts time and tokens for one crew run."""
+
+    def __init__(
+        self,
+        output_dir: str = DEFAULT_TELEMETRY_DIR,
+        run_id: Optional[str] = None,
+        cancer_type: str = "",
+    ):
+        self.cancer_type = cancer_type
+        if run_id is None:
+            run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if cancer_type:
+                run_id += f"_{slugify(cancer_type)}"
+        self.run_id = run_id
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.trace_path = self.output_dir / f"{self.run_id}.jsonl"
+        self.prom_path = self.output_dir / f"{self.run_id}.prom"
+
+        self._lock = threading.Lock()
+        self._active: Optional[_ActiveTask] = None
+        self._finished: List[Tuple[str, str, str, SpanStats]] = []
+        self._models: Dict[str, str] = {}
+        self._checks: Dict[str, Dict[str, Any]] = {}
+        self._context: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+        self._ended: Optional[float] = None
+        self._trace = open(self.trace_path, "a", encoding="utf-8")
+        self.status: Optional[str] = None
+        super().__init__()
+
+    # ------------------------------------------------------------------
+    # Event handling
+    # ------------------------------------------------------------------
+    def setup_listeners(self, crewai_event_bus: Any) -> None:
+        event_scope.attach(
+            crewai_event_bus,
+            self,
+            {
+                TaskStartedEvent: self._task_started,
+                TaskCompletedEvent: self._task_completed,
+                TaskFailedEvent: self._task_failed,
+                LLMCallStartedEvent: self._llm_started,
+                LLMCallCompletedEvent: self._llm_completed,
+                LLMCallFailedEvent: self._llm_failed,
+                KnowledgeQueryStartedEvent: self._knowledge_query,
+                KnowledgeRetrievalStartedEvent: self._retrieval_started,
+                KnowledgeRetrievalCompletedEvent: self._retrieval_finished,
+                KnowledgeSearchQueryFailedEvent: self._retrieval_finished,
+            },
+        )
+
+    def _current(self) -> Optional[_ActiveTask]:
+        return self._active
+
+    def _task_started(self, source: Any, event: Any) -> None:
+        task = event.task
+        if task is None:
+            return
+        agent = task.agent
+        self._active = _ActiveTask(
+            task=task.name or "",
+            agent=getattr(agent, "role", "") or "",
+            stats=SpanStats(),
+            started=time.perf_counter(),
+            model=str(getattr(getattr(agent, "llm", None), "model", "") or ""),
+        )
+
+    def _task_completed(self, source: Any, event: Any) -> None:
+        self._end_task(event.task, "success")
+
+    def _task_failed(self, source: Any, event: Any) -> None:
+        self._end_task(event.task, "failed", error=event.error)
+
+    def _end_task(self, task: Any, status: str, error: Optional[str] = None) -> None:
+        active = self._current()
+        if task is None or active is None:
+            return
+        self._active = None
+        stats = active.stats
+        stats.wall_seconds = time.perf_counter() - active.started
+        stats.cost_usd = token_cost_usd(
+            active.model, stats.prompt_tokens, stats.completion_tokens, stats.cached_prompt_tokens
+        )
+        with self._lock:
+            self._finished.append((active.task, active.agent, status, stats))
+            self._models[active.agent] = active.model
+        record = {
+            "span": "task",
+            "task": active.task,
+            "agent": active.agent,
+            "model": active.model,
+            "status": status,
+            **asdict(stats),
+        }
+        if error:
+            record["error"] = error
+        self._write(record)
+
+    def _llm_started(self, source: Any, event: Any) -> None:
+        active = self._current()
+        if active is not None:
+            llm_usage.take()  # drop usage of a call made outside any task
+            active.llm_started[threading.get_ident()] = time.perf_counter()
+
+    def _llm_completed(self, source: Any, event: Any) -> None:
+        self._end_llm_call("success")
+
+    def _llm_failed(self, source: Any, event: Any) -> None:
+        self._end_llm_call("failed")
+
+    def _end_llm_call(self, status: str) -> None:
+        active = self._current()
+        if active is None:
+            return
+        started = active.llm_started.pop(threading.get_ident(), None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        tokens = llm_usage.take() or {}
+        with self._lock:
+            active.stats.llm_calls += 1
+            active.stats.llm_seconds += elapsed
+            if status != "success":
+                active.stats.llm_failures += 1
+            for name, value in tokens.items():
+                setattr(active.stats, name, getattr(active.stats, name) + value)
+        self._write({"span": "llm_call", "task": active.task, "agent": active.agent, "status": status, "seconds": elapsed, **tokens})
+
+    def _knowledge_query(self, source: Any, event: Any) -> None:
+        active = self._current()
+        if active is not None:
+            with self._lock:
+                active.stats.knowledge_queries += 1
+
+    def _retrieval_started(self, source: Any, event: Any) -> None:
+        active = self._current()
+        if active is not None:
+            active.retrieval_started[threading.get_ident()] = time.perf_counter()
+
+    def _retrieval_finished(self, source: Any, event: Any) -> None:
+        active = self._current()
+        if active is None:
+            return
+        started = active.retrieval_started.pop(threading.get_ident(), None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            active.stats.retrieval_seconds += elapsed
+        status = "failed" if isinstance(event, KnowledgeSearchQueryFailedEvent) else "success"
+        self._write({"span": "retrieval", "task": active.task, "agent": active.agent, "status": status, "seconds": elapsed})
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        record = {"run_id": self.run_id, "cancer_type": self.cancer_type, "ts": time.time(), **record}
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if not self._trace.closed:
+                self._trace.write(line + "\n")
+                self._trace.flush()
+
+    def record_check(self, name: str, result: Dict[str, Any]) -> None:
+        """Record an output check (e.g. the finalizer's) and its retry count."""
+        with self._lock:
+            self._checks[name] = dict(result)
+        self._write({"span": "check", "check": name, **result})
+
+    def record_context(self, report: Dict[str, Any]) -> None:
+        """Record one task hand-off's prompt size before/after context compaction."""
+        with self._lock:
+            self._context.append(dict(report))
+        self._write({"span": "context", **report})
+
+    # ------------------------------------------------------------------
+    # Aggregation and export
+    # ------------------------------------------------------------------
+    def by_task(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            finished = list(self._finished)
+        return [
+            {"task": task, "agent": agent, "status": status, **asdict(stats)}
+            for task, agent, status, stats in finished
+        ]
+
+    def by_agent(self) -> Dict[str, SpanStats]:
+        totals: Dict[str, SpanStats] = {}
+        with self._lock:
+            finished = list(self._finished)
+        for _, agent, _, stats in finished:
+            totals.setdefault(agent, SpanStats()).add(stats)
+        return totals
+
+    def summary(self) -> Dict[str, Any]:
+        total = SpanStats()
+        for stats in self.by_agent().values():
+            total.add(stats)
+        total.wall_seconds = (self._ended or time.perf_counter()) - self._started
+        return {
+            "run_id": self.run_id,
+            "cancer_type": self.cancer_type,
+            "status": self.status,
+            "totals": asdict(total),
+            "agents": {
+                agent: {"model": self._models.get(agent, ""), **asdict(stats)}
+                for agent, stats in self.by_agent().items()
+            },
+            "tasks": self.by_task(),
+            "checks": dict(self._checks),
+            "context": list(self._context),
+        }
+
+    def prometheus_text(self) -> str:
+        summary = self.summary()
+        base = [("run_id", self.run_id), ("cancer_type", self.cancer_type)]
+        lines: List[str] = []
+        for metric, suffix, kind, help_text in _METRICS:
+            for scope in ("task", "agent"):
+                name = f"{METRIC_PREFIX}_{scope}_{suffix}"
+                lines.append(f"# HELP {name} {help_text} per {scope}.")
+                lines.append(f"# TYPE {name} {kind}")
+                if scope == "task":
+                    for row in summary["tasks"]:
+                        labels = _labels(base + [("task", row["task"]), ("agent", row["agent"]), ("status", row["status"])])
+                        lines.append(f"{name}{{{labels}}} {row[metric]}")
+                else:
+                    for agent, stats in summary["agents"].items():
+                        labels = _labels(base + [("agent", agent), ("model", stats["model"])])
+                        lines.append(f"{name}{{{labels}}} {stats[metric]}")
+        name = f"{METRIC_PREFIX}_run_wall_seconds"
+        lines.append(f"# HELP {name} Wall time of the whole run.")
+        lines.append(f"# TYPE {name} gauge")
+        labels = _labels(base + [("status", summary["status"] or "unknown")])
+        lines.append(f"{name}{{{labels}}} {summary['totals']['wall_seconds']}")
+        for suffix, key, help_text in (
+            ("check_passed", "passed", "1 if the output passed its check"),
+            ("check_retries", "retries", "Retries needed by the output check"),
+        ):
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {name} {help_text}.")
+            lines.append(f"# TYPE {name} gauge")
+            for check, result in summary["checks"].items():
+                labels = _labels(base + [("check", check), ("status", result.get("status", ""))])
+                lines.append(f"{name}{{{labels}}} {int(result.get(key) or 0)}")
+        name = f"{METRIC_PREFIX}_prompt_tokens_estimate"
+        lines.append(f"# HELP {name} Estimated prompt tokens of a task before/after context compaction.")
+        lines.append(f"# TYPE {name} gauge")
+        for report in summary["context"]:
+            for stage, key in (("before", "prompt_tokens"), ("after", "compacted_prompt_tokens")):
+                labels = _labels(base + [("task", report["task"]), ("stage", stage)])
+                lines.append(f"{name}{{{labels}}} {report[key]}")
+        return "\n".join(lines) + "\n"
+
+    def finish(self, status: str = "success") -> Dict[str, Any]:
+        """Detach from the event bus and write the summary and Prometheus file.
+
+        Safe to call more than once; only the first call has an effect.
+        """
+        if self.status is not None:
+            return self.summary()
+        self.status = status
+        self._ended = time.perf_counter()
+        event_scope.detach(self)
+        summary = self.summary()
+        self._write({"span": "run", **summary})
+        with self._lock:
+            self._trace.close()
+
+        # Textfile collectors may read at any moment, so replace atomically.
+        tmp = self.prom_path.with_name(f"{self.prom_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        tmp.replace(self.prom_path)
+        return summary
+
+
+def print_summary(telemetry: Optional[RunTelemetry]) -> None:
+    """Print a per-agent time/token table for a finished run."""
+    if telemetry is None:
+        return
+    print("\nTelemetry:")
+    for agent, stats in telemetry.summary()["agents"].items():
+        per_call = stats["llm_seconds"] / stats["llm_calls"] if stats["llm_calls"] else 0.0
+        print(
+            f"  {agent} [{stats['model'] or 'unknown model'}]: {stats['wall_seconds']:.1f}s, "
+            f"{stats['llm_calls']} LLM calls ({stats['llm_seconds']:.1f}s, {per_call:.1f}s/call), "
+            f"{stats['prompt_tokens']} prompt / {stats['completion_tokens']} completion tokens "
+            f"(${stats['cost_usd']:.4f}), "
+            f"{stats['knowledge_queries']} knowledge queries ({stats['retrieval_seconds']:.1f}s)"
+        )
+    for report in telemetry.summary()["context"]:
+        if report["compacted"]:
+            print(
+                f"  Context of {report['task']}: ~{report['prompt_tokens']} -> "
+                f"~{report['compacted_prompt_tokens']} prompt tokens ({', '.join(report['steps'])})"
+            )
+    print(f"  Trace: {telemetry.trace_path}")
+    print(f"  Prometheus: {telemetry.prom_path}")
@@ -0,0 +1,252 @@
+"""Scoring, selection and checkpointing for ``main.validate``.
+
+Each cancer type is validated independently:
+
+1. every description is scored (``local`` rule-based scoring, optionally
+   blended with a Gemini rating when the ``llm`` scorer is selected),
+2. near-duplicates (Jaccard >= 0.6) of better-scored sentences are dropped,
+3. the best ``MAX_SELECTED`` sentences are kept in their original order.
+
+Types run concurrently: a process pool for the CPU-only local scorer, a
+thread pool for the network-bound LLM scorer. Every finished type is written
+to ``<run_dir>/<slug>.json`` straight away (types whose names slugify alike
+get ``_2``, ``_3``, ... files), so an interrupted run resumes
+with only the remaining (or changed) types.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from create_wsi_kl.naming import slugify, unique_slugs
+
+SCORERS = ("local", "llm")
+DEFAULT_RUN_ROOT = "validation_runs"
+MIN_SELECTED = 5
+MAX_SELECTED = 15
+MAX_WORDS = 25
+MIN_WORDS = 6
+DUPLICATE_THRESHOLD = 0.6
+
+MEDICAL_TERMS = (
+    "tumor", "tumour", "carcinoma", "neoplasm", "malignant", "morpholog",
+    "histolog", "patholog", "microscop", "immunohistochem", "nuclei", "nuclear",
+    "cytoplasm", "stroma", "architecture", "lymph", "metasta", "mitotic",
+    "necrosis", "gland", "papillae", "cells",
+)
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+def score_description(description: str) -> float:
+    """Rule-based quality score in ``[0, 1]`` mirroring the finalizer rules."""
+    words = description.split()
+    if not words:
+        return 0.0
+    n = len(words)
+    if n > MAX_WORDS:
+        length = max(0.0, 1.0 - (n - MAX_WORDS) / MAX_WORDS)
+    elif n < MIN_WORDS:
+        length = n / MIN_WORDS
+    else:
+        length = 1.0
+
+    text = description.strip()
+    formatting = (0.5 if text[0].isupper() else 0.0) + (0.5 if text.endswith(".") else 0.0)
+
+    lowered = text.lower()
+    hits = sum(1 for term in MEDICAL_TERMS if term in lowered)
+    terminology = min(1.0, hits / 2)
+
+    return round(0.4 * length + 0.2 * formatting + 0.4 * terminology, 4)
+
+
+def _llm_scores(cancer_type: str, descriptions: List[str]) -> List[float]:
+    """Ask the default LLM to rate each sentence 1-5; returns values in ``[0, 1]``."""
+    from create_wsi_kl.init_llm import get_default_llm
+
+    numbered = "\n".join(f"{i + 1}. {d}" for i, d in enumerate(descriptions))
+    prompt = (
+        f"You are a senior pathologist reviewing WSI descriptions of {cancer_type}.\n"
+        "Rate each numbered sentence from 1 (inaccurate or irrelevant) to 5 "
+        "(accurate, specific and clinically relevant) for this cancer type.\n"
+        "Answer with ONLY a JSON array of integers, one per sentence, in order.\n\n"
+        f"{numbered}"
+    )
+    raw = get_default_llm().call([{"role": "user", "content": prompt}])
+    match = re.search(r"\[.*?\]", str(raw), re.DOTALL)
+    if not match:
+        raise ValueError("LLM scorer did not return a JSON array")
+    ratings = json.loads(match.group(0))
+    if len(ratings) != len(descriptions):
+        raise ValueError(
+            f"LLM scorer returned {len(ratings)} ratings for {len(descriptions)} sentences"
+        )
+    return [min(max(float(r), 1.0), 5.0) / 5.0 for r in ratings]
+
+
+def select_descriptions(descriptions: List[str], scores: List[float]) -> List[str]:
+    """Keep the best non-redundant sentences, in their original order."""
+    from create_wsi_kl.similarity import DescriptionSimilarity
+
+    similarity = DescriptionSimilarity(descriptions, descriptions, threshold=DUPLICATE_THRESHOLD)
+    duplicates: Dict[int, set] = {}
+    for i, j in similarity.overlapping_pairs():
+        if i != j:
+            duplicates.setdefault(i, set()).add(j)
+
+    ranked = sorted(range(len(descriptions)), key=lambda i: (-scores[i], i))
+    chosen: List[int] = []
+    for i in ranked:
+        if len(chosen) >= MAX_SELECTED:
+            break
+        if duplicates.get(i, set()) & set(chosen):
+            continue
+        chosen.append(i)
+
+    # Top up from the remaining sentences if de-duplication left too few.
+    for i in ranked:
+        if len(chosen) >= min(MIN_SELECTED, len(descriptions)):
+            break
+        if i not in chosen:
+            chosen.append(i)
+    return [descriptions[i] for i in sorted(chosen)]
+
+
+def validate_and_select(
+    cancer_type: str, descriptions: List[str], scorer: str = "local"
+) -> Dict[str, Any]:
+    """Score and select descriptions for one cancer type."""
+    if scorer not in SCORERS:
+        raise ValueError(f"Unknown scorer '{scorer}', expected one of {SCORERS}")
+    scores = [score_description(d) for d in descriptions]
+    if scorer == "llm" and descriptions:
+        llm = _llm_scores(cancer_type, descriptions)
+        scores = [round(0.5 * a + 0.5 * b, 4) for a, b in zip(scores, llm)]
+    selected = select_descriptions(descriptions, scores)
+    return {
+        "cancer_type": cancer_type,
+        "scorer": scorer,
+        "input_sha256": descriptions_sha256(descriptions),
+        "scores": dict(zip(descriptions, scores)),
+        "selected": selected,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Checkpoints
+# ---------------------------------------------------------------------------
+def descriptions_sha256(descriptions: List[str]) -> str:
+    blob = json.dumps(descriptions, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def new_run_dir(root: str = DEFAULT_RUN_ROOT) -> Path:
+    return Path(root) / datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def latest_run_dir(root: str = DEFAULT_RUN_ROOT) -> Optional[Path]:
+    runs = sorted(p for p in Path(root).glob("*") if p.is_dir())
+    return runs[-1] if runs else None
+
+
+def _checkpoint_path(run_dir: Path, cancer_type: str, slug: Optional[str] = None) -> Path:
+    return run_dir / f"{slug or slugify(cancer_type)}.json"
+
+
+def load_checkpoint(
+    run_dir: Path,
+    cancer_type: str,
+    descriptions: List[str],
+    scorer: str,
+    slug: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Return a finished checkpoint if it matches the current input and scorer."""
+    path = _checkpoint_path(run_dir, cancer_type, slug)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if (
+        checkpoint.get("cancer_type") != cancer_type
+        or checkpoint.get("scorer") != scorer
+        or checkpoint.get("input_sha256") != descriptions_sha256(descriptions)
+    ):
+        return None
+    return checkpoint
+
+
+def write_checkpoint(run_dir: Path, result: Dict[str, Any], slug: Optional[str] = None) -> None:
+    path = _checkpoint_path(run_dir, result["cancer_type"], slug)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    tmp.replace(path)
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+def run_validation(
+    descriptions_by_type: Dict[str, List[str]],
+    run_dir: Path,
+    scorer: str = "local",
+    max_workers: Optional[int] = None,
+    on_result: Optional[Callable[[str, Optional[Dict[str, Any]], Optional[Exception]], None]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Validate every cancer type, resuming from checkpoints in ``run_dir``.
+
+    ``on_result(cancer_type, result, error)`` is called as each type finishes
+    (including types restored from a checkpoint). Failed types are not
+    checkpointed, so the next resume retries them.
+    """
+    run_dir.mkdir(parents=True, exist_ok=True)
+    results: Dict[str, Dict[str, Any]] = {}
+    pending: Dict[str, List[str]] = {}
+    slugs = unique_slugs(descriptions_by_type)
+    for cancer_type, descriptions in descriptions_by_type.items():
+        checkpoint = load_checkpoint(run_dir, cancer_type, descriptions, scorer, slugs[cancer_type])
+        if checkpoint is not None:
+            results[cancer_type] = checkpoint
+            if on_result:
+                on_result(cancer_type, checkpoint, None)
+        else:
+            pending[cancer_type] = descriptions
+
+    if not pending:
+        return results
+
+    executor: Executor
+    if scorer == "llm":
+        executor = ThreadPoolExecutor(max_workers=max_workers or min(8, len(pending)))
+    else:
+        # Spawned workers do not inherit the parent's threads, locks or open clients.
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    with executor:
+        futures = {
+            executor.submit(validate_and_select, cancer_type, descriptions, scorer): cancer_type
+            for cancer_type, descriptions in pending.items()
+        }
+        for future in as_completed(futures):
+            cancer_type = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                if on_result:
+                    on_result(cancer_type, None, e)
+                continue
+            write_checkpoint(run_dir, result, slugs[cancer_type])
+            results[cancer_type] = result
+            if on_result:
+                on_result(cancer_type, result, None)
+    return results
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from create_wsi_kl.batch import run_batch_async
+from create_wsi_kl.naming import slugify, unique_slugs
+
+
+def test_slugify():
+    assert slugify("Lung Adenocarcinoma (LUAD)") == "lung_adenocarcinoma_luad"
+    assert slugify("  ---  ") == "cancer_type"
+
+
+def test_unique_slugs_suffix_collisions_in_order():
+    slugs = unique_slugs(["LUAD (Lung)", "luad-lung", "KIRC", "LUAD (Lung)", "luad lung"])
+    assert slugs == {
+        "LUAD (Lung)": "luad_lung",
+        "luad-lung": "luad_lung_2",
+        "KIRC": "kirc",
+        "luad lung": "luad_lung_3",
+    }
+
+
+@pytest.mark.parametrize("output_dir", ["/tmp/batch", "../batch", "runs/../../batch"])
+def test_output_dir_must_stay_relative(output_dir):
+    with pytest.raises(ValueError, match="relative path"):
+        asyncio.run(run_batch_async(["LUAD"], output_dir=output_dir))
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("crewai")
+
+from create_wsi_kl.context_budget import (  # noqa: E402
+    OUTPUT_DIVIDER,
+    TRUNCATED_NOTE,
+    compact_context,
+)
+from create_wsi_kl.rate_limit import estimate_tokens  # noqa: E402
+
+REPEATED = "The tumor shows glandular architecture with papillary projections."
+
+
+def _output(title: str, *sections: str) -> str:
+    return f"# {title}\n\n" + "\n\n".join(sections)
+
+
+def test_context_within_budget_is_unchanged():
+    context = _output("Plan", "## Cells\nSome text.")
+    assert compact_context(context, budget=10_000) == (context, [])
+
+
+def test_dedupe_keeps_newest_copy():
+    plan = _output("Plan", f"## Architecture\n{REPEATED}\n\n---", "## Filler\n" + "word " * 40)
+    description = _output("Description", f"## Architecture\n{REPEATED}")
+    context = plan + OUTPUT_DIVIDER + description
+    compacted, steps = compact_context(context, budget=estimate_tokens(context) - 1)
+    assert steps[0] == "dedupe"
+    assert compacted.count(REPEATED) == 1
+    # Title-only sections go with the emptied ones; the description's copy stays.
+    assert compacted.index(REPEATED) > compacted.index("## Filler")
+    assert "---" not in compacted.splitlines()
+
+
+def test_select_drops_least_relevant_earlier_sections():
+    plan = _output(
+        "Plan",
+        "## Nuclear features\n" + "nuclear pleomorphism nucleoli chromatin " * 5,
+        "## Billing codes\n" + "invoice reimbursement payer " * 40,
+    )
+    description = _output("Description", "## Summary\nShort summary of nuclear pleomorphism.")
+    context = plan + OUTPUT_DIVIDER + description
+    compacted, steps = compact_context(
+        context, budget=estimate_tokens(context) // 2, focus="Evaluate nuclear pleomorphism"
+    )
+    assert "select" in steps
+    assert "Billing codes" not in compacted
+    assert "Nuclear features" in compacted
+    assert "less relevant section(s)" in compacted
+
+
+def test_truncate_is_the_last_resort():
+    context = _output("Description", "## Only\n" + "morphology " * 500)
+    compacted, steps = compact_context(context, budget=50)
+    assert steps[-1] == "truncate"
+    assert compacted.endswith(TRUNCATED_NOTE)
+    assert len(compacted) <= 50 * 4
+
+
+def test_compaction_is_deterministic():
+    context = _output("Plan", "## A\n" + "alpha " * 200) + OUTPUT_DIVIDER + _output("Out", "## B\n" + "beta " * 200)
+    assert compact_context(context, 100, "alpha") == compact_context(context, 100, "alpha")
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from create_wsi_kl.corpus_store import CorpusStore, load_corpus, parse_store_ref
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CorpusStore(tmp_path / "corpus.db")
+
+
+def test_parse_store_ref(tmp_path):
+    assert parse_store_ref("wsi_corpus.db") == (Path("wsi_corpus.db"), None)
+    path, version = parse_store_ref("runs/wsi_corpus.db@12")
+    assert (str(path), version) == ("runs/wsi_corpus.db", 12)
+    assert parse_store_ref("cancer_descriptions.json") is None
+
+
+def test_newest_version_per_type_wins(store):
+    v1 = store.record("run", {"LUAD": ["a1", "a2"], "KIRC": ["k1"]})
+    v2 = store.record("run", {"LUAD": ["a3"]})
+    assert store.latest_version() == v2
+    assert store.export() == {"LUAD": ["a3"], "KIRC": ["k1"]}
+    assert store.export(version=v1) == {"LUAD": ["a1", "a2"], "KIRC": ["k1"]}
+    assert store.export(cancer_types=["KIRC"]) == {"KIRC": ["k1"]}
+
+
+def test_validation_rejects_are_never_exported(store):
+    store.record("run", {"LUAD": ["generated"]})
+    version = store.start_run("validate")
+    store.add_validation(
+        version, {"cancer_type": "LUAD", "selected": ["kept"], "scores": {"kept": 0.9, "dropped": 0.1}}
+    )
+    store.finish_run(version)
+    assert store.export() == {"LUAD": ["kept"]}
+    assert store.export(status="accepted") == {"LUAD": ["kept"]}
+    assert store.export(status="rejected") == {"LUAD": ["dropped"]}
+
+
+def test_unfinished_and_failed_runs_are_ignored(store):
+    done = store.record("run", {"LUAD": ["done"]})
+    running = store.start_run("batch")
+    store.add_sentences(running, "LUAD", ["partial"])
+    failed = store.start_run("batch")
+    store.add_sentences(failed, "LUAD", ["broken"])
+    store.finish_run(failed, "failed")
+    assert store.latest_version() == done
+    assert store.export() == {"LUAD": ["done"]}
+
+
+def test_sentences_are_append_only(store):
+    import sqlite3
+
+    store.record("run", {"LUAD": ["a"]})
+    with pytest.raises(sqlite3.DatabaseError):
+        with store._connect() as conn:
+            conn.execute("DELETE FROM sentences")
+
+
+def test_load_corpus_pins_version(store):
+    v1 = store.record("run", {"LUAD": ["old"]})
+    store.record("run", {"LUAD": ["new"]})
+    assert load_corpus(f"{store.path}@{v1}") == {"LUAD": ["old"]}
+    assert load_corpus(store.path) == {"LUAD": ["new"]}
+
+
+def test_unknown_status_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.export(status="pending")
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("crewai")
+
+from create_wsi_kl.fan_out import split_plan  # noqa: E402
+
+PLAN = """# Plan for LUAD
+
+Overview of the description.
+
+## 1. Cellular Characteristics
+Describe nuclei.
+
+### Details
+Nucleoli.
+
+## **Tissue Architecture**
+Glands and papillae.
+"""
+
+
+def test_split_plan_uses_shallowest_repeated_level():
+    preamble, sections = split_plan(PLAN)
+    assert preamble == "# Plan for LUAD\n\nOverview of the description."
+    assert [s.title for s in sections] == ["Cellular Characteristics", "Tissue Architecture"]
+    assert "### Details" in sections[0].guidance
+    assert sections[1].guidance == "Glands and papillae."
+
+
+def test_split_plan_without_sections_returns_plan():
+    preamble, sections = split_plan("Just a paragraph.\n# Only one header\n")
+    assert sections == []
+    assert preamble == "Just a paragraph.\n# Only one header"
+
+
+def test_split_plan_groups_surplus_sections():
+    plan = "\n".join(f"## S{i}\nbody {i}" for i in range(5))
+    _, sections = split_plan(plan, max_sections=2)
+    assert [s.title for s in sections] == ["S0 / S1 / S2", "S3 / S4"]
+    assert sections[1].guidance == "S3:\nbody 3\n\nS4:\nbody 4"
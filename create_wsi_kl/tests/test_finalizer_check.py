@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from create_wsi_kl.finalizer_check import (
+    FinalizerGuardrail,
+    _normalize_sentence,
+    check_finalizer_output,
+)
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("- Tumor cells form glands", "Tumor cells form glands."),
+        ("1. **Nuclei** are enlarged;", "Nuclei are enlarged."),
+        ("p53 staining is diffuse", "p53 staining is diffuse."),
+        ("pT1a tumors are small.", "pT1a tumors are small."),
+        ("  \"quoted   text\"  ", "quoted text."),
+        ("- ", ""),
+    ],
+)
+def test_normalize_sentence(raw, expected):
+    assert _normalize_sentence(raw) == expected
+
+
+def _answer(key, sentences):
+    return json.dumps({key: sentences})
+
+
+SENTENCES = [f"Sentence number {i} describes the tumor." for i in range(6)]
+
+
+def test_valid_answer_passes():
+    result = check_finalizer_output(_answer("LUAD", SENTENCES), "LUAD")
+    assert result.passed
+    assert result.corpus == {"LUAD": SENTENCES}
+    assert result.fixes == []
+
+
+def test_key_is_renamed_and_duplicates_dropped():
+    result = check_finalizer_output(_answer(" luad ", SENTENCES + [SENTENCES[0].upper()]), "LUAD")
+    assert result.passed
+    assert result.corpus == {"LUAD": SENTENCES}
+    assert any("renamed key" in fix for fix in result.fixes)
+
+
+def test_too_few_sentences_is_an_error_but_usable():
+    result = check_finalizer_output(_answer("LUAD", SENTENCES[:2]), "LUAD")
+    assert not result.passed
+    assert result.usable
+    assert "There are 2 sentences" in result.errors[0]
+
+
+def test_non_json_is_unusable():
+    result = check_finalizer_output("not json at all", "LUAD")
+    assert not result.usable
+    assert result.errors
+
+
+@pytest.mark.parametrize(
+    "sentence, error",
+    [
+        ("Is necrosis present?", "must end with a period"),
+        ("Striking atypia is seen!", "must end with a period"),
+        ("tumor cells form glands.", "must start with a capital letter"),
+        ("p53-negative cells are rare.", None),
+        ("pT1a tumors are small.", None),
+        ("mRNA expression is low.", None),
+    ],
+)
+def test_case_and_final_punctuation(sentence, error):
+    result = check_finalizer_output(_answer("LUAD", SENTENCES[:5] + [sentence]), "LUAD")
+    if error is None:
+        assert result.passed
+    else:
+        assert not result.passed
+        assert [e for e in result.errors if error in e and sentence in e]
+
+
+def test_guardrail_retries_case_and_punctuation_errors():
+    guardrail = FinalizerGuardrail(max_retries=1)
+    guardrail.reset("LUAD")
+
+    class Output:
+        raw = _answer("LUAD", SENTENCES[:5] + ["necrosis is absent!"])
+
+    ok, feedback = guardrail(Output())
+    assert not ok
+    assert "must start with a capital letter" in feedback
+    assert "must end with a period" in feedback
+
+    Output.raw = _answer("LUAD", SENTENCES[:5] + ["Necrosis is absent."])
+    ok, _ = guardrail(Output())
+    assert ok
+    assert guardrail.status == "passed"
+    assert guardrail.retries == 1
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+pytest.importorskip("crewai")
+
+from create_wsi_kl.json_knowledge import iter_cancer_descriptions  # noqa: E402
+
+DATA = {
+    "LUAD": ["Glands with \"lepidic\" growth.", "Nuclei are enlarged."],
+    "KIRC": ["Clear cytoplasm {not json}."],
+    "Unicode é": [],
+    "Count": 12345,
+}
+
+
+@pytest.mark.parametrize("read_size", [1, 3, 7, 64 * 1024])
+def test_streams_every_entry_in_order(tmp_path, read_size):
+    path = tmp_path / "corpus.json"
+    path.write_text(json.dumps(DATA, indent=2, ensure_ascii=False), encoding="utf-8")
+    assert list(iter_cancer_descriptions(str(path), read_size=read_size)) == list(DATA.items())
+
+
+def test_empty_object(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text(" { } ", encoding="utf-8")
+    assert list(iter_cancer_descriptions(str(path))) == []
+
+
+@pytest.mark.parametrize("text", ["[]", '{"LUAD": ["a"] "KIRC": []}', '{"LUAD": ["a"]', '{"LUAD" ["a"]}'])
+def test_malformed_input_raises(tmp_path, text):
+    path = tmp_path / "bad.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_cancer_descriptions(str(path), read_size=2))
@@ -0,0 +1,36 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("litellm")
+
+from create_wsi_kl import llm_usage  # noqa: E402
+
+
+def _report(recorder, usage):
+    recorder.log_success_event({}, {"usage": usage}, 0, 0)
+
+
+def test_records_usage_reported_on_the_calling_thread():
+    llm_usage.take()
+    callbacks = llm_usage.with_recorder(["agent-counter"])
+    assert callbacks[0] == "agent-counter"
+    recorder = callbacks[-1]
+    details = SimpleNamespace(cached_tokens=3)
+    _report(recorder, SimpleNamespace(prompt_tokens=10, completion_tokens=4, prompt_tokens_details=details))
+    assert llm_usage.take() == {"prompt_tokens": 10, "cached_prompt_tokens": 3, "completion_tokens": 4}
+    assert llm_usage.take() is None
+
+
+def test_ignores_reports_from_other_threads_and_repeats():
+    llm_usage.take()
+    recorder = llm_usage.with_recorder(None)[-1]
+    worker = threading.Thread(target=_report, args=(recorder, {"prompt_tokens": 99, "completion_tokens": 99}))
+    worker.start()
+    worker.join()
+    assert llm_usage.take() is None
+
+    _report(recorder, {"prompt_tokens": 5, "completion_tokens": 2})
+    _report(recorder, {"prompt_tokens": 50, "completion_tokens": 20})
+    assert llm_usage.take() == {"prompt_tokens": 5, "cached_prompt_tokens": 0, "completion_tokens": 2}
@@ -0,0 +1,31 @@
+import pickle
+
+import pytest
+
+pytest.importorskip("crewai")
+
+from create_wsi_kl.parallel_eval import TRAINED_FILE, UnitResult, merge_trained_files  # noqa: E402
+
+
+def _unit(tmp_path, name, data, status="success"):
+    work_dir = tmp_path / name
+    work_dir.mkdir()
+    with open(work_dir / TRAINED_FILE, "wb") as f:
+        pickle.dump(data, f)
+    return UnitResult("train", "LUAD", 1, str(work_dir), status=status)
+
+
+def test_merge_trained_files(tmp_path):
+    results = [
+        _unit(tmp_path, "a", {"Writer": {"suggestions": ["s1", "s2"], "quality": 6, "final_summary": "A"}}),
+        _unit(tmp_path, "b", {"Writer": {"suggestions": ["s2", "s3"], "quality": 8, "final_summary": "A"},
+                              "Critic": {"suggestions": ["c1"], "quality": 5}}),
+        _unit(tmp_path, "c", {"Writer": {"suggestions": ["bad"], "quality": 0}}, status="failed"),
+        UnitResult("train", "LUAD", 4, str(tmp_path / "missing")),
+    ]
+    target = tmp_path / "merged.pkl"
+    assert merge_trained_files(results, str(target)) == 2
+    with open(target, "rb") as f:
+        merged = pickle.load(f)
+    assert merged["Writer"] == {"suggestions": ["s1", "s2", "s3"], "quality": 7.0, "final_summary": "A"}
+    assert merged["Critic"] == {"suggestions": ["c1"], "quality": 5.0, "final_summary": ""}
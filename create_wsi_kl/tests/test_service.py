@@ -0,0 +1,74 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from create_wsi_kl import service
+
+
+class FakePool:
+    """Crew pool whose crews answer with a fixed finalizer JSON."""
+
+    def __init__(self):
+        self.released = []
+        self.gate = asyncio.Event()
+
+    async def acquire(self, cancer_type):
+        pool = self
+
+        class Crew:
+            async def kickoff_async(self, inputs):
+                await pool.gate.wait()
+                return SimpleNamespace(raw=json.dumps({cancer_type: ["Tumor cells form glands."]}))
+
+        instance = SimpleNamespace(telemetry=None, set_output_file=lambda path: None)
+        return instance, Crew()
+
+    def release(self, cancer_type, item):
+        self.released.append(cancer_type)
+
+
+def _service(tmp_path, monkeypatch):
+    monkeypatch.setenv("WSI_CORPUS_DB", "off")
+    svc = service.WsiService(output_dir=str(tmp_path))
+    svc.pool = FakePool()
+    return svc
+
+
+def test_requests_differing_in_spacing_or_case_coalesce(tmp_path, monkeypatch):
+    async def scenario():
+        svc = _service(tmp_path, monkeypatch)
+        job, coalesced = svc.submit("Lung  Adenocarcinoma ")
+        same, joined = svc.submit("lung adenocarcinoma")
+        svc.pool.gate.set()
+        await job.done.wait()
+        return job, coalesced, same, joined, svc
+
+    job, coalesced, same, joined, svc = asyncio.run(scenario())
+    assert (coalesced, joined, same) == (False, True, job)
+    assert job.requests == 2
+    assert job.status == "succeeded"
+    assert job.result == {"Lung Adenocarcinoma": ["Tumor cells form glands."]}
+    assert svc.pool.released == ["Lung Adenocarcinoma"]
+    assert not svc._inflight
+
+
+def test_failure_to_save_the_result_fails_the_job(tmp_path, monkeypatch):
+    def broken_write(corpus, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(service, "write_corpus", broken_write)
+
+    async def scenario():
+        svc = _service(tmp_path, monkeypatch)
+        svc.pool.gate.set()
+        job, _ = svc.submit("LUAD")
+        await job.done.wait()
+        return job, svc
+
+    job, svc = asyncio.run(scenario())
+    assert job.status == "failed"
+    assert job.error == "disk full"
+    assert job.finished_at is not None
+    assert svc._result(job)[0] == 500
+    assert svc.pool.released == []
+    assert not svc._inflight
@@ -0,0 +1,49 @@
+import pytest
+
+from create_wsi_kl.similarity import DescriptionSimilarity, jaccard_matrix, tokenize
+
+
+def _jaccard(a: str, b: str) -> float:
+    x, y = set(tokenize(a)), set(tokenize(b))
+    return len(x & y) / len(x | y) if x | y else 0.0
+
+
+LEFT = [
+    "Tumor cells form glands",
+    "Nuclei are enlarged and hyperchromatic",
+    "Necrosis is absent",
+]
+RIGHT = [
+    "tumor cells form solid glands",
+    "Mitotic figures are frequent",
+    "nuclei are enlarged and hyperchromatic",
+]
+
+
+def test_jaccard_matrix_matches_pairwise_scores():
+    scores = jaccard_matrix([tokenize(d) for d in LEFT], [tokenize(d) for d in RIGHT]).toarray()
+    for i, a in enumerate(LEFT):
+        for j, b in enumerate(RIGHT):
+            assert scores[i, j] == pytest.approx(_jaccard(a, b))
+
+
+def test_overlapping_pairs_and_unique_indices():
+    similarity = DescriptionSimilarity(LEFT, RIGHT, threshold=0.6)
+    assert similarity.overlapping_pairs() == [(0, 0), (1, 2)]
+    assert similarity.unique_left() == [2]
+    assert similarity.unique_right() == [1]
+
+
+def test_tfidf_scores_identical_descriptions_as_one():
+    similarity = DescriptionSimilarity(LEFT, LEFT, threshold=0.99, method="tfidf")
+    assert similarity.overlapping_pairs() == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_zero_threshold_matches_every_pair():
+    similarity = DescriptionSimilarity(["alpha"], ["beta", "gamma"], threshold=0)
+    assert similarity.overlapping_pairs() == [(0, 0), (0, 1)]
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        DescriptionSimilarity(LEFT, RIGHT, method="cosine")
@@ -0,0 +1,30 @@
+from create_wsi_kl.validation import run_validation, select_descriptions
+
+LUAD = [f"Malignant glandular tumor cells number {i} show nuclear atypia and papillae." for i in range(8)]
+LUAD_ALIKE = [f"Carcinoma cells variant {i} show necrosis and mitotic figures in the stroma." for i in range(8)]
+
+
+def test_select_descriptions_drops_near_duplicates_and_keeps_order():
+    distinct = [
+        "Clear cells line the glands of this tumor",
+        "Nuclei are enlarged with prominent nucleoli",
+        "Necrosis fills the center of solid nests",
+        "Mitotic figures are frequent and atypical",
+        "Stroma shows dense lymphocytic infiltrates",
+        "Papillae have fibrovascular cores",
+    ]
+    near_duplicate = "Clear cells line the glands of the tumor"
+    descriptions = distinct[:3] + [near_duplicate] + distinct[3:]
+    scores = [0.5, 0.4, 0.4, 0.9, 0.3, 0.3, 0.3]
+    assert select_descriptions(descriptions, scores) == distinct[1:3] + [near_duplicate] + distinct[3:]
+
+
+def test_colliding_slugs_get_their_own_checkpoints_and_resume(tmp_path):
+    corpus = {"LUAD (Lung)": LUAD, "luad-lung": LUAD_ALIKE}
+    first = run_validation(corpus, tmp_path, max_workers=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["luad_lung.json", "luad_lung_2.json"]
+
+    resumed = []
+    second = run_validation(corpus, tmp_path, on_result=lambda ct, result, error: resumed.append(ct))
+    assert sorted(resumed) == sorted(corpus)
+    assert second == first